@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модель объявления и быстрый разбор JSON
+
+validate_ad проверяет типы всех полей объявления-словаря за один проход,
+поэтому ошибки вроде цены-массива обнаруживаются до записи фида. Массовая
+загрузка проверяет словари на месте и не создает объектов Ad: по замерам
+benchmarks/bench_decode.py модель не ускоряет разбор стандартным json и
+почти не экономит память, выигрыш дает только orjson. Ad со слотами
+используется для одиночных объявлений (create_ad, агент, add_ad_element).
+JSON разбирается orjson, если он установлен, иначе стандартным json.
+"""
+
+import json
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+AdFields = Tuple[str, str, int, List[str], Dict[str, Any]]
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson необязателен
+    orjson = None
+
+# Поля, обязательные для каждого объявления
+REQUIRED_FIELDS = ('title', 'description', 'price')
+# Типы значений params, которые можно записать в XML как текст
+PARAM_TYPES = (str, int, float, bool)
+_PARAM_TYPE_SET = frozenset(PARAM_TYPES)
+_STR_TYPE_SET = frozenset((str,))
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Разбор JSON (orjson, если установлен)
+
+    Raises:
+        ValueError: Некорректный JSON
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+class AdValidationError(ValueError):
+    """Объявление не соответствует модели"""
+
+def parse_int(text: str) -> Optional[int]:
+    """
+    Строгий разбор целого числа: ASCII-цифры с необязательным минусом
+
+    int() принимает цифры других алфавитов и '1_000', а isdigit() еще и '²',
+    который int() не разбирает. Пробелы по краям допускаются.
+
+    Returns:
+        Optional[int]: Число или None, если текст не целое число
+    """
+    text = text.strip()
+    digits = text[1:] if text[:1] == '-' else text
+    if digits.isdigit() and digits.isascii():
+        return int(text)
+    return None
+
+def _price(value: Any) -> int:
+    # bool — подкласс int, но ценой быть не может
+    if type(value) is float and value.is_integer():
+        value = int(value)
+    elif type(value) is str:
+        value = parse_int(value)
+    if type(value) is not int or value < 0:
+        raise AdValidationError('Field price must be a non-negative integer')
+    return value
+
+class Ad:
+    """
+    Объявление в формате MCP API
+
+    Поддерживает чтение и запись полей по ключу (ad['title'], ad.get('images')),
+    поэтому передается везде, где раньше передавался словарь: в FeedWriter,
+    serialize_ads, AdStore и ImagePipeline.
+    """
+
+    __slots__ = ('title', 'description', 'price', 'images', 'params', 'category', 'id')
+
+    def __init__(
+        self,
+        title: str,
+        description: str,
+        price: int,
+        images: Optional[List[str]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        category: Optional[str] = None,
+        id: Optional[str] = None
+    ):
+        """
+        Конструктор не проверяет типы, для внешних данных используйте from_dict()
+
+        Args:
+            title (str): Заголовок объявления
+            description (str): Описание объявления
+            price (int): Цена
+            images (List[str]): Ссылки или пути к изображениям
+            params (Dict): Дополнительные параметры (теги XML)
+            category (str): Категория товара
+            id (str): Идентификатор объявления, если нет params.Id
+        """
+        self.title = title
+        self.description = description
+        self.price = price
+        self.images = images if images is not None else []
+        self.params = params if params is not None else {}
+        self.category = category
+        self.id = id
+
+    @classmethod
+    def from_dict(cls, data: Any, require_category: bool = False) -> 'Ad':
+        """
+        Создает объявление из декодированного JSON с проверкой типов
+
+        Цена, переданная строкой из цифр или целым float, приводится к int
+        (см. validate_ad).
+
+        Args:
+            data: Декодированное объявление
+            require_category (bool): Требовать поле category
+
+        Returns:
+            Ad: Объявление
+
+        Raises:
+            AdValidationError: Поле отсутствует или имеет неверный тип
+        """
+        if type(data) is cls:
+            return data
+        data = validate_ad(data, require_category)
+        get = data.get
+        return cls(
+            data['title'], data['description'], data['price'],
+            get('images'), get('params'), get('category'), get('id')
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Словарь формата MCP API (category и id — только если заданы)"""
+        data = {
+            'title': self.title,
+            'description': self.description,
+            'price': self.price,
+            'images': self.images,
+            'params': self.params
+        }
+        if self.category is not None:
+            data['category'] = self.category
+        if self.id is not None:
+            data['id'] = self.id
+        return data
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        value = getattr(self, key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__slots__ and getattr(self, key) is not None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+
+    def __reduce__(self):
+        # Компактная передача в пул процессов: кортеж полей вместо словаря состояния
+        return Ad, tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Ad):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f'Ad(title={self.title!r}, price={self.price!r}, images={len(self.images)})'
+
+def validate_ad(data: Any, require_category: bool = False) -> Union[Ad, Dict[str, Any]]:
+    """
+    Проверяет типы полей объявления-словаря на месте, не создавая Ad
+
+    Цена, переданная строкой из цифр или целым float, заменяется в словаре
+    на int. Объявление Ad возвращается как есть.
+
+    Args:
+        data: Декодированное объявление или Ad
+        require_category (bool): Требовать поле category
+
+    Returns:
+        Union[Ad, Dict]: То же объявление
+
+    Raises:
+        AdValidationError: Поле отсутствует или имеет неверный тип
+    """
+    # Проверки упорядочены так, чтобы корректное объявление проходило только
+    # сравнения type() и проверки на уровне C: это горячий путь разбора
+    if type(data) is not dict:
+        if isinstance(data, Ad):
+            return data
+        if not isinstance(data, dict):
+            raise AdValidationError('Ad must be a JSON object')
+    try:
+        title = data['title']
+        description = data['description']
+        price = data['price']
+    except KeyError:
+        missing = next(field for field in REQUIRED_FIELDS if field not in data)
+        raise AdValidationError(f'Missing required field: {missing}')
+    if type(title) is not str:
+        raise AdValidationError('Field title must be a string')
+    if type(description) is not str:
+        raise AdValidationError('Field description must be a string')
+    if type(price) is not int or price < 0:
+        data['price'] = _price(price)
+
+    get = data.get
+    images = get('images')
+    if images is not None:
+        if type(images) is not list:
+            raise AdValidationError('Field images must be a list of strings')
+        if not _STR_TYPE_SET.issuperset(map(type, images)):
+            for image in images:
+                if type(image) is not str:
+                    raise AdValidationError('Field images must be a list of strings')
+
+    params = get('params')
+    if params is not None:
+        if type(params) is not dict:
+            raise AdValidationError('Field params must be an object')
+        if not _PARAM_TYPE_SET.issuperset(map(type, params.values())):
+            for key in params:
+                value = params[key]
+                if type(value) not in _PARAM_TYPE_SET and not isinstance(value, PARAM_TYPES):
+                    raise AdValidationError(f'Field params.{key} must be a string or a number')
+
+    category = get('category')
+    if category is None:
+        if require_category:
+            raise AdValidationError('Missing required field: category')
+    elif type(category) is not str:
+        raise AdValidationError('Field category must be a string')
+    ad_id = get('id')
+    if ad_id is not None and not isinstance(ad_id, (str, int)):
+        raise AdValidationError('Field id must be a string or a number')
+    return data
+
+def ad_fields(data: Any) -> AdFields:
+    """
+    Проверенные поля объявления в порядке аргументов сериализатора
+
+    Returns:
+        AdFields: title, description, price, images, params
+
+    Raises:
+        AdValidationError: Объявление-словарь не прошло проверку типов
+    """
+    ad = validate_ad(data)
+    return ad['title'], ad['description'], ad['price'], ad.get('images') or [], ad.get('params') or {}
+
+def decode_json(data: Union[bytes, str]) -> Any:
+    """
+    Разбор тела запроса
+
+    Raises:
+        AdValidationError: Некорректный JSON
+    """
+    try:
+        return loads(data)
+    except ValueError as e:
+        raise AdValidationError(f'Invalid JSON: {str(e)}')
+
+def decode_ad(data: Union[bytes, str, Dict], require_category: bool = False) -> Ad:
+    """
+    Разбирает одно объявление из JSON
+
+    Args:
+        data: JSON-документ или уже декодированный словарь
+        require_category (bool): Требовать поле category
+
+    Raises:
+        AdValidationError: Некорректный JSON или объявление
+    """
+    if isinstance(data, (bytes, str)):
+        data = decode_json(data)
+    return Ad.from_dict(data, require_category)
+
+def iter_ads(ads: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Проверяет список объявлений-словарей на месте (см. validate_ad)
+
+    Raises:
+        AdValidationError: Сообщение с номером первого некорректного объявления
+    """
+    if not isinstance(ads, list):
+        raise AdValidationError('Field ads must be a list')
+    for index, ad_data in enumerate(ads):
+        try:
+            yield validate_ad(ad_data)
+        except AdValidationError as e:
+            raise AdValidationError(f'Ad {index}: {str(e)}')
+
+def decode_bulk(data: Union[bytes, str, Dict]) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Разбирает тело массовой загрузки {"category": ..., "ads": [...]}
+
+    Args:
+        data: JSON-документ или уже декодированный словарь
+
+    Returns:
+        Tuple[str, List[Dict]]: Категория и проверенные объявления-словари
+
+    Raises:
+        AdValidationError: Некорректный JSON, нет полей category/ads или
+            одно из объявлений некорректно
+    """
+    if isinstance(data, (bytes, str)):
+        data = decode_json(data)
+    if not isinstance(data, dict) or 'category' not in data or 'ads' not in data:
+        raise AdValidationError('Missing required fields: category, ads')
+    if type(data['category']) is not str:
+        raise AdValidationError('Field category must be a string')
+    return data['category'], list(iter_ads(data['ads']))
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from loguru import logger
+from root_xml import FeedWriter, serialize_ad
+from utils import create_directory
+
+# Сколько идентификаторов проверять одним запросом (лимит переменных SQLite)
+LOOKUP_BATCH_SIZE = 500
+
+def get_ad_id(ad_data: Dict) -> str:
+    """
+    Возвращает идентификатор объявления
+
+    Берется Id из params (он попадает в XML как <Id>), иначе поле id.
+
+    Args:
+        ad_data (Dict): Объявление в формате MCP API
+
+    Returns:
+        str: Идентификатор объявления
+    """
+    params = ad_data.get('params') or {}
+    ad_id = params.get('Id', ad_data.get('id'))
+    if ad_id is None or ad_id == '':
+        raise ValueError('Missing ad id: pass params.Id or id')
+    return str(ad_id)
+
+def ad_hash(ad_data: Dict) -> str:
+    """
+    Считает хеш содержимого объявления
+
+    Учитываются только поля, попадающие в XML.
+
+    Args:
+        ad_data (Dict): Объявление в формате MCP API
+
+    Returns:
+        str: SHA-256 в шестнадцатеричном виде
+    """
+    payload = json.dumps(
+        [
+            ad_data['title'],
+            ad_data['description'],
+            str(ad_data['price']),
+            ad_data.get('images', []),
+            ad_data.get('params') or {}
+        ],
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class AdStore:
+    """
+    Локальное хранилище объявлений с обнаружением изменений
+
+    Для каждого объявления хранится хеш содержимого и готовый XML-фрагмент
+    <Ad>. При повторной синхронизации заново сериализуются только новые
+    и измененные объявления, а фид собирается из сохраненных фрагментов.
+    Снятые с продажи объявления удаляются через delete() или prune(),
+    иначе они остаются во всех следующих фидах.
+    """
+
+    def __init__(self, path: str = 'data/ad_store.sqlite3'):
+        """
+        Args:
+            path (str): Путь к файлу базы SQLite
+        """
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Соединение открывается лениво и используется из пула потоков под блокировкой
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                create_directory(directory)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ads (
+                    ad_id TEXT PRIMARY KEY,
+                    hash TEXT NOT NULL,
+                    fragment BLOB NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _known_hashes(self, conn: sqlite3.Connection, ad_ids: List[str]) -> Dict[str, str]:
+        hashes = {}
+        for start in range(0, len(ad_ids), LOOKUP_BATCH_SIZE):
+            batch = ad_ids[start:start + LOOKUP_BATCH_SIZE]
+            placeholders = ','.join('?' * len(batch))
+            rows = conn.execute(
+                f'SELECT ad_id, hash FROM ads WHERE ad_id IN ({placeholders})', batch
+            )
+            hashes.update(rows)
+        return hashes
+
+    def upsert(self, ads: Iterable[Dict]) -> Dict[str, int]:
+        """
+        Добавляет или обновляет объявления
+
+        Args:
+            ads (Iterable[Dict]): Объявления в формате MCP API
+
+        Returns:
+            Dict[str, int]: Количество добавленных (added), измененных (changed)
+                и пропущенных без изменений (skipped) объявлений
+        """
+        # Последнее вхождение id в пакете побеждает, как и при построчном upsert
+        incoming = {}
+        for ad_data in ads:
+            incoming[get_ad_id(ad_data)] = ad_data
+
+        stats = {'added': 0, 'changed': 0, 'skipped': 0}
+        now = datetime.now().isoformat()
+
+        with self._lock:
+            conn = self._connection()
+            known = self._known_hashes(conn, list(incoming))
+            rows = []
+            for ad_id, ad_data in incoming.items():
+                digest = ad_hash(ad_data)
+                previous = known.get(ad_id)
+                if previous == digest:
+                    stats['skipped'] += 1
+                    continue
+                stats['added' if previous is None else 'changed'] += 1
+                fragment = serialize_ad(
+                    title=ad_data['title'],
+                    description=ad_data['description'],
+                    price=ad_data['price'],
+                    images=ad_data.get('images', []),
+                    params=ad_data.get('params', {})
+                )
+                rows.append((ad_id, digest, fragment, now))
+
+            with conn:
+                conn.executemany(
+                    """
+                    INSERT INTO ads (ad_id, hash, fragment, updated_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(ad_id) DO UPDATE SET
+                        hash = excluded.hash,
+                        fragment = excluded.fragment,
+                        updated_at = excluded.updated_at
+                    """,
+                    rows
+                )
+
+        logger.info(
+            f"Ad store upsert: {stats['added']} added, "
+            f"{stats['changed']} changed, {stats['skipped']} skipped"
+        )
+        return stats
+
+    def delete(self, ad_ids: Iterable[str]) -> int:
+        """
+        Удаляет объявления по идентификаторам
+
+        Args:
+            ad_ids (Iterable[str]): Идентификаторы, неизвестные пропускаются
+
+        Returns:
+            int: Количество удаленных объявлений
+        """
+        ad_ids = list(dict.fromkeys(str(ad_id) for ad_id in ad_ids))
+        removed = 0
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                for start in range(0, len(ad_ids), LOOKUP_BATCH_SIZE):
+                    batch = ad_ids[start:start + LOOKUP_BATCH_SIZE]
+                    placeholders = ','.join('?' * len(batch))
+                    removed += conn.execute(
+                        f'DELETE FROM ads WHERE ad_id IN ({placeholders})', batch
+                    ).rowcount
+        if removed:
+            logger.info(f"Ad store delete: {removed} removed")
+        return removed
+
+    def prune(self, keep_ids: Iterable[str]) -> int:
+        """
+        Удаляет все объявления, кроме перечисленных
+
+        Используется при полной синхронизации: объявления, которых нет
+        в выгрузке каталога, сняты с продажи.
+
+        Args:
+            keep_ids (Iterable[str]): Идентификаторы объявлений каталога
+
+        Returns:
+            int: Количество удаленных объявлений
+        """
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                # Список может не поместиться в лимит переменных SQLite,
+                # поэтому идентификаторы складываются во временную таблицу
+                conn.execute('CREATE TEMP TABLE IF NOT EXISTS keep_ids (ad_id TEXT PRIMARY KEY)')
+                conn.execute('DELETE FROM keep_ids')
+                conn.executemany(
+                    'INSERT OR IGNORE INTO keep_ids (ad_id) VALUES (?)',
+                    ((str(ad_id),) for ad_id in keep_ids)
+                )
+                removed = conn.execute(
+                    'DELETE FROM ads WHERE ad_id NOT IN (SELECT ad_id FROM keep_ids)'
+                ).rowcount
+                conn.execute('DELETE FROM keep_ids')
+        if removed:
+            logger.info(f"Ad store prune: {removed} removed")
+        return removed
+
+    def export(
+        self,
+        filename: str,
+        category: Optional[str] = None,
+        directory: str = 'out_xml',
+        compress: bool = False
+    ) -> str:
+        """
+        Собирает фид из сохраненных фрагментов в порядке добавления объявлений
+
+        Args:
+            filename (str): Имя файла
+            category (str): Категория товара
+            directory (str): Директория для сохранения
+            compress (bool): Писать рядом сжатую копию <файл>.gz
+
+        Returns:
+            str: Путь к сохраненному файлу
+        """
+        with self._lock:
+            cursor = self._connection().execute('SELECT fragment FROM ads ORDER BY rowid')
+            with FeedWriter(filename, category=category, directory=directory, compress=compress) as feed:
+                while True:
+                    rows = cursor.fetchmany(LOOKUP_BATCH_SIZE)
+                    if not rows:
+                        break
+                    feed.write_fragment(b''.join(row[0] for row in rows), len(rows))
+        return feed.filepath
+
+    def count(self) -> int:
+        """Количество объявлений в хранилище"""
+        with self._lock:
+            return self._connection().execute('SELECT COUNT(*) FROM ads').fetchone()[0]
+
+    def close(self) -> None:
+        """Закрывает соединение с базой"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
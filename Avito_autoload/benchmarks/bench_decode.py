@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Замеры разбора тела массовой загрузки
+
+Сравниваются прежний путь (json.loads в словари и проверка только наличия
+полей циклом), decode_bulk (проверка типов словарей на месте) и создание
+объектов Ad из тех же словарей при разборе стандартным json и orjson. Для
+каждого варианта выводятся лучшее время из нескольких повторов, объявлений
+в секунду и память, которую занимают разобранные объявления (по
+tracemalloc, отдельным проходом).
+
+Запуск:
+    python benchmarks/bench_decode.py --sizes 10000,100000
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import ad_model
+from ad_model import Ad, decode_bulk
+from catalog import iter_catalog
+
+DEFAULT_SIZES = (10000, 100000)
+
+def decode_dicts(body: bytes, loads: Callable = json.loads) -> List[Dict]:
+    """Прежний разбор: словари и проверка только наличия полей"""
+    data = loads(body)
+    if 'category' not in data or 'ads' not in data:
+        raise ValueError('Missing required fields: category, ads')
+    for ad_data in data['ads']:
+        if not isinstance(ad_data, dict):
+            raise ValueError('Ad must be a JSON object')
+        for field in ('title', 'description', 'price'):
+            if field not in ad_data:
+                raise ValueError(f'Missing required field: {field}')
+    return data['ads']
+
+def decode_ads(body: bytes, use_orjson: bool, model: bool = False) -> List:
+    """Разбор decode_bulk с выбранным парсером JSON, при model=True — в объекты Ad"""
+    saved = ad_model.orjson
+    if not use_orjson:
+        ad_model.orjson = None
+    try:
+        ads = decode_bulk(body)[1]
+    finally:
+        ad_model.orjson = saved
+    return list(map(Ad.from_dict, ads)) if model else ads
+
+def variants() -> Dict[str, Callable[[bytes], List]]:
+    result = {
+        'dict_json': decode_dicts,
+        'bulk_json': lambda body: decode_ads(body, False),
+        'ad_json': lambda body: decode_ads(body, False, model=True),
+    }
+    if ad_model.orjson is not None:
+        result['dict_orjson'] = lambda body: decode_dicts(body, ad_model.orjson.loads)
+        result['bulk_orjson'] = lambda body: decode_ads(body, True)
+        result['ad_orjson'] = lambda body: decode_ads(body, True, model=True)
+    return result
+
+def measure(decode: Callable[[bytes], List], body: bytes, repeat: int) -> Dict[str, float]:
+    """Лучшее время разбора и память разобранных объявлений"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ads = decode(body)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+        del ads
+
+    tracemalloc.start()
+    ads = decode(body)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return {'seconds': best, 'ads': len(ads), 'retained_mb': retained / (1024 * 1024)}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='Размеры пакетов через запятую')
+    parser.add_argument('--repeat', type=int, default=5, help='Количество повторов каждого замера')
+    parser.add_argument('--output', help='Файл результатов JSON')
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'benchmark':<22} {'seconds':>9} {'ads/s':>11} {'memory':>9} {'vs dict_json':>13}")
+    for count in (int(size) for size in args.sizes.split(',')):
+        body = json.dumps(
+            {'category': 'Электроника', 'ads': list(iter_catalog(count))}, ensure_ascii=False
+        ).encode('utf-8')
+        baseline = None
+        for name, decode in variants().items():
+            result = measure(decode, body, args.repeat)
+            result['ads_per_second'] = count / result['seconds']
+            results[f'{name}/{count}'] = result
+            baseline = baseline or result
+            print(
+                f"{name + '/' + str(count):<22} {result['seconds']:>9.3f} {result['ads_per_second']:>11.0f} "
+                f"{result['retained_mb']:>8.1f}M {baseline['seconds'] / result['seconds']:>12.2f}x"
+            )
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
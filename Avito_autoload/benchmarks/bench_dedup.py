@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Замеры поиска дублей
+
+Синтетический каталог (описания берутся из общего набора, как шаблоны
+в реальных выгрузках) дополняется точными копиями и копиями с измененным
+словом. Для каждого размера выводятся время проверки индексом
+DuplicateIndex, объявлений в секунду, найденные дубли и память индекса.
+Для небольших размеров для сравнения замеряется попарное сравнение
+сигнатур каждого объявления со всеми предыдущими.
+
+Запуск:
+    python benchmarks/bench_dedup.py --sizes 10000,100000
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from catalog import make_catalog
+from dedup import DuplicateIndex, fingerprint, minhash, similarity
+
+DEFAULT_SIZES = (10000, 100000)
+
+def make_ads(count: int, duplicates: float = 0.05) -> List[Dict]:
+    """Каталог, в котором доля duplicates — точные или слегка измененные копии"""
+    rng = random.Random(42)
+    ads = make_catalog(count)
+    for i in rng.sample(range(count), int(count * duplicates)):
+        source = dict(ads[rng.randrange(count)])
+        if rng.random() < 0.5:
+            words = source['description'].split()
+            words[rng.randrange(len(words))] = 'измененное'
+            source['description'] = ' '.join(words)
+        ads[i] = source
+    return ads
+
+def run_index(ads: List[Dict]) -> Dict[str, float]:
+    index = DuplicateIndex()
+    start = time.perf_counter()
+    found = sum(index.add(ad, i) is not None for i, ad in enumerate(ads))
+    return {'seconds': time.perf_counter() - start, 'duplicates': found}
+
+def run_pairwise(ads: List[Dict], threshold: float = 0.8) -> Dict[str, float]:
+    start = time.perf_counter()
+    kept = []
+    found = 0
+    for ad in ads:
+        digest, tokens = fingerprint(ad)
+        signature = minhash(tokens)
+        if any(digest == d or (signature and s and similarity(signature, s) >= threshold) for d, s in kept):
+            found += 1
+        else:
+            kept.append((digest, signature))
+    return {'seconds': time.perf_counter() - start, 'duplicates': found}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='Размеры каталогов через запятую')
+    parser.add_argument('--pairwise-max', type=int, default=5000,
+                        help='Наибольший размер для попарного сравнения')
+    parser.add_argument('--output', help='Файл результатов JSON')
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'benchmark':<20} {'seconds':>9} {'ads/s':>9} {'duplicates':>11} {'memory':>9}")
+    for count in (int(size) for size in args.sizes.split(',')):
+        ads = make_ads(count)
+        variants = {'index': run_index}
+        if count <= args.pairwise_max:
+            variants['pairwise'] = run_pairwise
+        for name, run in variants.items():
+            result = run(ads)
+            result['ads_per_second'] = count / result['seconds']
+            if name == 'index':
+                tracemalloc.start()
+                index = DuplicateIndex()
+                for i, ad in enumerate(ads):
+                    index.add(ad, i)
+                result['index_mb'] = tracemalloc.get_traced_memory()[0] / (1024 * 1024)
+                tracemalloc.stop()
+                del index
+            results[f'{name}/{count}'] = result
+            print(
+                f"{name + '/' + str(count):<20} {result['seconds']:>9.2f} {result['ads_per_second']:>9.0f} "
+                f"{result['duplicates']:>11} {result.get('index_mb', 0):>8.1f}M"
+            )
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
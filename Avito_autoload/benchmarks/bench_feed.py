@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Замеры генерации и проверки фидов на синтетических каталогах
+
+Для каждого размера каталога и сценария (построение дерева, save_xml,
+сериализация объявлений через ElementTree и напрямую, потоковая запись
+FeedWriter с каждым сериализатором, запись шардами в один и во все процессы,
+проверка дерева и потоковая проверка файла)
+запускается отдельный процесс, чтобы пиковая память (RSS) одного
+сценария не влияла на другие. Результаты сохраняются в JSON; с --compare
+они сравниваются с прошлым запуском, и при падении скорости или росте
+памяти больше порога скрипт завершается с кодом 1.
+
+Запуск:
+    python benchmarks/bench_feed.py --sizes 1000,10000 --output before.json
+    python benchmarks/bench_feed.py --sizes 1000,10000 --compare before.json
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from catalog import iter_catalog, make_catalog
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+
+def _peak_rss_mb() -> float:
+    """Пиковый RSS текущего процесса в МБ"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux возвращает килобайты, macOS — байты
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _write_feed(count: int, serializer: Optional[str] = None) -> str:
+    from root_xml import FeedWriter
+    with FeedWriter('bench.xml', serializer=serializer) as feed:
+        feed.add_ads(iter_catalog(count))
+    return feed.filepath
+
+# Сценарий получает размер каталога, готовит данные (не замеряется)
+# и возвращает функцию, время и память которой замеряются
+def scenario_build_tree(count: int) -> Callable:
+    from root_xml import create_root_xml, add_ad_element
+    ads = make_catalog(count)
+
+    def run():
+        root = create_root_xml(None)
+        for ad_data in ads:
+            add_ad_element(root, **ad_data)
+    return run
+
+def scenario_save_xml(count: int) -> Callable:
+    from root_xml import create_root_xml, add_ad_element, save_xml
+    root = create_root_xml(None)
+    for ad_data in iter_catalog(count):
+        add_ad_element(root, **ad_data)
+    return lambda: save_xml(root, 'bench.xml')
+
+def _scenario_serialize(count: int, serializer: str) -> Callable:
+    from root_xml import get_serializer
+    from ad_model import Ad
+    serialize = get_serializer(serializer)
+    ads = [Ad.from_dict(ad_data) for ad_data in iter_catalog(count)]
+
+    def run():
+        for ad in ads:
+            serialize(ad.title, ad.description, ad.price, ad.images, ad.params)
+    return run
+
+def scenario_serialize_etree(count: int) -> Callable:
+    return _scenario_serialize(count, 'etree')
+
+def scenario_serialize_direct(count: int) -> Callable:
+    return _scenario_serialize(count, 'direct')
+
+def scenario_feed_writer(count: int) -> Callable:
+    # Генерация объявлений входит в замер: каталог не держится в памяти целиком.
+    # Сериализатор — по умолчанию (AVITO_XML_SERIALIZER)
+    return lambda: _write_feed(count)
+
+def scenario_feed_writer_etree(count: int) -> Callable:
+    return lambda: _write_feed(count, 'etree')
+
+def _scenario_sharded(count: int, workers: int) -> Callable:
+    from feed_shards import build_sharded_feed
+    from ad_model import Ad
+    ads = [Ad.from_dict(ad_data) for ad_data in iter_catalog(count)]
+    # Шардов не меньше, чем процессов у самого многоядерного варианта
+    shard_size = max(1, -(-count // (os.cpu_count() or 1)))
+    return lambda: build_sharded_feed(ads, 'bench', '.', shard_size=shard_size, workers=workers)
+
+def scenario_sharded_1(count: int) -> Callable:
+    return _scenario_sharded(count, 1)
+
+def scenario_sharded(count: int) -> Callable:
+    # Запуск пула процессов входит в замер
+    return _scenario_sharded(count, os.cpu_count())
+
+def scenario_validate_tree(count: int) -> Callable:
+    from utils import validate_xml
+    root = ET.parse(_write_feed(count)).getroot()
+
+    def run():
+        if not validate_xml(root):
+            raise RuntimeError('Синтетический фид не прошел проверку')
+    return run
+
+def scenario_validate_file(count: int) -> Callable:
+    from utils import validate_xml_file
+    path = _write_feed(count)
+
+    def run():
+        if not validate_xml_file(path)['valid']:
+            raise RuntimeError('Синтетический фид не прошел проверку')
+    return run
+
+SCENARIOS: Dict[str, Callable[[int], Callable]] = {
+    'build_tree': scenario_build_tree,
+    'save_xml': scenario_save_xml,
+    'serialize_etree': scenario_serialize_etree,
+    'serialize_direct': scenario_serialize_direct,
+    'feed_writer': scenario_feed_writer,
+    'feed_writer_etree': scenario_feed_writer_etree,
+    'sharded_1': scenario_sharded_1,
+    'sharded': scenario_sharded,
+    'validate_tree': scenario_validate_tree,
+    'validate_file': scenario_validate_file,
+}
+
+def run_worker(scenario: str, count: int) -> Dict:
+    """Замер одного сценария в текущем процессе"""
+    from loguru import logger
+    logger.remove()
+
+    run = SCENARIOS[scenario](count)
+    baseline_rss = _peak_rss_mb()
+    start = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - start
+    peak_rss = _peak_rss_mb()
+    return {
+        'scenario': scenario,
+        'ads': count,
+        'seconds': seconds,
+        'ads_per_second': count / seconds if seconds else 0.0,
+        'peak_rss_mb': round(peak_rss, 1),
+        'rss_delta_mb': round(peak_rss - baseline_rss, 1)
+    }
+
+def run_scenario(scenario: str, count: int, repeat: int) -> Dict:
+    """
+    Замер сценария в отдельных процессах
+
+    Из повторов берется лучшее время и наименьший пик памяти.
+    """
+    best = None
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            process = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--worker', scenario, '--ads', str(count)],
+                cwd=tmp_dir, capture_output=True, text=True
+            )
+        if process.returncode != 0:
+            raise RuntimeError(f'{scenario}/{count} завершился с ошибкой:\n{process.stderr}')
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        if best is None:
+            best = result
+        else:
+            if result['seconds'] < best['seconds']:
+                best.update(seconds=result['seconds'], ads_per_second=result['ads_per_second'])
+            best['peak_rss_mb'] = min(best['peak_rss_mb'], result['peak_rss_mb'])
+            best['rss_delta_mb'] = min(best['rss_delta_mb'], result['rss_delta_mb'])
+    return best
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(current: Dict, baseline: Dict, speed_threshold: float, memory_threshold: float) -> List[str]:
+    """
+    Сравнение с прошлым запуском
+
+    Args:
+        current (Dict): Результаты текущего запуска
+        baseline (Dict): Результаты прошлого запуска
+        speed_threshold (float): Допустимое падение ads/s (0.1 = 10%)
+        memory_threshold (float): Допустимый рост пикового RSS (0.1 = 10%)
+
+    Returns:
+        List[str]: Описания регрессий
+    """
+    regressions = []
+    print(f"\n{'benchmark':<24} {'ads/s before':>14} {'ads/s now':>12} {'change':>8} {'RSS before':>11} {'RSS now':>9}")
+    for key, result in current['results'].items():
+        before = baseline['results'].get(key)
+        if before is None:
+            continue
+        speed_change = result['ads_per_second'] / before['ads_per_second'] - 1
+        marks = []
+        if speed_change < -speed_threshold:
+            marks.append('SLOWER')
+        # Рост меньше 5 МБ не считается: это шум аллокатора
+        rss_growth = result['peak_rss_mb'] - before['peak_rss_mb']
+        if rss_growth > 5 and rss_growth > before['peak_rss_mb'] * memory_threshold:
+            marks.append('MORE MEMORY')
+        if marks:
+            regressions.append(f"{key}: {', '.join(marks)}")
+        print(
+            f"{key:<24} {before['ads_per_second']:>14.0f} {result['ads_per_second']:>12.0f} "
+            f"{speed_change:>+7.1%} {before['peak_rss_mb']:>10.1f}M {result['peak_rss_mb']:>8.1f}M"
+            f"  {' '.join(marks)}"
+        )
+    return regressions
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='Размеры каталогов через запятую')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Сценарии через запятую')
+    parser.add_argument('--repeat', type=int, default=1, help='Количество повторов каждого замера')
+    parser.add_argument('--output', default='bench_feed.json', help='Файл результатов')
+    parser.add_argument('--compare', help='Результаты прошлого запуска для сравнения')
+    parser.add_argument('--speed-threshold', type=float, default=0.1, help='Допустимое падение скорости')
+    parser.add_argument('--memory-threshold', type=float, default=0.1, help='Допустимый рост памяти')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--ads', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.ads)))
+        return
+
+    current = {
+        'meta': {
+            'commit': _git_commit(),
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'results': {}
+    }
+    print(f"{'benchmark':<24} {'seconds':>10} {'ads/s':>12} {'peak RSS':>10} {'phase RSS':>10}")
+    for count in (int(size) for size in args.sizes.split(',')):
+        for scenario in args.scenarios.split(','):
+            result = run_scenario(scenario, count, args.repeat)
+            key = f'{scenario}/{count}'
+            current['results'][key] = result
+            print(
+                f"{key:<24} {result['seconds']:>10.3f} {result['ads_per_second']:>12.0f} "
+                f"{result['peak_rss_mb']:>9.1f}M {result['rss_delta_mb']:>9.1f}M"
+            )
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(current, f, indent=2, ensure_ascii=False)
+    print(f"\nРезультаты сохранены в {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.speed_threshold, args.memory_threshold)
+        if regressions:
+            print('\nРегрессии:\n' + '\n'.join(regressions))
+            sys.exit(1)
+        print('\nРегрессий нет')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Сравнение проверки фида: validate_xml до правил категорий (три
+обязательных поля, ad.find на каждое) и текущий validate_xml со
+скомпилированными правилами
+
+Два фида: объявления без <Category> (правила '*', те же три поля, что
+и раньше) и объявления категории 'Телефоны', где кроме них проверяются
+Brand, Condition, диапазон цены и допустимые значения состояния. Во
+втором случае прежняя проверка делает меньше работы, и бенчмарк
+показывает цену полной проверки относительно нее.
+
+Запуск: python benchmarks/bench_validation.py --ads 20000
+"""
+
+import os
+import sys
+import time
+import argparse
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loguru import logger
+from utils import validate_xml
+
+def make_ads(count: int, category: bool = True) -> list:
+    """Синтетические объявления телефонов с типичным набором полей"""
+    ads = []
+    for i in range(count):
+        ad = ET.Element('Ad')
+        for tag, text in (
+            ('Id', str(i)),
+            ('Category', 'Телефоны' if category else None),
+            ('Title', f'iPhone {i}'),
+            ('Description', 'Отличное состояние, полный комплект' * 5),
+            ('Price', str(10000 + i)),
+            ('Brand', 'Apple'),
+            ('Model', 'iPhone 15'),
+            ('Condition', 'Б/у'),
+            ('Address', 'Москва'),
+            ('ContactPhone', '+79990000000'),
+        ):
+            if text is not None:
+                ET.SubElement(ad, tag).text = text
+        images = ET.SubElement(ad, 'Images')
+        for n in range(5):
+            ET.SubElement(images, 'Image', url=f'https://example.com/{i}_{n}.jpg')
+        ads.append(ad)
+    return ads
+
+def make_feed(count: int, category: bool = True) -> ET.Element:
+    root = ET.Element('Ads', formatVersion='3', target='Avito.ru')
+    root.extend(make_ads(count, category))
+    return root
+
+# Прежняя реализация utils.validate_xml / validate_ad без изменений
+
+def baseline_validate_xml(root: ET.Element) -> bool:
+    try:
+        if root.tag != 'Ads':
+            logger.error("Root element must be 'Ads'")
+            return False
+        if 'formatVersion' not in root.attrib:
+            logger.error("Missing 'formatVersion' attribute")
+            return False
+        if 'target' not in root.attrib:
+            logger.error("Missing 'target' attribute")
+            return False
+        for ad in root.findall('Ad'):
+            if not baseline_validate_ad(ad):
+                return False
+        return True
+    except Exception as e:
+        logger.error(f"Error validating XML: {str(e)}")
+        return False
+
+def baseline_validate_ad(ad: ET.Element) -> bool:
+    required_fields = ['Title', 'Description', 'Price']
+    for field in required_fields:
+        element = ad.find(field)
+        if element is None or not element.text:
+            logger.error(f"Missing required field: {field}")
+            return False
+    return True
+
+def measure(fn, root: ET.Element, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(root)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--ads', type=int, default=20000, help='Количество объявлений')
+    parser.add_argument('--repeat', type=int, default=5, help='Количество повторов')
+    args = parser.parse_args()
+
+    print(f"{'feed':<12} {'approach':<10} {'seconds':>10} {'ads/s':>12} {'relative':>9}")
+    for feed, category in (('no_category', False), ('phones', True)):
+        root = make_feed(args.ads, category)
+        assert baseline_validate_xml(root) and validate_xml(root)
+
+        results = {
+            'baseline': measure(baseline_validate_xml, root, args.repeat),
+            'rules': measure(validate_xml, root, args.repeat),
+        }
+        baseline = results['baseline']
+        for name, seconds in results.items():
+            print(f"{feed:<12} {name:<10} {seconds:>10.4f} {args.ads / seconds:>12.0f} {baseline / seconds:>8.2f}x")
+
+if __name__ == '__main__':
+    main()
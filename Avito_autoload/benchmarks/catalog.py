@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Синтетический каталог объявлений для замеров
+
+Объявления в формате MCP API (title, description, price, images, params)
+с распределениями, похожими на реальные выгрузки: описания от пары строк
+до нескольких тысяч символов, от 1 до 10 фото, кириллица и символы,
+требующие экранирования в XML. Каталог детерминирован при одном seed.
+"""
+
+import random
+from typing import Dict, Iterator, List
+
+# Категория и параметры, обязательные по category_rules.json
+CATEGORIES = (
+    ('Телефоны', {'Brand': ('Apple', 'Samsung', 'Xiaomi', 'Honor'), 'Condition': ('Новое', 'Б/у')}, (100, 300000)),
+    ('Ноутбуки', {'Brand': ('Lenovo', 'ASUS', 'HP', 'Apple'), 'Condition': ('Новое', 'Б/у')}, (500, 400000)),
+    ('Электроника', {'Condition': ('Новое', 'Б/у')}, (10, 200000)),
+    ('Одежда, обувь, аксессуары', {
+        'Condition': ('Новое с биркой', 'Отличное', 'Хорошее'),
+        'Size': ('S', 'M', 'L', 'XL', '42', '44')
+    }, (50, 50000)),
+)
+
+CITIES = ('Москва', 'Санкт-Петербург', 'Новосибирск', 'Екатеринбург', 'Казань', 'Нижний Новгород')
+
+WORDS = (
+    'отличное', 'состояние', 'полный', 'комплект', 'гарантия', 'чек', 'коробка',
+    'доставка', 'самовывоз', 'торг', 'уместен', 'оригинал', 'без', 'царапин',
+    'аккумулятор', 'держит', 'долго', 'пользовался', 'аккуратно', 'в', 'чехле',
+    '"как новый"', 'R&D', '<б/у>', 'цвет:', 'черный', 'серебристый', '128ГБ', '—'
+)
+
+def make_descriptions(rng: random.Random, count: int = 512) -> List[str]:
+    """
+    Набор описаний, из которого объявления берут текст
+    
+    Длина: чаще короткие, изредка длинные (до ~3000 символов). Описания
+    готовятся заранее, чтобы генерация не занимала заметную часть замера.
+    """
+    descriptions = []
+    for _ in range(count):
+        words = min(int(rng.expovariate(1 / 60)) + 5, 450)
+        descriptions.append(' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.')
+    return descriptions
+
+def make_ad(index: int, rng: random.Random, descriptions: List[str]) -> Dict:
+    """Одно объявление с номером index"""
+    category, options, (low, high) = CATEGORIES[index % len(CATEGORIES)]
+    params = {
+        'Id': f'bench-{index}',
+        'Category': category,
+        'Address': rng.choice(CITIES),
+        'ContactPhone': f'+7999{index % 10000000:07d}'
+    }
+    for key, values in options.items():
+        params[key] = rng.choice(values)
+    return {
+        'title': f'{category} #{index} {rng.choice(WORDS)}'[:50],
+        'description': rng.choice(descriptions),
+        'price': rng.randint(low, high),
+        'images': [
+            f'https://img.example.com/{index // 1000}/{index}_{n}.jpg'
+            for n in range(rng.randint(1, 10))
+        ],
+        'params': params
+    }
+
+def iter_catalog(count: int, seed: int = 42) -> Iterator[Dict]:
+    """
+    Генератор каталога без хранения объявлений в памяти
+
+    Args:
+        count (int): Количество объявлений
+        seed (int): Зерно генератора случайных чисел
+
+    Yields:
+        Dict: Объявление в формате MCP API
+    """
+    rng = random.Random(seed)
+    descriptions = make_descriptions(rng)
+    for index in range(count):
+        yield make_ad(index, rng, descriptions)
+
+def make_catalog(count: int, seed: int = 42) -> List[Dict]:
+    """Каталог списком, см. iter_catalog()"""
+    return list(iter_catalog(count, seed))
@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Нагрузочное тестирование HTTP API MCP сервиса
+
+По умолчанию поднимает локальный AvitoMCPService в отдельном процессе
+(во временной директории) и нагружает его смесью запросов create_ad,
+create_bulk_ads, create_bulk_ads_ndjson и health. Нагрузка идет ступенями:
+для каждой ступени задается число одновременных клиентов (--concurrency)
+или, в открытом режиме, темп запросов в секунду (--rate). Для каждой
+ступени выводятся пропускная способность, перцентили задержки, доля
+ошибок и память сервера (RSS сервиса вместе с дочерними процессами,
+снимается раз в --sample-interval секунд).
+
+В открытом режиме задержка считается от запланированного времени
+запроса, поэтому очередь на стороне клиента при перегрузке тоже видна
+в перцентилях.
+
+Запуск:
+    python benchmarks/load_mcp.py --concurrency 1,8,32 --duration 20
+    python benchmarks/load_mcp.py --rate 50,100,200 --mix create_ad=1 --max-p95 0.5
+    python benchmarks/load_mcp.py --url http://localhost:8080 --concurrency 16
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+SERVICE_DIR = os.path.join(ROOT_DIR, 'mcp_service')
+sys.path.insert(0, BENCH_DIR)
+
+from catalog import make_catalog
+
+REQUEST_PATHS = {
+    'create_ad': '/api/v1/create_ad',
+    'create_bulk_ads': '/api/v1/create_bulk_ads',
+    'create_bulk_ads_ndjson': '/api/v1/create_bulk_ads_ndjson',
+    'health': '/api/v1/health',
+}
+
+def parse_weights(spec: str, cast=str) -> List[Tuple]:
+    """
+    Разбор распределения вида 'create_ad=8,create_bulk_ads=2' или '10:0.6,100:0.4'
+
+    Returns:
+        List[Tuple]: Пары (значение, вес)
+    """
+    pairs = []
+    for item in spec.split(','):
+        key, _, weight = item.replace(':', '=').partition('=')
+        pairs.append((cast(key.strip()), float(weight or 1)))
+    return pairs
+
+def percentile(values: List[float], percent: float) -> float:
+    """Перцентиль по методу ближайшего ранга для отсортированного списка"""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+class Payloads:
+    """
+    Заранее сериализованные тела запросов
+
+    JSON готовится до начала замера, чтобы сериализация на стороне
+    клиента не ограничивала нагрузку.
+    """
+
+    def __init__(self, sizes: List[Tuple[int, float]], variants: int = 4, seed: int = 42):
+        self.sizes = sizes
+        self.rng = random.Random(seed)
+        max_size = max(size for size, _ in sizes)
+        catalog = make_catalog(max(max_size * 2, 256), seed)
+
+        self.single = []
+        for ad_data in catalog[:256]:
+            self.single.append((json.dumps(
+                dict(ad_data, category=ad_data['params']['Category']), ensure_ascii=False
+            ).encode('utf-8'), 1))
+
+        self.bulk: Dict[int, List[Tuple[bytes, int]]] = {}
+        self.ndjson: Dict[int, List[Tuple[bytes, int]]] = {}
+        for size, _ in sizes:
+            self.bulk[size] = []
+            self.ndjson[size] = []
+            for variant in range(variants):
+                offset = (variant * max_size // variants) % len(catalog)
+                ads = (catalog[offset:] + catalog[:offset])[:size]
+                self.bulk[size].append((json.dumps(
+                    {'category': 'Электроника', 'ads': ads}, ensure_ascii=False
+                ).encode('utf-8'), size))
+                self.ndjson[size].append((b'\n'.join(
+                    json.dumps(ad_data, ensure_ascii=False).encode('utf-8') for ad_data in ads
+                ) + b'\n', size))
+
+    def _size(self) -> int:
+        return self.rng.choices([size for size, _ in self.sizes], [w for _, w in self.sizes])[0]
+
+    def get(self, request_type: str) -> Tuple[Optional[bytes], int]:
+        """Тело запроса и количество объявлений в нем"""
+        if request_type == 'create_ad':
+            return self.rng.choice(self.single)
+        if request_type == 'create_bulk_ads':
+            return self.rng.choice(self.bulk[self._size()])
+        if request_type == 'create_bulk_ads_ndjson':
+            return self.rng.choice(self.ndjson[self._size()])
+        return None, 0
+
+def _read_rss_kb(pid: int) -> int:
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+def process_tree_rss_mb(pid: int) -> Optional[float]:
+    """RSS процесса вместе с дочерними (пул процессов сервиса), только Linux"""
+    total = 0
+    pids = [pid]
+    try:
+        while pids:
+            current = pids.pop()
+            total += _read_rss_kb(current)
+            try:
+                with open(f'/proc/{current}/task/{current}/children') as f:
+                    pids.extend(int(child) for child in f.read().split())
+            except OSError:
+                pass
+    except OSError:
+        return None
+    return total / 1024
+
+class RSSSampler:
+    """Периодический замер памяти сервера"""
+
+    def __init__(self, pid: Optional[int], interval: float):
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[Tuple[float, float]] = []
+        self._task = None
+        self._started = 0.0
+
+    async def _run(self):
+        while True:
+            rss = process_tree_rss_mb(self.pid)
+            if rss is not None:
+                self.samples.append((round(time.monotonic() - self._started, 2), round(rss, 1)))
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self.samples = []
+        self._started = time.monotonic()
+        if self.pid is not None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> List[Tuple[float, float]]:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        return self.samples
+
+async def send(session, url: str, request_type: str, payloads: Payloads, scheduled: float) -> Dict:
+    """
+    Один запрос
+
+    Args:
+        scheduled (float): Запланированное время отправки (time.monotonic),
+            от него считается задержка
+    """
+    import aiohttp
+
+    body, ads = payloads.get(request_type)
+    path = REQUEST_PATHS[request_type]
+    status = None
+    error = None
+    try:
+        if request_type == 'health':
+            response = await session.get(url + path)
+        elif request_type == 'create_bulk_ads_ndjson':
+            response = await session.post(
+                url + path, params={'category': 'Электроника'}, data=body,
+                headers={'Content-Type': 'application/x-ndjson'}
+            )
+        else:
+            response = await session.post(url + path, data=body, headers={'Content-Type': 'application/json'})
+        async with response:
+            await response.read()
+            status = response.status
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        error = type(e).__name__
+    return {
+        'type': request_type,
+        'latency': time.monotonic() - scheduled,
+        'ok': status is not None and status < 400,
+        'status': status or error,
+        'ads': ads
+    }
+
+async def run_stage(
+    url: str,
+    payloads: Payloads,
+    mix: List[Tuple[str, float]],
+    concurrency: int,
+    duration: float,
+    rate: Optional[float],
+    timeout: float,
+    seed: int
+) -> List[Dict]:
+    """
+    Ступень нагрузки
+
+    Без rate каждый из concurrency клиентов отправляет следующий запрос
+    сразу после ответа на предыдущий. С rate запросы планируются с равным
+    шагом, а concurrency ограничивает число одновременно открытых запросов.
+    """
+    import aiohttp
+
+    rng = random.Random(seed)
+    types = [request_type for request_type, _ in mix]
+    weights = [weight for _, weight in mix]
+    results: List[Dict] = []
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        deadline = time.monotonic() + duration
+
+        if rate is None:
+            async def client():
+                while time.monotonic() < deadline:
+                    request_type = rng.choices(types, weights)[0]
+                    results.append(await send(session, url, request_type, payloads, time.monotonic()))
+            await asyncio.gather(*(client() for _ in range(concurrency)))
+            return results
+
+        limit = asyncio.Semaphore(concurrency)
+
+        async def scheduled_request(request_type: str, scheduled: float):
+            async with limit:
+                results.append(await send(session, url, request_type, payloads, scheduled))
+
+        tasks = []
+        start = time.monotonic()
+        interval = 1 / rate
+        n = 0
+        while True:
+            scheduled = start + n * interval
+            if scheduled >= deadline:
+                break
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(
+                scheduled_request(rng.choices(types, weights)[0], scheduled)
+            ))
+            n += 1
+        await asyncio.gather(*tasks)
+    return results
+
+def summarize(results: List[Dict], seconds: float) -> Dict[str, Dict]:
+    """
+    Сводка ступени по типам запросов и общая ('total')
+
+    Returns:
+        Dict[str, Dict]: requests, rps, ads_per_second, p50/p95/p99/max (секунды),
+            errors, error_rate и статусы ошибок
+    """
+    groups: Dict[str, List[Dict]] = {}
+    for result in results:
+        groups.setdefault(result['type'], []).append(result)
+    groups['total'] = results
+
+    summary = {}
+    for name, items in groups.items():
+        latencies = sorted(item['latency'] for item in items)
+        errors = [item for item in items if not item['ok']]
+        error_statuses: Dict[str, int] = {}
+        for item in errors:
+            error_statuses[str(item['status'])] = error_statuses.get(str(item['status']), 0) + 1
+        summary[name] = {
+            'requests': len(items),
+            'rps': len(items) / seconds if seconds else 0.0,
+            'ads_per_second': sum(item['ads'] for item in items if item['ok']) / seconds if seconds else 0.0,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': latencies[-1] if latencies else 0.0,
+            'errors': len(errors),
+            'error_rate': len(errors) / len(items) if items else 0.0,
+            'error_statuses': error_statuses
+        }
+    return summary
+
+def print_stage(stage: Dict) -> None:
+    label = f"concurrency={stage['concurrency']}" + (f" rate={stage['rate']}/s" if stage['rate'] else '')
+    print(f"\n== {label}, {stage['seconds']:.1f} s")
+    print(f"{'request':<24} {'count':>7} {'rps':>8} {'ads/s':>9} {'p50, ms':>9} {'p95, ms':>9} "
+          f"{'p99, ms':>9} {'max, ms':>9} {'errors':>8}")
+    for name, stats in stage['summary'].items():
+        print(
+            f"{name:<24} {stats['requests']:>7} {stats['rps']:>8.1f} {stats['ads_per_second']:>9.0f} "
+            f"{stats['p50'] * 1000:>9.1f} {stats['p95'] * 1000:>9.1f} {stats['p99'] * 1000:>9.1f} "
+            f"{stats['max'] * 1000:>9.1f} {stats['error_rate']:>7.1%}"
+        )
+    if stage['rss']:
+        values = [rss for _, rss in stage['rss']]
+        print(f"server RSS: start {values[0]:.1f}M, max {max(values):.1f}M, end {values[-1]:.1f}M")
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(workdir: str, port: int) -> subprocess.Popen:
+    """Запуск локального сервиса в отдельном процессе и ожидание готовности"""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT_DIR, SERVICE_DIR, env.get('PYTHONPATH')]))
+    log = open(os.path.join(workdir, 'server.log'), 'wb')
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--serve', '--port', str(port)],
+        cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    with open(os.path.join(workdir, 'server.log'), encoding='utf-8', errors='replace') as f:
+        raise RuntimeError(f'Сервис не запустился:\n{f.read()[-2000:]}')
+
+def serve(port: int) -> None:
+    """Сервис с настройками из окружения, как в контейнере"""
+    from aiohttp import web
+    from loguru import logger
+    from avito_mcp import AvitoMCPService
+    from executors import FeedExecutor
+    from jobs import JobManager
+
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+    executor = FeedExecutor.from_env()
+    service = AvitoMCPService(host='127.0.0.1', port=port, executor=executor, jobs=JobManager.from_env(executor))
+    web.run_app(service.app, host='127.0.0.1', port=port, print=None)
+
+async def run(args) -> Dict:
+    mix = parse_weights(args.mix)
+    unknown = [request_type for request_type, _ in mix if request_type not in REQUEST_PATHS]
+    if unknown:
+        raise SystemExit(f"Неизвестные типы запросов: {', '.join(unknown)}")
+    sizes = parse_weights(args.bulk_sizes, int)
+    payloads = Payloads(sizes, seed=args.seed)
+
+    concurrency = [int(value) for value in args.concurrency.split(',')]
+    if args.rate:
+        stages = [(max(concurrency), float(rate)) for rate in args.rate.split(',')]
+    else:
+        stages = [(value, None) for value in concurrency]
+
+    report = {
+        'meta': {
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'url': args.url,
+            'mix': dict(mix),
+            'bulk_sizes': {str(size): weight for size, weight in sizes},
+            'duration': args.duration
+        },
+        'stages': []
+    }
+    sampler = RSSSampler(args.server_pid, args.sample_interval)
+    for index, (stage_concurrency, rate) in enumerate(stages):
+        sampler.start()
+        start = time.monotonic()
+        results = await run_stage(
+            args.url, payloads, mix, stage_concurrency, args.duration, rate, args.timeout, args.seed + index
+        )
+        seconds = time.monotonic() - start
+        stage = {
+            'concurrency': stage_concurrency,
+            'rate': rate,
+            'seconds': seconds,
+            'summary': summarize(results, seconds),
+            'rss': await sampler.stop()
+        }
+        report['stages'].append(stage)
+        print_stage(stage)
+    return report
+
+def check_thresholds(report: Dict, max_p95: Optional[float], max_error_rate: Optional[float]) -> List[str]:
+    """Ступени, превысившие допустимые задержку p95 или долю ошибок"""
+    failures = []
+    for stage in report['stages']:
+        total = stage['summary']['total']
+        label = f"concurrency={stage['concurrency']}" + (f" rate={stage['rate']}" if stage['rate'] else '')
+        if max_p95 is not None and total['p95'] > max_p95:
+            failures.append(f"{label}: p95 {total['p95']:.3f} s > {max_p95} s")
+        if max_error_rate is not None and total['error_rate'] > max_error_rate:
+            failures.append(f"{label}: ошибок {total['error_rate']:.1%} > {max_error_rate:.1%}")
+    return failures
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Адрес работающего сервиса; по умолчанию поднимается локальный')
+    parser.add_argument('--concurrency', default='1,8,32', help='Одновременные клиенты по ступеням')
+    parser.add_argument('--rate', help='Открытый режим: запросов в секунду по ступеням')
+    parser.add_argument('--duration', type=float, default=10, help='Длительность ступени в секундах')
+    parser.add_argument('--mix', default='create_ad=8,create_bulk_ads=2',
+                        help='Доли типов запросов: create_ad, create_bulk_ads, create_bulk_ads_ndjson, health')
+    parser.add_argument('--bulk-sizes', default='10:0.5,100:0.3,1000:0.15,5000:0.05',
+                        help='Распределение размеров пакетов: размер:вес')
+    parser.add_argument('--timeout', type=float, default=60, help='Таймаут запроса в секундах')
+    parser.add_argument('--sample-interval', type=float, default=0.5, help='Период замера памяти сервера')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Файл отчета JSON')
+    parser.add_argument('--max-p95', type=float, help='Допустимая задержка p95 в секундах')
+    parser.add_argument('--max-error-rate', type=float, help='Допустимая доля ошибок (0.01 = 1%%)')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port)
+        return
+
+    process = None
+    workdir = None
+    args.server_pid = None
+    if not args.url:
+        workdir = tempfile.TemporaryDirectory(prefix='mcp_load_')
+        port = _free_port()
+        process = start_server(workdir.name, port)
+        args.url = f'http://127.0.0.1:{port}'
+        args.server_pid = process.pid
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            workdir.cleanup()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nОтчет сохранен в {args.output}")
+
+    failures = check_thresholds(report, args.max_p95, args.max_error_rate)
+    if failures:
+        print('\nПревышены пороги:\n' + '\n'.join(failures))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
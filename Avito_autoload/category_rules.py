@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import math
+import xml.etree.ElementTree as ET
+from functools import lru_cache
+from operator import call
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from ad_model import parse_int
+
+# Правила, общие для всех категорий
+DEFAULT_CATEGORY = '*'
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'category_rules.json')
+
+# Проверка значения поля: возвращает текст ошибки или None (и для пустого значения)
+Checker = Callable[[Optional[str]], Optional[str]]
+# Быстрая проверка без сообщения: True, если значение точно подходит
+Validator = Callable[[Optional[str]], bool]
+
+def _parse_float(text: str) -> Optional[float]:
+    # Как и для int, цифры других алфавитов не принимаются
+    if not text.isascii():
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+# Разбор значения поля по типу: число или None, если значение не подходит
+_TYPES = {
+    'int': parse_int,
+    'float': _parse_float,
+    'str': None
+}
+
+def _compile_field(field: str, spec: Dict) -> Tuple[Checker, Validator]:
+    """
+    Компилирует описание поля в функции проверки
+
+    Args:
+        field (str): Тег поля
+        spec (Dict): Описание с ключами type, enum, min, max, max_length
+
+    Returns:
+        Tuple[Checker, Validator]: Проверка с сообщением об ошибке и быстрая
+            проверка для объявлений без ошибок
+    """
+    type_name = spec.get('type', 'str')
+    if type_name not in _TYPES:
+        raise ValueError(f"Unknown type '{type_name}' for field {field}")
+    # Диапазон для строкового поля проверяется как для числа
+    convert = _TYPES[type_name]
+    low = spec.get('min')
+    high = spec.get('max')
+    if convert is None and (low is not None or high is not None):
+        convert = _parse_float
+    allowed = frozenset(spec['enum']) if 'enum' in spec else None
+    allowed_text = ', '.join(spec.get('enum', []))
+    max_length = spec.get('max_length')
+
+    def check(value: Optional[str]) -> Optional[str]:
+        if not value:
+            return None
+        if convert is not None:
+            number = convert(value)
+            if number is None:
+                return f"Field {field} must be {type_name if type_name != 'str' else 'a number'}, got '{value}'"
+            if low is not None and number < low:
+                return f"Field {field} must be >= {low}"
+            if high is not None and number > high:
+                return f"Field {field} must be <= {high}"
+        if allowed is not None and value not in allowed:
+            return f"Field {field} must be one of: {allowed_text}"
+        if max_length is not None and len(value) > max_length:
+            return f"Field {field} must be at most {max_length} characters"
+        return None
+
+    if allowed is not None and convert is None and max_length is None:
+        # Только допустимые значения: проверка целиком в C
+        valid = allowed.union(('', None)).__contains__
+    elif type_name == 'int' and allowed is None and max_length is None:
+        low_bound = low if low is not None else -math.inf
+        high_bound = high if high is not None else math.inf
+
+        def valid(value: Optional[str]) -> bool:
+            # Только цифры без знака и пробелов, остальное разбирает check()
+            return not value or (value.isdigit() and value.isascii() and low_bound <= int(value) <= high_bound)
+    else:
+        def valid(value: Optional[str]) -> bool:
+            return check(value) is None
+
+    return check, valid
+
+class CompiledRules:
+    """
+    Скомпилированный набор правил одной категории
+
+    Каждое поле, упомянутое в правилах, описано одной записью
+    (тег, обязательность, проверка, быстрая проверка). Поля ищутся ad.findtext: поиск
+    идет в C и обходится дешевле, чем сбор всех дочерних элементов
+    в словарь на Python. Корректное объявление проверяется цепочками
+    map() без цикла на Python; по записям полей с сообщениями цикл
+    идет, только если найдена ошибка.
+    """
+
+    __slots__ = ('category', 'fields', 'required', 'checked', 'validators')
+
+    def __init__(
+        self,
+        category: str,
+        fields: Tuple[Tuple[str, bool, Optional[Checker], Optional[Validator]], ...]
+    ):
+        self.category = category
+        self.fields = fields
+        self.required = tuple(field for field, required, _, _ in fields if required)
+        self.checked = tuple(field for field, _, checker, _ in fields if checker is not None)
+        self.validators = tuple(valid for _, _, checker, valid in fields if checker is not None)
+
+    def check(self, ad: ET.Element) -> List[Tuple[str, str]]:
+        """
+        Проверяет элемент объявления
+
+        Args:
+            ad (ET.Element): Элемент объявления
+
+        Returns:
+            List[Tuple[str, str]]: Пары (поле, сообщение об ошибке) в порядке полей правил
+        """
+        find = ad.findtext
+        # Обычный случай — корректное объявление — проверяется без цикла на Python
+        if all(map(find, self.required)) and all(map(call, self.validators, map(find, self.checked))):
+            return []
+
+        errors = []
+        for field, required, checker, _ in self.fields:
+            value = find(field)
+            if not value:
+                if required:
+                    errors.append((field, f"Missing required field: {field}"))
+                continue
+            if checker is not None:
+                message = checker(value)
+                if message:
+                    errors.append((field, message))
+        return errors
+
+class CategoryRules:
+    """
+    Правила проверки объявлений, проиндексированные по категории
+
+    Правила категории дополняют общие правила '*': обязательные поля
+    объединяются, описания полей категории переопределяют общие.
+    """
+
+    def __init__(self, definitions: Dict[str, Dict]):
+        """
+        Args:
+            definitions (Dict[str, Dict]): Описание правил по категориям
+        """
+        base = definitions.get(DEFAULT_CATEGORY, {})
+        self.default = self._compile(DEFAULT_CATEGORY, base, {})
+        self.by_category: Dict[str, CompiledRules] = {
+            category: self._compile(category, spec, base)
+            for category, spec in definitions.items()
+            if category != DEFAULT_CATEGORY
+        }
+
+    @staticmethod
+    def _compile(category: str, spec: Dict, base: Dict) -> CompiledRules:
+        required = list(base.get('required', []))
+        required += [field for field in spec.get('required', []) if field not in required]
+        fields = dict(base.get('fields', {}))
+        fields.update(spec.get('fields', {}))
+        # Сначала обязательные поля в порядке описания, затем только проверяемые
+        order = required + [field for field in fields if field not in required]
+        compiled = tuple(
+            (field, field in required) + (_compile_field(field, fields[field]) if field in fields else (None, None))
+            for field in order
+        )
+        return CompiledRules(category, compiled)
+
+    @classmethod
+    def from_file(cls, path: str) -> 'CategoryRules':
+        """Загружает правила из JSON-файла"""
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def for_category(self, category: Optional[str]) -> CompiledRules:
+        """Возвращает правила категории или общие правила"""
+        return self.by_category.get(category, self.default)
+
+    def check_ad(self, ad: ET.Element, category: Optional[str] = None) -> List[Tuple[str, str]]:
+        """
+        Проверяет элемент объявления по правилам его категории
+
+        Args:
+            ad (ET.Element): Элемент объявления
+            category (str): Категория для объявлений без <Category>
+
+        Returns:
+            List[Tuple[str, str]]: Пары (поле, сообщение об ошибке)
+        """
+        return self.by_category.get(ad.findtext('Category') or category, self.default).check(ad)
+
+    def invalid_ads(
+        self,
+        ads: Iterable[ET.Element],
+        category: Optional[str] = None
+    ) -> Iterator[Tuple[ET.Element, List[Tuple[str, str]]]]:
+        """
+        Проверяет объявления фида и возвращает только ошибочные
+
+        То же, что check_ad для каждого объявления, но корректные объявления
+        проверяются прямо в цикле, без вызова методов на каждое.
+
+        Args:
+            ads (Iterable[ET.Element]): Элементы объявлений
+            category (str): Категория для объявлений без <Category>
+
+        Yields:
+            Tuple[ET.Element, List[Tuple[str, str]]]: Объявление и его ошибки
+        """
+        get_rules = self.by_category.get
+        default = self.default
+        for ad in ads:
+            find = ad.findtext
+            rules = get_rules(find('Category') or category, default)
+            if all(map(find, rules.required)) and all(map(call, rules.validators, map(find, rules.checked))):
+                continue
+            errors = rules.check(ad)
+            if errors:
+                yield ad, errors
+
+@lru_cache(maxsize=None)
+def load_rules(path: str = DEFAULT_RULES_PATH) -> CategoryRules:
+    """
+    Загружает и компилирует правила один раз на процесс
+
+    Args:
+        path (str): Путь к файлу правил
+
+    Returns:
+        CategoryRules: Скомпилированные правила
+    """
+    return CategoryRules.from_file(path)
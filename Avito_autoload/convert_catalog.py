@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Потоковая конвертация каталога CSV или Yandex YML в фид Авито
+
+Файл читается построчно (CSV) или по одному предложению (YML), строки
+делятся на пачки по chunk_size, и пачки преобразуются в XML в пуле
+процессов: сопоставление колонок, проверка моделью Ad и сериализация.
+Готовые пачки дописываются в фид FeedWriter в исходном порядке, в работе
+одновременно не больше двух пачек на процесс, поэтому память не зависит
+от размера каталога. Строки с ошибками пропускаются и попадают в отчет.
+
+Запуск:
+    python convert_catalog.py catalog.csv -o out_xml/avito.xml \\
+        --map title=Наименование --map price=Цена --map images=Фото \\
+        --map params.Brand=Бренд --default Condition=Новое
+    python convert_catalog.py catalog.yml -o out_xml/avito.xml --mapping mapping.json
+
+Сопоставление (JSON-файл --mapping или параметры --map поле=колонка):
+    title, description, price, images, id — колонки полей объявления
+        (id записывается в тег Id);
+    params — {"Тег XML": "колонка"};
+    defaults — {"Тег XML": "значение"} для тегов с одинаковым значением;
+    other_columns — true: остальные колонки становятся тегами с тем же
+        именем, false: не используются, строка: только колонки с этим
+        префиксом (префикс отбрасывается);
+    images_separator — разделитель ссылок на фото в одной колонке CSV.
+"""
+
+import os
+import sys
+import csv
+import time
+import argparse
+import json
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from loguru import logger
+from ad_model import Ad, AdValidationError
+from root_xml import FeedWriter, get_serializer
+
+# Сопоставление по умолчанию: колонки CSV названы как поля API
+CSV_MAPPING: Dict[str, Any] = {
+    'title': 'title',
+    'description': 'description',
+    'price': 'price',
+    'images': 'images',
+    'id': 'id',
+    'other_columns': True,
+    'images_separator': ','
+}
+
+# Сопоставление по умолчанию для предложений YML (<offer>)
+YML_MAPPING: Dict[str, Any] = {
+    'title': 'name',
+    'description': 'description',
+    'price': 'price',
+    'images': 'picture',
+    'id': 'id',
+    'params': {'Brand': 'vendor', 'Category': 'category'},
+    'other_columns': 'param:'
+}
+
+FIELDS = ('title', 'description', 'price', 'images', 'id')
+# Сколько ошибок хранить в отчете (счетчик учитывает все)
+MAX_REPORTED_ERRORS = 100
+
+def detect_format(path: str) -> str:
+    """Формат по расширению файла: csv или yml"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.yml', '.yaml', '.xml'):
+        return 'yml'
+    if ext in ('.csv', '.tsv', '.txt'):
+        return 'csv'
+    raise ValueError(f'Unknown catalog format: {path}')
+
+def iter_csv_rows(path: str, delimiter: Optional[str] = None, encoding: str = 'utf-8-sig') -> Iterator[Dict[str, str]]:
+    """
+    Строки CSV как словари колонка -> значение
+
+    Args:
+        path (str): Путь к файлу
+        delimiter (str): Разделитель; по умолчанию определяется по началу файла
+        encoding (str): Кодировка (выгрузки 1С часто в cp1251)
+    """
+    with open(path, newline='', encoding=encoding) as f:
+        if delimiter is None:
+            sample = f.read(64 * 1024)
+            f.seek(0)
+            try:
+                delimiter = csv.Sniffer().sniff(sample, delimiters=',;\t|').delimiter
+            except csv.Error:
+                delimiter = ','
+        yield from csv.DictReader(f, delimiter=delimiter)
+
+def iter_yml_offers(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Предложения Yandex YML как словари
+
+    Атрибуты <offer> и текст дочерних тегов становятся колонками,
+    все <picture> — списком в колонке picture, <param name="X"> — колонкой
+    param:X, а categoryId дополняется названием категории (колонка category).
+    Разобранные предложения удаляются из дерева, поэтому память не растет
+    с числом предложений.
+    """
+    categories: Dict[str, str] = {}
+    offers = None
+    for event, elem in ET.iterparse(path, events=('start', 'end')):
+        if event == 'start':
+            if elem.tag == 'offers':
+                offers = elem
+            continue
+        if elem.tag == 'category' and offers is None:
+            categories[elem.get('id')] = (elem.text or '').strip()
+        elif elem.tag == 'offer':
+            row: Dict[str, Any] = dict(elem.attrib)
+            pictures = []
+            for child in elem:
+                text = (child.text or '').strip()
+                if child.tag == 'picture':
+                    pictures.append(text)
+                elif child.tag == 'param':
+                    row[f"param:{child.get('name')}"] = text
+                else:
+                    row[child.tag] = text
+            row['picture'] = pictures
+            if 'categoryId' in row:
+                row['category'] = categories.get(row['categoryId'], '')
+            yield row
+            if offers is not None:
+                offers.clear()
+
+def iter_rows(path: str, fmt: Optional[str] = None, **options) -> Iterator[Dict[str, Any]]:
+    """Строки каталога в формате fmt (по умолчанию по расширению)"""
+    fmt = fmt or detect_format(path)
+    if fmt == 'csv':
+        return iter_csv_rows(path, **options)
+    if fmt == 'yml':
+        return iter_yml_offers(path)
+    raise ValueError(f'Unknown catalog format: {fmt}')
+
+def default_mapping(fmt: str) -> Dict[str, Any]:
+    """Копия сопоставления по умолчанию для формата"""
+    return json.loads(json.dumps(YML_MAPPING if fmt == 'yml' else CSV_MAPPING))
+
+def parse_price(value: Any) -> Any:
+    """
+    Цена из текста каталога: пробелы убираются, запятая считается
+    десятичным разделителем, копейки округляются до рубля
+    """
+    if type(value) is not str:
+        return value
+    text = value.replace('\xa0', '').replace(' ', '').replace(',', '.')
+    try:
+        return round(float(text))
+    except (ValueError, OverflowError):
+        # inf, nan и 1e400 тоже не цена; сообщение об ошибке сформирует
+        # проверка модели, и пропущена будет только эта строка
+        return value
+
+def row_to_ad(row: Dict[str, Any], mapping: Dict[str, Any]) -> Ad:
+    """
+    Объявление из строки каталога
+
+    Raises:
+        AdValidationError: Нет обязательной колонки или неверное значение
+    """
+    data: Dict[str, Any] = {}
+    for field in FIELDS:
+        column = mapping.get(field)
+        if column and row.get(column) not in (None, ''):
+            data[field] = row[column]
+    if 'price' in data:
+        data['price'] = parse_price(data['price'])
+    images = data.get('images')
+    if type(images) is str:
+        separator = mapping.get('images_separator', ',')
+        data['images'] = [url.strip() for url in images.split(separator) if url.strip()]
+
+    params = dict(mapping.get('defaults') or {})
+    other = mapping.get('other_columns', False)
+    if other:
+        used = {mapping.get(field) for field in FIELDS}
+        used.update((mapping.get('params') or {}).values())
+        prefix = other if isinstance(other, str) else ''
+        for column, value in row.items():
+            if column and column not in used and column.startswith(prefix) and value not in (None, ''):
+                params[column[len(prefix):]] = value
+    for tag, column in (mapping.get('params') or {}).items():
+        value = row.get(column)
+        if value not in (None, ''):
+            params[tag] = value
+    # Идентификатор попадает в фид тегом Id
+    if 'id' in data and 'Id' not in params:
+        params['Id'] = data['id']
+    data['params'] = params
+    return Ad.from_dict(data)
+
+def convert_chunk(
+    start: int,
+    rows: List[Dict[str, Any]],
+    mapping: Dict[str, Any],
+    serializer: Optional[str] = None
+) -> Tuple[bytes, int, List[Tuple[int, str]]]:
+    """
+    Преобразует пачку строк в фрагмент фида
+
+    Функция уровня модуля, чтобы ее можно было выполнять в пуле процессов.
+
+    Args:
+        start (int): Номер первой строки пачки (строки данных с единицы,
+            для YML — номер предложения)
+        rows (List[Dict]): Строки каталога
+        mapping (Dict): Сопоставление колонок
+        serializer (str): etree или direct
+
+    Returns:
+        Tuple[bytes, int, List]: XML объявлений пачки, их количество и
+            ошибки (номер строки, сообщение)
+    """
+    serialize = get_serializer(serializer)
+    fragments = []
+    errors = []
+    for number, row in enumerate(rows, start):
+        try:
+            ad = row_to_ad(row, mapping)
+            fragments.append(serialize(ad.title, ad.description, ad.price, ad.images, ad.params))
+        except (AdValidationError, ValueError, TypeError) as e:
+            errors.append((number, str(e)))
+    return b''.join(fragments), len(fragments), errors
+
+def _chunks(rows: Iterable[Dict], size: int) -> Iterator[Tuple[int, List[Dict]]]:
+    rows = iter(rows)
+    start = 1
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+def convert_catalog(
+    path: str,
+    output: str,
+    fmt: Optional[str] = None,
+    mapping: Optional[Dict[str, Any]] = None,
+    chunk_size: int = 5000,
+    workers: Optional[int] = None,
+    executor: Optional[Executor] = None,
+    compress: bool = False,
+    serializer: Optional[str] = None,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    **options
+) -> Dict[str, Any]:
+    """
+    Конвертирует каталог в фид
+
+    Args:
+        path (str): Файл каталога CSV или YML
+        output (str): Путь к файлу фида
+        fmt (str): csv или yml, по умолчанию по расширению
+        mapping (Dict): Сопоставление колонок, по умолчанию для формата
+        chunk_size (int): Строк в пачке
+        workers (int): Процессов нового пула
+        executor (Executor): Пул для преобразования пачек, по умолчанию новый пул процессов
+        compress (bool): Писать рядом сжатую копию .gz
+        serializer (str): etree или direct
+        progress (Callable): Вызывается после записи каждой пачки со статистикой
+        **options: Параметры чтения CSV (delimiter, encoding)
+
+    Returns:
+        Dict[str, Any]: Статистика: строки, объявления, ошибки, время,
+            строк в секунду и статистика записи фида
+    """
+    fmt = fmt or detect_format(path)
+    mapping = mapping or default_mapping(fmt)
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    # Не больше двух пачек на процесс в работе, чтобы чтение не обгоняло запись
+    max_in_flight = 2 * (workers or os.cpu_count() or 1)
+    stats: Dict[str, Any] = {'rows': 0, 'ads': 0, 'error_count': 0, 'errors': []}
+    start_time = time.perf_counter()
+    pending: deque = deque()
+
+    def write_result(feed: FeedWriter) -> None:
+        rows, future = pending.popleft()
+        data, count, errors = future.result()
+        if count:
+            feed.write_fragment(data, count)
+        stats['rows'] += rows
+        stats['ads'] += count
+        stats['error_count'] += len(errors)
+        stats['errors'].extend(errors[:MAX_REPORTED_ERRORS - len(stats['errors'])])
+        seconds = time.perf_counter() - start_time
+        stats['seconds'] = seconds
+        stats['rows_per_second'] = stats['rows'] / seconds if seconds else 0.0
+        if progress:
+            progress(stats)
+
+    try:
+        with FeedWriter(
+            os.path.basename(output), directory=os.path.dirname(output) or '.',
+            compress=compress, serializer=serializer
+        ) as feed:
+            for start, chunk in _chunks(iter_rows(path, fmt, **options), chunk_size):
+                pending.append((len(chunk), executor.submit(convert_chunk, start, chunk, mapping, serializer)))
+                if len(pending) >= max_in_flight:
+                    write_result(feed)
+            while pending:
+                write_result(feed)
+    finally:
+        for _, future in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown()
+    seconds = time.perf_counter() - start_time
+    stats.update(
+        seconds=seconds,
+        rows_per_second=stats['rows'] / seconds if seconds else 0.0,
+        feed=feed.stats
+    )
+    return stats
+
+def parse_mapping(items: Iterable[str], mapping: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Дополняет сопоставление параметрами --map поле=колонка
+
+    Поле params.Тег задает колонку тега XML.
+    """
+    for item in items:
+        field, sep, column = item.partition('=')
+        if not sep or not field:
+            raise ValueError(f'Mapping must look like field=column: {item}')
+        if field.startswith('params.'):
+            mapping.setdefault('params', {})[field[len('params.'):]] = column
+        elif field in FIELDS:
+            mapping[field] = column
+        else:
+            raise ValueError(f'Unknown field {field}, expected one of {", ".join(FIELDS)} or params.<Tag>')
+    return mapping
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='Файл каталога CSV или YML')
+    parser.add_argument('-o', '--output', required=True, help='Файл фида')
+    parser.add_argument('--format', choices=('csv', 'yml'), help='Формат, по умолчанию по расширению')
+    parser.add_argument('--mapping', help='JSON-файл сопоставления колонок')
+    parser.add_argument('--map', action='append', default=[], metavar='FIELD=COLUMN',
+                        help='Колонка поля (title, price, ...) или тега (params.Brand)')
+    parser.add_argument('--default', action='append', default=[], metavar='TAG=VALUE',
+                        help='Одинаковое значение тега для всех объявлений')
+    parser.add_argument('--no-other-columns', action='store_true',
+                        help='Не переносить остальные колонки CSV в теги')
+    parser.add_argument('--delimiter', help='Разделитель CSV, по умолчанию определяется')
+    parser.add_argument('--encoding', default='utf-8-sig', help='Кодировка CSV')
+    parser.add_argument('--images-separator', help='Разделитель ссылок на фото в колонке CSV')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Строк в пачке')
+    parser.add_argument('--workers', type=int, help='Процессов, по умолчанию по числу ядер')
+    parser.add_argument('--gzip', action='store_true', help='Писать рядом сжатую копию .gz')
+    parser.add_argument('--serializer', choices=('etree', 'direct'), help='Сериализатор XML')
+    parser.add_argument('--report', help='Файл отчета JSON со статистикой и ошибками')
+    args = parser.parse_args(argv)
+
+    fmt = args.format or detect_format(args.input)
+    if args.mapping:
+        with open(args.mapping, encoding='utf-8') as f:
+            mapping = dict(default_mapping(fmt), **json.load(f))
+    else:
+        mapping = default_mapping(fmt)
+    try:
+        parse_mapping(args.map, mapping)
+        for item in args.default:
+            tag, sep, value = item.partition('=')
+            if not sep or not tag:
+                raise ValueError(f'Default must look like tag=value: {item}')
+            mapping.setdefault('defaults', {})[tag] = value
+    except ValueError as e:
+        parser.error(str(e))
+    if args.no_other_columns:
+        mapping['other_columns'] = False
+    if args.images_separator:
+        mapping['images_separator'] = args.images_separator
+    options = {'delimiter': args.delimiter, 'encoding': args.encoding} if fmt == 'csv' else {}
+
+    last_report = [0.0]
+
+    def report_progress(stats: Dict[str, Any]) -> None:
+        # Не чаще раза в секунду
+        if stats['seconds'] - last_report[0] < 1:
+            return
+        last_report[0] = stats['seconds']
+        logger.info(
+            f"Обработано строк: {stats['rows']}, объявлений: {stats['ads']}, "
+            f"ошибок: {stats['error_count']}, {stats['rows_per_second']:.0f} строк/с"
+        )
+
+    stats = convert_catalog(
+        args.input, args.output, fmt, mapping, chunk_size=args.chunk_size, workers=args.workers,
+        compress=args.gzip, serializer=args.serializer, progress=report_progress, **options
+    )
+    for number, error in stats['errors'][:10]:
+        logger.warning(f"Строка {number}: {error}")
+    logger.info(
+        f"Фид {stats['feed']['file']}: {stats['ads']} объявлений из {stats['rows']} строк "
+        f"за {stats['seconds']:.1f} с ({stats['rows_per_second']:.0f} строк/с), ошибок: {stats['error_count']}"
+    )
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False, indent=2)
+    return 0 if stats['ads'] or not stats['rows'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Поиск повторяющихся и почти одинаковых объявлений
+
+Авито отклоняет дубли и может заблокировать аккаунт за них, поэтому перед
+записью фида объявления проверяются по индексу в памяти:
+
+- точные дубли — по хешу нормализованных заголовка, описания и набора фото;
+- почти одинаковые — по MinHash-сигнатуре множества пар соседних слов
+  заголовка и описания и ссылок на фото. Сигнатуры раскладываются по
+  корзинам LSH (bands полос по rows значений), и объявление сравнивается
+  только с объявлениями из своих корзин, а не со всеми предыдущими.
+
+Сигнатура строится хешированием с одной перестановкой (one permutation
+hashing): каждый шингл хешируется один раз и попадает в одну из num_perm
+ячеек, пустые ячейки заполняются соседними (densification). Кандидаты из
+корзин сравниваются не больше max_candidates штук (сначала попавшие в
+большее число корзин), а сигнатуры в индексе хранятся одним целым числом:
+совпадающие значения считаются XOR и подсчетом нулевых байтов на уровне C.
+Стоимость проверки объявления зависит от длины его текста, но не от
+размера индекса.
+
+Хеши шинглов — встроенный hash() строк, поэтому сигнатуры действительны
+только внутри процесса, где построен индекс.
+"""
+
+import re
+import hashlib
+from array import array
+from collections import Counter
+from operator import eq
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple, Union
+from ad_model import Ad
+
+# Режимы обработки дублей: пометить в отчете или исключить из фида
+DEDUP_MODES = ('flag', 'drop')
+
+_WORD = re.compile(r'\w+')
+
+def normalize(text: str) -> List[str]:
+    """Слова текста в нижнем регистре без знаков препинания (ё заменяется на е)"""
+    return _WORD.findall(text.lower().replace('ё', 'е'))
+
+def fingerprint(ad: Union[Ad, Dict]) -> Tuple[bytes, set]:
+    """
+    Отпечатки объявления
+
+    Returns:
+        Tuple[bytes, set]: Хеш для точных дублей (регистр, пунктуация,
+            пробелы и порядок фото не учитываются) и шинглы для почти
+            одинаковых: пары соседних слов заголовка и описания и ссылки на фото
+    """
+    title = normalize(ad['title'])
+    description = normalize(ad['description'])
+    images = ad.get('images') or ()
+    text = '\x00'.join((' '.join(title), ' '.join(description), '\x00'.join(sorted(images))))
+    digest = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+    words = title + description
+    tokens = set(words) if len(words) < 2 else set(map(' '.join, zip(words, words[1:])))
+    tokens.update('\x00img ' + url for url in images)
+    return digest, tokens
+
+def minhash(tokens: Iterable[str], num_perm: int = 64) -> Optional[array]:
+    """
+    MinHash-сигнатура множества строк
+
+    Args:
+        tokens (Iterable[str]): Шинглы
+        num_perm (int): Длина сигнатуры, степень двойки
+
+    Returns:
+        Optional[array]: Сигнатура (32-битные значения) или None для пустого множества
+    """
+    bits = num_perm.bit_length() - 1
+    cell = num_perm - 1
+    # Ячейка — младшие биты хеша; при записи по убыванию в ячейке
+    # остается минимальный хеш
+    bins = {h & cell: h >> bits for h in sorted(map(hash, tokens), reverse=True)}
+    if not bins:
+        return None
+    if len(bins) == num_perm:
+        return array('I', [bins[i] & 0xFFFFFFFF for i in range(num_perm)])
+
+    # Пустая ячейка берет значение ближайшей непустой справа (по кругу)
+    # со сдвигом на расстояние, чтобы разные ячейки не совпадали случайно
+    first = min(bins)
+    signature = [0] * num_perm
+    source, distance = bins[first], first + 1
+    for i in range(num_perm - 1, -1, -1):
+        value = bins.get(i)
+        if value is not None:
+            source, distance = value, 0
+        signature[i] = (source + distance * 0x9E3779B1) & 0xFFFFFFFF
+        distance += 1
+    return array('I', signature)
+
+def similarity(a: Sequence[int], b: Sequence[int]) -> float:
+    """Оценка сходства Жаккара по двум сигнатурам"""
+    return sum(map(eq, a, b)) / len(a)
+
+def _packed(signature: array) -> int:
+    # Сигнатура одним числом: XOR двух таких чисел сравнивает все значения сразу
+    return int.from_bytes(signature.tobytes(), 'little')
+
+def _lane_masks(num_perm: int) -> Tuple[int, int]:
+    # Младший байт каждого 32-битного значения и общее число байтов
+    return int.from_bytes(b'\xff\x00\x00\x00' * num_perm, 'little'), num_perm * 4
+
+class DuplicateIndex:
+    """
+    Индекс объявлений для поиска дублей
+
+    Объявления добавляются по одному; для каждого возвращается уже
+    добавленное объявление, дублем которого оно является, или None.
+
+        index = DuplicateIndex(threshold=0.8)
+        for position, ad in enumerate(ads):
+            match = index.add(ad, position)
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 64,
+        bands: int = 8,
+        rows: int = 4,
+        max_bucket_size: int = 32,
+        max_candidates: int = 64
+    ):
+        """
+        Args:
+            threshold (float): Минимальное сходство почти одинаковых объявлений (0..1)
+            num_perm (int): Длина сигнатуры, степень двойки
+            bands (int): Количество полос LSH
+            rows (int): Значений сигнатуры в полосе; bands * rows <= num_perm.
+                С 8 полосами по 4 значения объявления со сходством 0.8
+                попадают в общую корзину с вероятностью 98.5%
+            max_bucket_size (int): Сколько объявлений хранить в корзине. Похожие,
+                но не совпадающие объявления (один шаблон описания) копятся в
+                общих корзинах; ограничение сохраняет время проверки постоянным
+                ценой возможного пропуска дубля поздних объявлений такой группы
+            max_candidates (int): Сколько объявлений из корзин сравнивать
+                с проверяемым; при большем числе берутся попавшие в большее
+                число общих корзин, то есть наиболее вероятные дубли
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError('threshold must be in (0, 1]')
+        if num_perm & (num_perm - 1) or bands * rows > num_perm:
+            raise ValueError('num_perm must be a power of two and at least bands * rows')
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = rows
+        self.max_bucket_size = max_bucket_size
+        self.max_candidates = max_candidates
+        self._exact: Dict[bytes, Hashable] = {}
+        # Корзина LSH -> номер объявления или список номеров
+        self._buckets: Dict[int, Union[int, List[int]]] = {}
+        # Сигнатуры, упакованные _packed (0 для объявлений без текста и фото)
+        self._signatures: List[int] = []
+        self._lane_mask, self._signature_bytes = _lane_masks(num_perm)
+        # Порог в совпадающих значениях: сравнение целых без деления в цикле
+        self._min_equal = next(k for k in range(num_perm + 1) if k / num_perm >= threshold)
+        self._keys: List[Hashable] = []
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _band_keys(self, signature: array) -> List[int]:
+        data = signature.tobytes()
+        width = self.rows * signature.itemsize
+        return [hash((band, data[band * width:(band + 1) * width])) for band in range(self.bands)]
+
+    def _match(
+        self,
+        digest: bytes,
+        signature: Optional[array],
+        band_keys: List[int]
+    ) -> Optional[Dict[str, Any]]:
+        key = self._exact.get(digest)
+        if key is not None:
+            return {'duplicate_of': key, 'similarity': 1.0, 'exact': True}
+        if signature is None:
+            return None
+        hits = []
+        for band_key in band_keys:
+            bucket = self._buckets.get(band_key)
+            if bucket is None:
+                continue
+            if type(bucket) is int:
+                hits.append(bucket)
+            else:
+                hits.extend(bucket)
+        if not hits:
+            return None
+        if len(hits) <= self.max_candidates:
+            # Каждый кандидат сравнивается один раз, в порядке корзин
+            candidates = dict.fromkeys(hits)
+        else:
+            candidates = [number for number, _ in Counter(hits).most_common(self.max_candidates)]
+
+        query = _packed(signature)
+        mask = self._lane_mask
+        size = self._signature_bytes
+        # Три старших байта каждого значения после маски всегда нулевые
+        padding = 3 * self.num_perm
+        needed = self._min_equal + padding
+        signatures = self._signatures
+        for candidate in candidates:
+            diff = query ^ signatures[candidate]
+            # Младший байт значения собирает все его байты: ноль — значения совпали
+            diff = (diff | diff >> 8 | diff >> 16 | diff >> 24) & mask
+            zeros = diff.to_bytes(size, 'little').count(0)
+            # Первого похожего достаточно: дубли в индекс не попадают,
+            # поэтому найденное объявление — оригинал
+            if zeros >= needed:
+                score = (zeros - padding) / self.num_perm
+                return {'duplicate_of': self._keys[candidate], 'similarity': score, 'exact': False}
+        return None
+
+    def check(self, ad: Union[Ad, Dict]) -> Optional[Dict[str, Any]]:
+        """
+        Поиск дубля без добавления в индекс
+
+        Returns:
+            Optional[Dict]: Ключ найденного объявления (duplicate_of), оценка
+                сходства (similarity) и признак точного дубля (exact) или None
+        """
+        digest, tokens = fingerprint(ad)
+        signature = minhash(tokens, self.num_perm)
+        band_keys = self._band_keys(signature) if signature is not None else []
+        return self._match(digest, signature, band_keys)
+
+    def add(self, ad: Union[Ad, Dict], key: Hashable) -> Optional[Dict[str, Any]]:
+        """
+        Проверяет объявление и добавляет его в индекс, если оно не дубль
+
+        Args:
+            ad (Union[Ad, Dict]): Объявление
+            key (Hashable): Ключ объявления в отчете (позиция, номер строки, Id)
+
+        Returns:
+            Optional[Dict]: Найденный дубль, как в check()
+        """
+        digest, tokens = fingerprint(ad)
+        signature = minhash(tokens, self.num_perm)
+        band_keys = self._band_keys(signature) if signature is not None else []
+        match = self._match(digest, signature, band_keys)
+        if match is not None:
+            # Дубли не добавляются: следующие копии сравниваются с оригиналом
+            return match
+
+        number = len(self._keys)
+        self._keys.append(key)
+        self._signatures.append(_packed(signature) if signature is not None else 0)
+        self._exact[digest] = key
+        for band_key in band_keys:
+            bucket = self._buckets.get(band_key)
+            if bucket is None:
+                self._buckets[band_key] = number
+            elif type(bucket) is int:
+                self._buckets[band_key] = [bucket, number]
+            elif len(bucket) < self.max_bucket_size:
+                bucket.append(number)
+        return None
+
+def dedup_ads(
+    ads: Sequence[Union[Ad, Dict]],
+    mode: str = 'flag',
+    threshold: float = 0.8,
+    index: Optional[DuplicateIndex] = None,
+    keys: Optional[Sequence[Hashable]] = None
+) -> Tuple[List[Union[Ad, Dict]], List[Dict[str, Any]]]:
+    """
+    Проверка пачки объявлений на дубли
+
+    Args:
+        ads (Sequence[Union[Ad, Dict]]): Объявления
+        mode (str): flag — оставить дубли и вернуть отчет, drop — исключить дубли
+        threshold (float): Минимальное сходство почти одинаковых объявлений
+        index (DuplicateIndex): Индекс для проверки нескольких пачек подряд
+        keys (Sequence[Hashable]): Ключи объявлений в отчете, по умолчанию позиции
+
+    Returns:
+        Tuple[List, List[Dict]]: Объявления для фида и отчет: ключ дубля
+            (index), ключ найденного объявления (duplicate_of), similarity,
+            exact и заголовок
+    """
+    if mode not in DEDUP_MODES:
+        raise ValueError(f'Unknown dedup mode: {mode}, expected one of {", ".join(DEDUP_MODES)}')
+    if index is None:
+        index = DuplicateIndex(threshold)
+    kept = []
+    report = []
+    for position, ad in enumerate(ads):
+        key = keys[position] if keys is not None else position
+        match = index.add(ad, key)
+        if match is None:
+            kept.append(ad)
+            continue
+        report.append({'index': key, **match, 'title': ad['title']})
+        if mode == 'flag':
+            kept.append(ad)
+    return kept, report
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import json
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+from ad_model import Ad, ad_fields
+from root_xml import FeedWriter, ROOT_CLOSE_TAG, get_serializer
+from utils import create_directory
+
+# Поля записи о файле шарда в манифесте
+PART_FIELDS = ('index', 'part', 'file', 'ads', 'bytes', 'sha256')
+
+def shard_filename(base: str, index: int, part: int = 0) -> str:
+    """
+    Имя файла шарда
+
+    Args:
+        base (str): Общее имя фида без расширения
+        index (int): Номер шарда
+        part (int): Номер части шарда, если он не уместился в max_bytes
+
+    Returns:
+        str: <base>_<index>.xml или <base>_<index>_<part>.xml
+    """
+    if part:
+        return f'{base}_{index:04d}_{part}.xml'
+    return f'{base}_{index:04d}.xml'
+
+def manifest_path(directory: str, base: str) -> str:
+    """Путь к манифесту фида <base>.manifest.json"""
+    return os.path.join(directory, f'{base}.manifest.json')
+
+def remove_shard_files(directory: str, base: str) -> int:
+    """
+    Удаляет все файлы шардов фида (вместе с .gz)
+
+    Используется, когда фид не удалось записать целиком: без манифеста
+    записанные шарды никому не нужны.
+
+    Returns:
+        int: Количество удаленных файлов
+    """
+    pattern = re.compile(re.escape(base) + r'_\d{4}(_\d+)?\.xml(\.gz)?$')
+    removed = 0
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        if pattern.match(name):
+            try:
+                os.remove(os.path.join(directory, name))
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+def split_shards(ads: Sequence, shard_size: int) -> List[Tuple[int, Sequence]]:
+    """
+    Делит объявления на шарды по shard_size подряд
+
+    Returns:
+        List[Tuple[int, Sequence]]: Номер шарда и его объявления; пустой
+            каталог — один пустой шард
+    """
+    if shard_size <= 0:
+        raise ValueError('shard_size must be positive')
+    if not ads:
+        return [(0, ads)]
+    return [
+        (index, ads[start:start + shard_size])
+        for index, start in enumerate(range(0, len(ads), shard_size))
+    ]
+
+def write_shard(
+    ads: Sequence[Union[Ad, Dict]],
+    base: str,
+    index: int,
+    directory: str = 'out_xml',
+    max_bytes: Optional[int] = None,
+    compress: bool = False,
+    serializer: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Записывает один шард
+
+    Функция уровня модуля, чтобы ее можно было выполнять в пуле процессов.
+    Если задан max_bytes и следующее объявление не помещается в файл,
+    шард продолжается в следующей части (одно объявление больше лимита
+    пишется в отдельную часть целиком).
+
+    Args:
+        ads (Sequence[Union[Ad, Dict]]): Объявления шарда
+        base (str): Общее имя фида без расширения
+        index (int): Номер шарда
+        directory (str): Директория для сохранения
+        max_bytes (int): Максимальный размер файла части
+        compress (bool): Писать рядом сжатые копии .gz
+        serializer (str): etree или direct, по умолчанию выбранный в процессе
+
+    Returns:
+        List[Dict[str, Any]]: Статистика записи каждой части (FeedWriter.stats)
+            с полями index, part и sha256
+
+    Raises:
+        AdValidationError: Объявление не прошло проверку (до записи файлов)
+    """
+    # Проверяем все объявления до записи, чтобы не заменить шард наполовину
+    ads = [ad_fields(ad_data) for ad_data in ads]
+    serialize = get_serializer(serializer)
+    parts: List[Dict[str, Any]] = []
+    feed: Optional[FeedWriter] = None
+
+    def open_part() -> FeedWriter:
+        return FeedWriter(
+            shard_filename(base, index, len(parts)), directory=directory,
+            compress=compress, serializer=serializer, checksum=True
+        ).open()
+
+    def close_part() -> None:
+        feed.close()
+        parts.append(dict(feed.stats, index=index, part=len(parts)))
+
+    try:
+        for fields in ads:
+            data = serialize(*fields)
+            if feed is None:
+                feed = open_part()
+            elif max_bytes and feed.bytes_written + len(data) + len(ROOT_CLOSE_TAG) > max_bytes:
+                close_part()
+                feed = open_part()
+            feed.write_fragment(data)
+        if feed is None:
+            # Пустой шард — корректный пустой фид
+            feed = open_part()
+        close_part()
+    except Exception:
+        if feed is not None:
+            feed.abort()
+        raise
+    return parts
+
+def make_manifest(
+    base: str,
+    parts: List[Dict[str, Any]],
+    shard_size: int,
+    max_shard_bytes: Optional[int] = None,
+    created_at: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Манифест фида: файлы шардов с количеством объявлений, размером и SHA-256
+
+    Args:
+        base (str): Общее имя фида без расширения
+        parts (List[Dict]): Статистика частей из write_shard()
+        shard_size (int): Объявлений в шарде
+        max_shard_bytes (int): Максимальный размер файла части
+        created_at (str): Время создания фида (при перегенерации шарда сохраняется)
+    """
+    now = datetime.now().isoformat()
+    shards = sorted(
+        (
+            {**{key: part[key] for key in PART_FIELDS}, 'file': os.path.basename(part['file'])}
+            for part in parts
+        ),
+        key=lambda part: (part['index'], part['part'])
+    )
+    return {
+        'name': base,
+        'created_at': created_at or now,
+        'updated_at': now,
+        'shard_size': shard_size,
+        'max_shard_bytes': max_shard_bytes,
+        'ads': sum(part['ads'] for part in shards),
+        'bytes': sum(part['bytes'] for part in shards),
+        'shards': shards
+    }
+
+def save_manifest(directory: str, manifest: Dict[str, Any]) -> str:
+    """
+    Атомарно записывает манифест
+
+    Returns:
+        str: Путь к манифесту
+    """
+    create_directory(directory)
+    path = manifest_path(directory, manifest['name'])
+    tmp_path = f'{path}.{uuid.uuid4().hex[:8]}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+def load_manifest(directory: str, base: str) -> Dict[str, Any]:
+    """
+    Читает манифест фида
+
+    Raises:
+        FileNotFoundError: Манифеста нет
+    """
+    with open(manifest_path(directory, base), encoding='utf-8') as f:
+        return json.load(f)
+
+def build_sharded_feed(
+    ads: Sequence[Union[Ad, Dict]],
+    base: str,
+    directory: str = 'out_xml',
+    shard_size: int = 50000,
+    max_shard_bytes: Optional[int] = None,
+    compress: bool = False,
+    serializer: Optional[str] = None,
+    executor: Optional[Executor] = None,
+    workers: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Записывает фид шардами параллельно и сохраняет манифест
+
+    Шарды пишутся в пуле процессов, поэтому время генерации большого
+    каталога уменьшается с числом ядер. Если хотя бы один шард записать
+    не удалось, уже записанные шарды удаляются и ошибка пробрасывается.
+
+    Args:
+        ads (Sequence[Union[Ad, Dict]]): Объявления
+        base (str): Общее имя фида без расширения
+        directory (str): Директория для сохранения
+        shard_size (int): Объявлений в шарде
+        max_shard_bytes (int): Максимальный размер файла части шарда
+        compress (bool): Писать рядом сжатые копии .gz
+        serializer (str): etree или direct
+        executor (Executor): Пул для записи шардов, по умолчанию новый пул процессов
+        workers (int): Количество процессов нового пула
+
+    Returns:
+        Dict[str, Any]: Манифест (см. make_manifest)
+    """
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [
+            executor.submit(write_shard, shard, base, index, directory, max_shard_bytes, compress, serializer)
+            for index, shard in split_shards(ads, shard_size)
+        ]
+        # Дожидаемся всех шардов, чтобы удалить и те, что допишутся после ошибки
+        errors = [future.exception() for future in futures]
+    finally:
+        if own_executor:
+            executor.shutdown()
+    try:
+        for error in errors:
+            if error is not None:
+                raise error
+        parts = [part for future in futures for part in future.result()]
+        manifest = make_manifest(base, parts, shard_size, max_shard_bytes)
+        save_manifest(directory, manifest)
+    except BaseException:
+        remove_shard_files(directory, base)
+        raise
+    return manifest
+
+def replace_shard(
+    manifest: Dict[str, Any],
+    index: int,
+    parts: List[Dict[str, Any]],
+    directory: str = 'out_xml'
+) -> Dict[str, Any]:
+    """
+    Заменяет в манифесте части шарда index и сохраняет манифест
+
+    Лишние файлы прежней версии шарда (если частей стало меньше) удаляются
+    после сохранения манифеста, чтобы манифест никогда не ссылался на
+    удаленные файлы; остальные шарды не затрагиваются.
+
+    Returns:
+        Dict[str, Any]: Новый манифест
+    """
+    kept = [part for part in manifest['shards'] if part['index'] != index]
+    updated = make_manifest(
+        manifest['name'], kept + parts, manifest['shard_size'],
+        manifest.get('max_shard_bytes'), manifest.get('created_at')
+    )
+    save_manifest(directory, updated)
+
+    new_files = {os.path.basename(part['file']) for part in parts}
+    for old in manifest['shards']:
+        if old['index'] == index and old['file'] not in new_files:
+            for path in (os.path.join(directory, old['file']), os.path.join(directory, old['file'] + '.gz')):
+                if os.path.exists(path):
+                    os.remove(path)
+    return updated
+
+def regenerate_shard(
+    base: str,
+    index: int,
+    ads: Sequence[Union[Ad, Dict]],
+    directory: str = 'out_xml',
+    compress: bool = False,
+    serializer: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Перезаписывает один шард и обновляет манифест
+
+    Файлы и контрольные суммы остальных шардов не меняются, поэтому клиенты
+    по манифесту (или по ETag) скачивают заново только этот шард. Номер на
+    единицу больше последнего добавляет новый шард.
+
+    Args:
+        base (str): Общее имя фида без расширения
+        index (int): Номер шарда
+        ads (Sequence[Union[Ad, Dict]]): Новое содержимое шарда
+        directory (str): Директория фида
+        compress (bool): Писать рядом сжатые копии .gz
+        serializer (str): etree или direct
+
+    Returns:
+        Dict[str, Any]: Новый манифест
+
+    Raises:
+        FileNotFoundError: Манифеста нет
+        ValueError: Номер шарда вне манифеста
+    """
+    manifest = load_manifest(directory, base)
+    shards = {part['index'] for part in manifest['shards']}
+    if index < 0 or index > len(shards):
+        raise ValueError(f'Shard {index} is out of range 0..{len(shards)}')
+    parts = write_shard(ads, base, index, directory, manifest.get('max_shard_bytes'), compress, serializer)
+    return replace_shard(manifest, index, parts, directory)
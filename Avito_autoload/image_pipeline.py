@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import hashlib
+import threading
+from stat import S_ISREG
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional
+from loguru import logger
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - Pillow есть в requirements.txt
+    Image = None
+    ImageOps = None
+
+# Ограничения Avito: фото до 25 МБ; больше 1600 px по длинной стороне сайт все равно уменьшает
+MAX_IMAGE_SIDE = 1600
+MAX_IMAGE_BYTES = 25 * 1024 * 1024
+JPEG_QUALITY = 85
+# Исходники больше этого размера не хешируются и не обрабатываются
+MAX_SOURCE_BYTES = 100 * 1024 * 1024
+
+def process_image(src: str, dst: str, max_side: int = MAX_IMAGE_SIDE, quality: int = JPEG_QUALITY) -> str:
+    """
+    Уменьшает и пережимает изображение в JPEG
+
+    Функция уровня модуля, чтобы ее можно было выполнять в пуле процессов.
+
+    Args:
+        src (str): Исходный файл
+        dst (str): Файл результата
+        max_side (int): Максимальный размер длинной стороны в пикселях
+        quality (int): Качество JPEG
+
+    Returns:
+        str: Путь к результату
+    """
+    with Image.open(src) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.thumbnail((max_side, max_side))
+
+        tmp_path = f'{dst}.{os.getpid()}.tmp'
+        while True:
+            image.save(tmp_path, 'JPEG', quality=quality, optimize=True, progressive=True)
+            if os.path.getsize(tmp_path) <= MAX_IMAGE_BYTES or quality <= 40:
+                break
+            quality -= 10
+    os.replace(tmp_path, dst)
+    return dst
+
+def _file_digest(path: str, salt: bytes) -> str:
+    digest = hashlib.sha256(salt)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ImagePipeline:
+    """
+    Подготовка изображений к загрузке на Avito
+
+    Локальные файлы уменьшаются и пережимаются в пуле процессов. Результаты
+    лежат в дисковом кеше под хешем содержимого и настроек, поэтому одно и
+    то же изображение обрабатывается один раз, в том числе при одновременных
+    вызовах из разных потоков. При превышении max_cache_bytes
+    удаляются давно не использованные файлы. Ссылки (http/https),
+    несуществующие пути и файлы вне source_dir возвращаются без изменений.
+    """
+
+    _shared: Dict[str, 'ImagePipeline'] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        cache_dir: str = 'image_cache',
+        max_cache_bytes: int = 1024 * 1024 * 1024,
+        max_side: int = MAX_IMAGE_SIDE,
+        quality: int = JPEG_QUALITY,
+        workers: Optional[int] = None,
+        url_prefix: Optional[str] = None,
+        source_dir: Optional[str] = None,
+        max_source_bytes: int = MAX_SOURCE_BYTES
+    ):
+        """
+        Args:
+            cache_dir (str): Директория кеша
+            max_cache_bytes (int): Максимальный размер кеша в байтах
+            max_side (int): Максимальный размер длинной стороны в пикселях
+            quality (int): Качество JPEG
+            workers (int): Количество процессов, по умолчанию по числу ядер
+            url_prefix (str): Если задан, вместо локального пути возвращается
+                url_prefix + имя файла в кеше. Кеш должен публиковаться по этому
+                адресу: MCP-сервис отдает его по /images/{name}
+            source_dir (str): Обрабатывать только файлы внутри этой директории
+                (после разрешения символических ссылок). Обязателен, если пути
+                приходят от внешних клиентов: иначе с url_prefix любой файл
+                сервера можно опубликовать через кеш
+            max_source_bytes (int): Максимальный размер исходного файла
+        """
+        self.cache_dir = cache_dir
+        self.max_cache_bytes = max_cache_bytes
+        self.max_side = max_side
+        self.quality = quality
+        self.workers = workers or os.cpu_count() or 1
+        self.url_prefix = url_prefix.rstrip('/') if url_prefix else None
+        self.source_dir = os.path.realpath(source_dir) if source_dir else None
+        self.max_source_bytes = max_source_bytes
+        self.hits = 0
+        self.misses = 0
+        self._salt = f'{max_side}:{quality}:'.encode('utf-8')
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Обработка в процессе: путь в кеше -> задача, общие для всех вызовов process()
+        self._inflight: Dict[str, Future] = {}
+        # Защищает _executor и _inflight
+        self._lock = threading.Lock()
+        if Image is None:
+            logger.warning("Pillow не установлен, изображения передаются без обработки")
+
+    @classmethod
+    def shared(cls, cache_dir: str = 'image_cache', **kwargs) -> 'ImagePipeline':
+        """Общий экземпляр на директорию кеша, чтобы агенты не плодили пулы процессов"""
+        with cls._shared_lock:
+            if cache_dir not in cls._shared:
+                cls._shared[cache_dir] = cls(cache_dir, **kwargs)
+            return cls._shared[cache_dir]
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _source(self, path: str) -> Optional[str]:
+        """Настоящий путь к исходному файлу или None, если файл обрабатывать нельзя"""
+        if path.startswith(('http://', 'https://')):
+            return None
+        real_path = os.path.realpath(path)
+        if self.source_dir and os.path.commonpath([real_path, self.source_dir]) != self.source_dir:
+            return None
+        try:
+            stat = os.stat(real_path)
+        except OSError:
+            return None
+        if not S_ISREG(stat.st_mode) or stat.st_size > self.max_source_bytes:
+            return None
+        return real_path
+
+    def _result(self, cached_path: str) -> str:
+        if self.url_prefix:
+            return f'{self.url_prefix}/{os.path.basename(cached_path)}'
+        return cached_path
+
+    def process(self, paths: List[str]) -> List[str]:
+        """
+        Обрабатывает изображения, используя кеш
+
+        Args:
+            paths (List[str]): Пути к файлам или ссылки
+
+        Returns:
+            List[str]: Пути к обработанным файлам в том же порядке
+        """
+        if Image is None or not paths:
+            return list(paths)
+
+        # Для каждого входа: (исходный путь, путь в кеше или None)
+        entries = []
+        pending = {}
+        for path in paths:
+            source = self._source(path)
+            if source is None:
+                entries.append((path, None))
+                continue
+            cached_path = os.path.join(self.cache_dir, _file_digest(source, self._salt) + '.jpg')
+            entries.append((path, cached_path))
+            if cached_path in pending:
+                continue
+            if os.path.exists(cached_path):
+                # Обновляем время, чтобы файл не был вытеснен как давно неиспользуемый
+                os.utime(cached_path)
+                self.hits += 1
+            else:
+                pending[cached_path] = source
+
+        submitted = []
+        if pending:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            pool = self._pool()
+            futures = {}
+            with self._lock:
+                for dst, src in pending.items():
+                    # Изображение уже обрабатывается для другого вызова: ждем ту же задачу.
+                    # Задача убирается из _inflight после записи файла, поэтому
+                    # проверка файла под блокировкой не пропустит готовый результат
+                    future = self._inflight.get(dst)
+                    if future is None and not os.path.exists(dst):
+                        future = pool.submit(process_image, src, dst, self.max_side, self.quality)
+                        self._inflight[dst] = future
+                        submitted.append((dst, future))
+                    if future is not None:
+                        futures[future] = src
+                self.misses += len(submitted)
+            # Вне блокировки: у уже завершенной задачи callback вызывается сразу
+            for dst, future in submitted:
+                future.add_done_callback(lambda future, dst=dst: self._on_done(dst, future))
+            for future, src in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Error processing image {src}: {str(e)}")
+
+        results = [
+            # Файлы, которые не удалось обработать, отдаем как есть
+            self._result(cached_path) if cached_path and os.path.exists(cached_path) else path
+            for path, cached_path in entries
+        ]
+        if submitted:
+            self.evict()
+        return results
+
+    def _on_done(self, cached_path: str, future: Future) -> None:
+        with self._lock:
+            if self._inflight.get(cached_path) is future:
+                del self._inflight[cached_path]
+
+    def process_ads(self, ads: List[Dict]) -> List[Dict]:
+        """
+        Обрабатывает изображения пачки объявлений одним вызовом
+
+        Одинаковые изображения разных объявлений обрабатываются один раз.
+
+        Args:
+            ads (List[Dict]): Объявления в формате MCP API (изменяются на месте)
+
+        Returns:
+            List[Dict]: Те же объявления с обработанными изображениями
+        """
+        images = [image for ad_data in ads for image in ad_data.get('images', [])]
+        processed = iter(self.process(images))
+        for ad_data in ads:
+            if ad_data.get('images'):
+                ad_data['images'] = [next(processed) for _ in ad_data['images']]
+        return ads
+
+    def evict(self) -> int:
+        """
+        Удаляет давно не использованные файлы, пока кеш больше лимита
+
+        Returns:
+            int: Количество удаленных файлов
+        """
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith('.jpg'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        if total <= self.max_cache_bytes:
+            return 0
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_cache_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except FileNotFoundError:
+                pass
+        logger.info(f"Evicted {removed} images from cache {self.cache_dir}")
+        return removed
+
+    def close(self) -> None:
+        """Останавливает пул процессов"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
@@ -2,37 +2,275 @@
 # -*- coding: utf-8 -*-
 
 import os
+import re
 import sys
-import json
 import asyncio
 from aiohttp import web
-from typing import Dict, List, Optional
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 from loguru import logger
 from datetime import datetime
 
 # Импортируем функции для работы с XML
-from root_xml import create_root_xml, add_ad_element, save_xml
+from root_xml import FeedWriter, build_feed, feed_filename
 from utils import validate_xml
+from ad_store import AdStore, get_ad_id
+from ad_model import AdValidationError, decode_ad, decode_bulk, decode_json, iter_ads
+from dedup import DEDUP_MODES, DuplicateIndex, dedup_ads
+from feed_shards import make_manifest, regenerate_shard, remove_shard_files, save_manifest, split_shards, write_shard
+from image_pipeline import ImagePipeline
+from metrics import ServiceMetrics, CONTENT_TYPE
+from executors import FeedExecutor
+from jobs import JobManager
+from batcher import AdBatcher
+
+# Имена файлов в кеше ImagePipeline: sha256 содержимого и настроек
+_IMAGE_NAME = re.compile(r'[0-9a-f]{64}\.jpg')
+
+async def iter_ndjson_lines(
+    stream,
+    max_line_size: int = 1024 * 1024,
+    chunk_size: int = 64 * 1024
+) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Построчно читает NDJSON из потока тела запроса
+    
+    В памяти одновременно находится не больше одной строки и одного чанка.
+    Строки длиннее max_line_size пропускаются целиком и возвращаются как None.
+    
+    Args:
+        stream: Поток тела запроса (aiohttp.StreamReader)
+        max_line_size (int): Максимальный размер одной строки в байтах
+        chunk_size (int): Размер читаемого чанка
+    
+    Yields:
+        Tuple[int, Optional[bytes]]: Номер строки (с единицы) и ее содержимое
+    """
+    buffer = bytearray()
+    lineno = 0
+    skipping = False
+    
+    async for chunk in stream.iter_chunked(chunk_size):
+        buffer.extend(chunk)
+        start = 0
+        while True:
+            end = buffer.find(b'\n', start)
+            if end == -1:
+                break
+            lineno += 1
+            if skipping:
+                skipping = False
+                yield lineno, None
+            else:
+                yield lineno, bytes(buffer[start:end])
+            start = end + 1
+        del buffer[:start]
+        
+        if len(buffer) > max_line_size:
+            # Дочитываем слишком длинную строку до конца, не накапливая ее
+            skipping = True
+            buffer.clear()
+        elif skipping:
+            buffer.clear()
+    
+    if skipping:
+        yield lineno + 1, None
+    elif buffer.strip():
+        yield lineno + 1, bytes(buffer)
 
 class AvitoMCPService:
-    def __init__(self, host: str = '0.0.0.0', port: int = 8080):
+    def __init__(
+        self,
+        host: str = '0.0.0.0',
+        port: int = 8080,
+        executor: Optional[FeedExecutor] = None,
+        jobs: Optional[JobManager] = None,
+        store: Optional[AdStore] = None,
+        image_pipeline: Optional[ImagePipeline] = None,
+        ndjson_batch_size: int = 500,
+        max_ndjson_errors: int = 100,
+        max_body_size: int = 64 * 1024 * 1024,
+        feed_dir: str = 'out_xml',
+        compress_feeds: bool = True,
+        public_url: str = '',
+        ad_batch_window: float = 0.0,
+        ad_batch_size: int = 100,
+        shard_size: int = 0,
+        max_shard_bytes: Optional[int] = None,
+        dedup: Optional[str] = None,
+        dedup_threshold: float = 0.8
+    ):
         """
         Инициализация MCP сервиса
         
         Args:
             host (str): Хост для запуска сервера
             port (int): Порт для запуска сервера
+            executor (FeedExecutor): Пулы для построения и записи фидов
+            jobs (JobManager): Очередь фоновой генерации фидов
+            store (AdStore): Хранилище объявлений для инкрементальной синхронизации
+            image_pipeline (ImagePipeline): Обработка локальных изображений объявлений
+            ndjson_batch_size (int): Сколько объявлений NDJSON записывать за одну задачу
+            max_ndjson_errors (int): Сколько ошибочных строк NDJSON возвращать в ответе;
+                остальные только считаются в error_count
+            max_body_size (int): Максимальный размер JSON-тела запроса в байтах
+                (по умолчанию aiohttp ограничивает 1 МБ, это ~300 объявлений)
+            feed_dir (str): Директория фидов, отдаваемых по /feeds/{name}
+            compress_feeds (bool): Писать рядом с фидами сжатые копии .gz
+            public_url (str): Внешний адрес сервиса для ссылок на фиды в ответах
+            ad_batch_window (float): Окно групповой записи create_ad в секундах;
+                0 — каждое объявление пишется в отдельный фид
+            ad_batch_size (int): Максимум объявлений create_ad в одном фиде
+            shard_size (int): Объявлений в шарде create_bulk_ads по умолчанию;
+                0 — один файл, если размер шарда не передан в запросе
+            max_shard_bytes (int): Максимальный размер файла шарда по умолчанию
+            dedup (str): Проверка массовых загрузок на дубли по умолчанию:
+                flag — вернуть отчет, drop — исключить дубли из фида, None — нет
+            dedup_threshold (float): Минимальное сходство почти одинаковых объявлений
         """
         self.host = host
         self.port = port
-        self.app = web.Application()
+        self.executor = executor or FeedExecutor()
+        self.jobs = jobs or JobManager(self.executor)
+        self.store = store or AdStore()
+        self.image_pipeline = image_pipeline
+        self.ndjson_batch_size = ndjson_batch_size
+        self.max_ndjson_errors = max_ndjson_errors
+        self.feed_dir = feed_dir
+        self.compress_feeds = compress_feeds
+        self.public_url = public_url.rstrip('/')
+        self.shard_size = shard_size
+        self.max_shard_bytes = max_shard_bytes
+        self.dedup = dedup
+        self.dedup_threshold = dedup_threshold
+        # Перегенерация шардов одного фида выполняется по очереди
+        self._shard_locks: Dict[str, asyncio.Lock] = {}
+        self.metrics = ServiceMetrics()
+        self.jobs.metrics = self.metrics
+        self.jobs.image_pipeline = image_pipeline
+        self.jobs.directory = feed_dir
+        self.jobs.compress = compress_feeds
+        self.batcher = AdBatcher(
+            self.executor, window=ad_batch_window, max_size=ad_batch_size,
+            directory=feed_dir, compress=compress_feeds, metrics=self.metrics
+        ) if ad_batch_window > 0 else None
+        self.app = web.Application(
+            middlewares=[self.metrics.middleware()],
+            client_max_size=max_body_size
+        )
+        self.app.on_startup.append(self.jobs.start)
+        if self.batcher:
+            # Накопленные объявления записываются до остановки пулов
+            self.app.on_shutdown.append(self.batcher.close)
+        self.app.on_cleanup.append(self.jobs.stop)
+        self.app.on_cleanup.append(self._shutdown_executor)
         self.setup_routes()
         
+    async def _shutdown_executor(self, app: web.Application) -> None:
+        """Остановка пулов при завершении приложения"""
+        self.executor.shutdown()
+        self.store.close()
+        if self.image_pipeline:
+            self.image_pipeline.close()
+        
+    async def _prepare_images(self, ads: List[Dict]) -> None:
+        """Обработка изображений пачки объявлений вне event loop"""
+        if self.image_pipeline:
+            await self.executor.run_io(self.image_pipeline.process_ads, ads)
+        
+    async def _decode_body(self, request: web.Request, decoder: Optional[Callable] = None) -> Any:
+        """
+        Чтение и разбор тела запроса в пуле потоков
+        
+        Разбор пакета на сотни тысяч объявлений занимает секунды и не должен
+        останавливать event loop для остальных запросов.
+        
+        Args:
+            decoder (Callable): Функция разбора, по умолчанию decode_json
+        """
+        body = await request.read()
+        return await self.executor.run_io(decoder or decode_json, body)
+        
+    def _feed_url(self, filepath: str) -> str:
+        """Ссылка на фид для ответа API"""
+        return f'{self.public_url}/feeds/{os.path.basename(filepath)}'
+        
+    def _dedup_options(self, data: Dict) -> Tuple[Optional[str], float]:
+        """
+        Режим и порог проверки на дубли из тела или запроса
+        
+        Raises:
+            AdValidationError: Неизвестный режим или порог вне (0, 1]
+        """
+        mode = data.get('dedup', self.dedup) or None
+        threshold = data.get('dedup_threshold', self.dedup_threshold)
+        if mode is not None and mode not in DEDUP_MODES:
+            raise AdValidationError(f'Field dedup must be one of {", ".join(DEDUP_MODES)}')
+        try:
+            threshold = float(threshold)
+        except (TypeError, ValueError):
+            threshold = None
+        if threshold is None or not 0 < threshold <= 1:
+            raise AdValidationError('Field dedup_threshold must be a number in (0, 1]')
+        return mode, threshold
+        
+    def _manifest_response(self, manifest: Dict) -> Dict:
+        """Манифест для ответа API со ссылками на шарды"""
+        return dict(
+            manifest,
+            shards=[dict(part, url=self._feed_url(part['file'])) for part in manifest['shards']]
+        )
+        
+    async def _write_shards(
+        self,
+        ads: List,
+        base: str,
+        shard_size: int,
+        max_shard_bytes: Optional[int]
+    ) -> Dict:
+        """
+        Параллельная запись шардов и манифеста
+        
+        Если хотя бы один шард записать не удалось, уже записанные шарды
+        удаляются: без манифеста они никому не нужны.
+        
+        Returns:
+            Dict: Манифест (см. feed_shards.make_manifest)
+        """
+        # return_exceptions: после ошибки дожидаемся остальных шардов, чтобы удалить и их
+        results = await asyncio.gather(*(
+            self.executor.run(
+                len(shard), write_shard, shard, base, index, self.feed_dir,
+                max_shard_bytes, self.compress_feeds
+            )
+            for index, shard in split_shards(ads, shard_size)
+        ), return_exceptions=True)
+        try:
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+            parts = [part for shard_parts in results for part in shard_parts]
+            manifest = make_manifest(base, parts, shard_size, max_shard_bytes)
+            await self.executor.run_io(save_manifest, self.feed_dir, manifest)
+        except BaseException:
+            await self.executor.run_io(remove_shard_files, self.feed_dir, base)
+            raise
+        for part in parts:
+            self.metrics.record_feed('create_bulk_ads', part)
+        return manifest
+        
     def setup_routes(self):
         """Настройка маршрутов API"""
         self.app.router.add_post('/api/v1/create_ad', self.create_ad)
         self.app.router.add_post('/api/v1/create_bulk_ads', self.create_bulk_ads)
+        self.app.router.add_post('/api/v1/create_bulk_ads_ndjson', self.create_bulk_ads_ndjson)
+        self.app.router.add_post('/api/v1/sync_ads', self.sync_ads)
+        self.app.router.add_post('/api/v1/feeds/{name}/shards/{index}', self.regenerate_shard)
+        self.app.router.add_post('/api/v1/jobs', self.create_job)
+        self.app.router.add_get('/api/v1/jobs/{job_id}', self.get_job)
         self.app.router.add_get('/api/v1/health', self.health_check)
+        self.app.router.add_get('/metrics', self.metrics_handler)
+        self.app.router.add_get('/feeds/{name}', self.serve_feed)
+        self.app.router.add_get('/images/{name}', self.serve_image)
         
     async def create_ad(self, request: web.Request) -> web.Response:
         """
@@ -50,38 +288,36 @@ class AvitoMCPService:
                 "Brand": "Example"
             }
         }
+        
+        В режиме групповой записи (ad_batch_window > 0) объявление попадает
+        в общий фид вместе с другими, пришедшими в то же окно; в ответе
+        возвращаются позиция объявления в фиде (position) и размер пачки
+        (batch_size).
         """
         try:
-            data = await request.json()
+            try:
+                ad = decode_ad(await request.read(), require_category=True)
+            except AdValidationError as e:
+                return web.json_response({'error': str(e)}, status=400)
             
-            # Валидация входных данных
-            required_fields = ['title', 'description', 'price', 'category']
-            for field in required_fields:
-                if field not in data:
-                    return web.json_response(
-                        {'error': f'Missing required field: {field}'}, 
-                        status=400
-                    )
+            await self._prepare_images([ad])
             
-            # Создаем XML
-            root = create_root_xml(data['category'])
-            add_ad_element(
-                root=root,
-                title=data['title'],
-                description=data['description'],
-                price=data['price'],
-                images=data.get('images', []),
-                params=data.get('params', {})
-            )
-            
-            # Сохраняем XML
-            filename = f'avito_ad_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xml'
-            filepath = save_xml(root, filename)
+            if self.batcher:
+                result = await self.batcher.add(ad)
+            else:
+                # Создаем и сохраняем XML вне event loop
+                stats = await self.executor.run_io(
+                    build_feed, [ad], feed_filename('avito_ad'), ad.category,
+                    self.feed_dir, self.compress_feeds
+                )
+                self.metrics.record_feed('create_ad', stats)
+                result = {'file': stats['file'], 'position': 0, 'batch_size': 1}
             
             return web.json_response({
                 'status': 'success',
                 'message': 'Ad created successfully',
-                'file': filepath
+                'url': self._feed_url(result['file']),
+                **result
             })
             
         except Exception as e:
@@ -115,47 +351,361 @@ class AvitoMCPService:
                 }
             ]
         }
+        
+        Необязательные поля shard_size и max_shard_bytes (или параметры
+        сервиса) включают запись фида шардами: по shard_size объявлений в
+        файле, файлы пишутся параллельно, а в ответе возвращается манифест
+        со списком шардов, их размерами и SHA-256. Шард, не помещающийся в
+        max_shard_bytes, продолжается в следующей части.
+        
+        Поле dedup (flag или drop, по умолчанию параметр сервиса) включает
+        поиск точных и почти одинаковых объявлений (сходство не ниже
+        dedup_threshold): в ответе поле duplicates с позицией дубля (index),
+        позицией найденного раньше объявления (duplicate_of) и оценкой
+        сходства; в режиме drop дубли не попадают в фид.
+        """
+        try:
+            try:
+                data = await self._decode_body(request)
+                category, ads = await self.executor.run_io(decode_bulk, data)
+                shard_size = data.get('shard_size', self.shard_size)
+                max_shard_bytes = data.get('max_shard_bytes', self.max_shard_bytes)
+                for field, value in (('shard_size', shard_size), ('max_shard_bytes', max_shard_bytes)):
+                    if value is not None and (type(value) is not int or value < 0):
+                        raise AdValidationError(f'Field {field} must be a non-negative integer')
+                dedup, dedup_threshold = self._dedup_options(data)
+            except AdValidationError as e:
+                return web.json_response({'error': str(e)}, status=400)
+            
+            dedup_report = {}
+            if dedup:
+                # Индекс строится и проверяется в одном процессе: сигнатуры
+                # зависят от хешей строк процесса
+                ads, duplicates = await self.executor.run(len(ads), dedup_ads, ads, dedup, dedup_threshold)
+                dedup_report = {'duplicates': duplicates}
+            
+            await self._prepare_images(ads)
+            
+            if shard_size or max_shard_bytes:
+                # Без shard_size лимит по байтам делит фид на части одного шарда
+                base = feed_filename('avito_bulk')[:-len('.xml')]
+                manifest = await self._write_shards(ads, base, shard_size or len(ads) or 1, max_shard_bytes)
+                filepath = os.path.join(self.feed_dir, f'{base}.manifest.json')
+                return web.json_response({
+                    'status': 'success',
+                    'message': f'Created {len(ads)} ads in {len(manifest["shards"])} files',
+                    'file': filepath,
+                    'url': self._feed_url(filepath),
+                    'manifest': self._manifest_response(manifest),
+                    **dedup_report
+                })
+            
+            # Создаем и сохраняем XML: большие фиды уходят в пул процессов
+            filename = feed_filename('avito_bulk')
+            stats = await self.executor.run(
+                len(ads), build_feed, ads, filename, category,
+                self.feed_dir, self.compress_feeds
+            )
+            self.metrics.record_feed('create_bulk_ads', stats)
+            filepath = stats['file']
+            
+            return web.json_response({
+                'status': 'success',
+                'message': f'Created {len(ads)} ads successfully',
+                'file': filepath,
+                'url': self._feed_url(filepath),
+                **dedup_report
+            })
+            
+        except Exception as e:
+            logger.error(f"Error creating bulk ads: {str(e)}")
+            return web.json_response(
+                {'error': str(e)}, 
+                status=500
+            )
+            
+    async def regenerate_shard(self, request: web.Request) -> web.Response:
+        """
+        Перезапись одного шарда фида
+        
+        POST /api/v1/feeds/{name}/shards/{index}
+        {
+            "ads": [{"title": "Товар 1", "description": "Описание 1", "price": 1000}]
+        }
+        
+        name — имя фида без расширения (поле name манифеста). Остальные шарды
+        и их контрольные суммы не меняются, поэтому клиент заново скачивает
+        только этот файл. Номер на единицу больше последнего добавляет шард.
+        """
+        name = request.match_info['name']
+        if name != os.path.basename(name) or name.startswith('.'):
+            return web.json_response({'error': 'Feed not found'}, status=404)
+        try:
+            try:
+                index = int(request.match_info['index'])
+                data = await self._decode_body(request)
+                if not isinstance(data, dict) or 'ads' not in data:
+                    raise AdValidationError('Missing required field: ads')
+                # list() выбирает генератор в потоке пула
+                ads = await self.executor.run_io(list, iter_ads(data['ads']))
+            except ValueError as e:
+                # AdValidationError — тоже ValueError
+                return web.json_response({'error': str(e)}, status=400)
+            
+            await self._prepare_images(ads)
+            
+            lock = self._shard_locks.setdefault(name, asyncio.Lock())
+            async with lock:
+                try:
+                    manifest = await self.executor.run(
+                        len(ads), regenerate_shard, name, index, ads,
+                        self.feed_dir, self.compress_feeds
+                    )
+                except FileNotFoundError:
+                    return web.json_response({'error': 'Feed not found'}, status=404)
+                except ValueError as e:
+                    return web.json_response({'error': str(e)}, status=400)
+            for part in manifest['shards']:
+                if part['index'] == index:
+                    self.metrics.record_feed('regenerate_shard', part)
+            
+            return web.json_response({
+                'status': 'success',
+                'message': f'Shard {index} regenerated with {len(ads)} ads',
+                'manifest': self._manifest_response(manifest)
+            })
+            
+        except Exception as e:
+            logger.error(f"Error regenerating shard: {str(e)}")
+            return web.json_response(
+                {'error': str(e)}, 
+                status=500
+            )
+            
+    async def create_bulk_ads_ndjson(self, request: web.Request) -> web.Response:
+        """
+        Потоковое создание объявлений из NDJSON (одно объявление на строку)
+        
+        POST /api/v1/create_bulk_ads_ndjson?category=Электроника
+        Content-Type: application/x-ndjson
+        
+        {"title": "Товар 1", "description": "Описание 1", "price": 1000}
+        {"title": "Товар 2", "description": "Описание 2", "price": 2000}
+        
+        Тело читается по частям, каждое объявление проверяется и
+        дописывается в фид пачками по ndjson_batch_size. Ошибочные строки пропускаются и возвращаются
+        в поле errors с номером строки: первые max_ndjson_errors, общее
+        количество — в поле error_count.
+        
+        Параметры запроса dedup и dedup_threshold — как в create_bulk_ads;
+        дубли возвращаются в поле duplicates с номерами строк (line, duplicate_of).
         """
+        category = request.query.get('category')
+        if not category:
+            return web.json_response(
+                {'error': 'Missing required query parameter: category'},
+                status=400
+            )
         try:
-            data = await request.json()
+            dedup, dedup_threshold = self._dedup_options(request.query)
+        except AdValidationError as e:
+            return web.json_response({'error': str(e)}, status=400)
+        # Индекс общий для всех пачек запроса
+        index = DuplicateIndex(dedup_threshold) if dedup else None
+        duplicates = []
+        
+        def add_batch(batch: List, lines: List[int]) -> None:
+            if index is not None:
+                batch, found = dedup_ads(batch, dedup, dedup_threshold, index, lines)
+                duplicates.extend({'line': item.pop('index'), **item} for item in found)
+            # Уже в потоке пула, поэтому изображения обрабатываются здесь же
+            if self.image_pipeline:
+                self.image_pipeline.process_ads(batch)
+            feed.add_ads(batch)
+        
+        filename = feed_filename('avito_bulk')
+        feed = FeedWriter(filename, category=category, directory=self.feed_dir, compress=self.compress_feeds)
+        errors = []
+        error_count = 0
+        batch = []
+        lines = []
+        
+        try:
+            await self.executor.run_io(feed.open)
+            async for lineno, line in iter_ndjson_lines(request.content):
+                if line is not None and not line.strip():
+                    continue
+                
+                try:
+                    if line is None:
+                        raise AdValidationError('Line is too long')
+                    ad = decode_ad(line)
+                except AdValidationError as e:
+                    # Поток ошибочных строк не должен занимать память без ограничения
+                    error_count += 1
+                    if len(errors) < self.max_ndjson_errors:
+                        errors.append({'line': lineno, 'error': str(e)})
+                    continue
+                
+                # Пишем пачками, чтобы не платить за переключение потока на каждое объявление
+                batch.append(ad)
+                lines.append(lineno)
+                if len(batch) >= self.ndjson_batch_size:
+                    await self.executor.run_io(add_batch, batch, lines)
+                    batch, lines = [], []
+            
+            if batch:
+                await self.executor.run_io(add_batch, batch, lines)
             
-            if 'category' not in data or 'ads' not in data:
+            if feed.count == 0:
+                await self.executor.run_io(feed.abort)
                 return web.json_response(
-                    {'error': 'Missing required fields: category, ads'}, 
+                    {'error': 'No valid ads in request', 'errors': errors, 'error_count': error_count},
                     status=400
                 )
             
-            # Создаем XML
-            root = create_root_xml(data['category'])
-            
-            # Добавляем объявления
-            for ad_data in data['ads']:
-                add_ad_element(
-                    root=root,
-                    title=ad_data['title'],
-                    description=ad_data['description'],
-                    price=ad_data['price'],
-                    images=ad_data.get('images', []),
-                    params=ad_data.get('params', {})
-                )
+            filepath = await self.executor.run_io(feed.close)
+            self.metrics.record_feed('create_bulk_ads_ndjson', feed.stats)
+            
+            return web.json_response({
+                'status': 'partial' if error_count else 'success',
+                'message': f'Created {feed.count} ads successfully',
+                'created': feed.count,
+                'errors': errors,
+                'error_count': error_count,
+                'file': filepath,
+                'url': self._feed_url(filepath),
+                **({'duplicates': duplicates} if dedup else {})
+            })
             
-            # Сохраняем XML
-            filename = f'avito_bulk_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xml'
-            filepath = save_xml(root, filename)
+        except Exception as e:
+            feed.abort()
+            logger.error(f"Error creating bulk ads from NDJSON: {str(e)}")
+            return web.json_response(
+                {'error': str(e)}, 
+                status=500
+            )
+            
+    async def sync_ads(self, request: web.Request) -> web.Response:
+        """
+        Инкрементальная синхронизация каталога
+        
+        POST /api/v1/sync_ads
+        Тело запроса совпадает с /api/v1/create_bulk_ads, у каждого объявления
+        должен быть params.Id или id. Объявления сохраняются в локальное
+        хранилище, заново сериализуются только новые и измененные, а фид
+        собирается из всех объявлений хранилища.
+        
+        Снятые с продажи объявления удаляются из хранилища двумя способами:
+        поле delete — список их идентификаторов, поле full: true — в запросе
+        весь каталог, и удаляется все, чего в нем нет. Количество удаленных
+        возвращается в stats.removed.
+        """
+        try:
+            try:
+                data = await self._decode_body(request)
+                category, ads = await self.executor.run_io(decode_bulk, data)
+                full = data.get('full', False)
+                if type(full) is not bool:
+                    raise AdValidationError('Field full must be a boolean')
+                delete = data.get('delete', [])
+                if not isinstance(delete, list) or any(type(ad_id) not in (str, int) for ad_id in delete):
+                    raise AdValidationError('Field delete must be a list of ad ids')
+            except AdValidationError as e:
+                return web.json_response({'error': str(e)}, status=400)
+            
+            ad_ids = []
+            for index, ad in enumerate(ads):
+                try:
+                    ad_ids.append(get_ad_id(ad))
+                except ValueError as e:
+                    return web.json_response(
+                        {'error': f'Ad {index}: {str(e)}'},
+                        status=400
+                    )
+            
+            # До upsert: в хранилище и хеш попадают обработанные изображения
+            await self._prepare_images(ads)
+            stats = await self.executor.run_io(self.store.upsert, ads)
+            stats['removed'] = 0
+            if delete:
+                stats['removed'] += await self.executor.run_io(self.store.delete, delete)
+            if full:
+                stats['removed'] += await self.executor.run_io(self.store.prune, ad_ids)
+            
+            filename = feed_filename('avito_sync')
+            filepath = await self.executor.run_io(
+                self.store.export, filename, category, self.feed_dir, self.compress_feeds
+            )
             
             return web.json_response({
                 'status': 'success',
-                'message': f'Created {len(data["ads"])} ads successfully',
-                'file': filepath
+                'message': (
+                    f"Synced ads: {stats['added']} added, "
+                    f"{stats['changed']} changed, {stats['skipped']} skipped, "
+                    f"{stats['removed']} removed"
+                ),
+                'stats': stats,
+                'file': filepath,
+                'url': self._feed_url(filepath)
             })
             
         except Exception as e:
-            logger.error(f"Error creating bulk ads: {str(e)}")
+            logger.error(f"Error syncing ads: {str(e)}")
             return web.json_response(
                 {'error': str(e)}, 
                 status=500
             )
             
+    async def create_job(self, request: web.Request) -> web.Response:
+        """
+        Постановка массовой генерации фида в фоновую очередь
+        
+        POST /api/v1/jobs
+        Тело запроса совпадает с /api/v1/create_bulk_ads. Ответ возвращается
+        сразу, прогресс доступен по GET /api/v1/jobs/{job_id}.
+        """
+        try:
+            try:
+                category, ads = await self._decode_body(request, decode_bulk)
+            except AdValidationError as e:
+                return web.json_response({'error': str(e)}, status=400)
+            
+            try:
+                job = self.jobs.submit(category, ads)
+            except asyncio.QueueFull:
+                return web.json_response(
+                    {'error': 'Job queue is full, retry later'},
+                    status=503
+                )
+            
+            return web.json_response({
+                'status': 'queued',
+                'job_id': job.id,
+                'status_url': f'/api/v1/jobs/{job.id}'
+            }, status=202)
+            
+        except Exception as e:
+            logger.error(f"Error creating job: {str(e)}")
+            return web.json_response(
+                {'error': str(e)}, 
+                status=500
+            )
+            
+    async def get_job(self, request: web.Request) -> web.Response:
+        """
+        Статус фоновой задачи
+        
+        GET /api/v1/jobs/{job_id}
+        """
+        job = self.jobs.get(request.match_info['job_id'])
+        if job is None:
+            return web.json_response({'error': 'Job not found'}, status=404)
+        result = job.to_dict()
+        if job.file:
+            result['url'] = self._feed_url(job.file)
+        return web.json_response(result)
+        
     async def health_check(self, request: web.Request) -> web.Response:
         """
         Проверка работоспособности сервиса
@@ -164,9 +714,81 @@ class AvitoMCPService:
         """
         return web.json_response({
             'status': 'healthy',
-            'timestamp': datetime.now().isoformat()
+            'timestamp': datetime.now().isoformat(),
+            'executors': self.executor.stats(),
+            'jobs': self.jobs.stats(),
+            'ad_batches': self.batcher.stats() if self.batcher else None
         })
         
+    async def metrics_handler(self, request: web.Request) -> web.Response:
+        """
+        Метрики в формате Prometheus
+        
+        GET /metrics
+        """
+        return web.Response(
+            body=self.metrics.render(self.executor.stats()).encode('utf-8'),
+            headers={'Content-Type': CONTENT_TYPE}
+        )
+        
+    async def serve_feed(self, request: web.Request) -> web.StreamResponse:
+        """
+        Отдача файла фида
+        
+        GET /feeds/{name}
+        Файл отправляется через sendfile без копирования в процесс. Поддерживаются
+        ETag / If-None-Match (повторный запрос неизменного фида получает 304
+        без тела), Range и HEAD. Клиентам с Accept-Encoding: gzip отдается
+        заранее сжатая копия <name>.gz, если она есть. Так же отдаются
+        манифесты шардированных фидов <name>.manifest.json.
+        """
+        name = request.match_info['name']
+        if name.endswith('.xml'):
+            content_type = 'application/xml; charset=utf-8'
+        elif name.endswith('.manifest.json'):
+            content_type = 'application/json; charset=utf-8'
+        else:
+            return web.json_response({'error': 'Feed not found'}, status=404)
+        if name != os.path.basename(name) or name.startswith('.'):
+            return web.json_response({'error': 'Feed not found'}, status=404)
+        path = os.path.join(self.feed_dir, name)
+        if not os.path.isfile(path):
+            return web.json_response({'error': 'Feed not found'}, status=404)
+        return web.FileResponse(
+            path,
+            chunk_size=256 * 1024,
+            headers={
+                'Content-Type': content_type,
+                # Кешировать можно, но перед использованием нужно перепроверить ETag
+                'Cache-Control': 'no-cache',
+                'Vary': 'Accept-Encoding'
+            }
+        )
+        
+    async def serve_image(self, request: web.Request) -> web.StreamResponse:
+        """
+        Отдача обработанного изображения из кеша ImagePipeline
+        
+        GET /images/{name}
+        Ссылки на эти файлы попадают в фид, когда url_prefix конвейера
+        указывает на {public_url}/images. Отдаются только файлы кеша
+        (<sha256>.jpg); имена файлов зависят от содержимого, поэтому их
+        можно кешировать без перепроверки.
+        """
+        name = request.match_info['name']
+        if not self.image_pipeline or not _IMAGE_NAME.fullmatch(name):
+            return web.json_response({'error': 'Image not found'}, status=404)
+        path = os.path.join(self.image_pipeline.cache_dir, name)
+        if not os.path.isfile(path):
+            return web.json_response({'error': 'Image not found'}, status=404)
+        return web.FileResponse(
+            path,
+            headers={
+                'Content-Type': 'image/jpeg',
+                'Cache-Control': 'public, max-age=31536000, immutable'
+            }
+        )
+        
     def run(self):
         """Запуск сервера"""
         web.run_app(self.app, host=self.host, port=self.port)
@@ -180,6 +802,37 @@ if __name__ == '__main__':
         level="INFO"
     )
     
+    # Локальные пути изображений приходят от клиентов API, поэтому
+    # обрабатываются только файлы из MCP_IMAGE_SOURCE_DIR
+    image_source_dir = os.getenv('MCP_IMAGE_SOURCE_DIR')
+    if os.getenv('MCP_IMAGE_CACHE_DIR') and not image_source_dir:
+        logger.warning("MCP_IMAGE_SOURCE_DIR не задан, обработка изображений отключена")
+    
+    # Без MCP_IMAGE_URL_PREFIX кеш изображений публикует сам сервис
+    public_url = os.getenv('MCP_PUBLIC_URL', '')
+    image_url_prefix = os.getenv('MCP_IMAGE_URL_PREFIX') or (
+        f"{public_url.rstrip('/')}/images" if public_url else None
+    )
+    
     # Запуск сервиса
-    service = AvitoMCPService()
+    executor = FeedExecutor.from_env()
+    service = AvitoMCPService(
+        executor=executor,
+        jobs=JobManager.from_env(executor),
+        store=AdStore(os.getenv('MCP_AD_STORE', 'data/ad_store.sqlite3')),
+        image_pipeline=ImagePipeline(
+            cache_dir=os.getenv('MCP_IMAGE_CACHE_DIR', 'image_cache'),
+            url_prefix=image_url_prefix,
+            source_dir=image_source_dir
+        ) if os.getenv('MCP_IMAGE_CACHE_DIR') and image_source_dir else None,
+        max_body_size=int(os.getenv('MCP_MAX_BODY_SIZE', str(64 * 1024 * 1024))),
+        compress_feeds=os.getenv('MCP_FEED_GZIP', '1') != '0',
+        public_url=public_url,
+        ad_batch_window=float(os.getenv('MCP_AD_BATCH_WINDOW_MS', '0')) / 1000,
+        ad_batch_size=int(os.getenv('MCP_AD_BATCH_SIZE', '100')),
+        shard_size=int(os.getenv('MCP_SHARD_SIZE', '0')),
+        max_shard_bytes=int(os.getenv('MCP_MAX_SHARD_BYTES', '0')) or None,
+        dedup=os.getenv('MCP_DEDUP') or None,
+        dedup_threshold=float(os.getenv('MCP_DEDUP_THRESHOLD', '0.8'))
+    )
     service.run() 
\ No newline at end of file
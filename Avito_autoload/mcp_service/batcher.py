@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple, Union
+from loguru import logger
+
+from root_xml import FeedWriter, feed_filename, serialize_ad
+from ad_model import Ad
+from executors import FeedExecutor
+
+def write_batch(
+    ads: List[Union[Ad, Dict]],
+    filename: str,
+    directory: str = 'out_xml',
+    compress: bool = False
+) -> Tuple[Optional[Dict[str, Any]], List[Any]]:
+    """
+    Записывает пачку одиночных объявлений в один фид
+
+    Объявления сериализуются по отдельности, чтобы ошибка в одном не
+    отменяла остальные, а затем пишутся в файл одной записью.
+
+    Args:
+        ads (List[Union[Ad, Dict]]): Объявления в формате MCP API
+        filename (str): Имя файла
+        directory (str): Директория для сохранения
+        compress (bool): Писать рядом сжатую копию <файл>.gz
+
+    Returns:
+        Tuple[Optional[Dict], List]: Статистика записи (FeedWriter.stats) или
+            None, если не удалось сериализовать ни одного объявления, и для
+            каждого объявления его позиция в фиде (с нуля) либо исключение
+    """
+    fragments = []
+    results: List[Any] = []
+    for ad_data in ads:
+        try:
+            ad = Ad.from_dict(ad_data)
+            fragments.append(serialize_ad(ad.title, ad.description, ad.price, ad.images, ad.params))
+            results.append(len(fragments) - 1)
+        except Exception as e:
+            results.append(e)
+    if not fragments:
+        return None, results
+
+    with FeedWriter(filename, directory=directory, compress=compress) as feed:
+        feed.write_fragment(b''.join(fragments), len(fragments))
+    return feed.stats, results
+
+class AdBatcher:
+    """
+    Групповая запись одиночных объявлений (group commit)
+
+    Объявления из create_ad, пришедшие в течение window секунд после первого
+    из них, копятся в памяти и записываются вместе в один фид с уникальным
+    именем. Пачка записывается раньше, если в ней набралось max_size
+    объявлений. Каждый вызывающий получает путь к общему фиду и позицию
+    своего объявления в нем, поэтому при потоке мелких запросов на диске
+    появляется один файл на пачку, а не на каждое объявление.
+
+    Категория в файл фида не пишется (она задается в params объявления),
+    поэтому в одну пачку попадают объявления любых категорий.
+    """
+
+    def __init__(
+        self,
+        executor: FeedExecutor,
+        window: float = 0.05,
+        max_size: int = 100,
+        directory: str = 'out_xml',
+        compress: bool = False,
+        metrics=None
+    ):
+        """
+        Args:
+            executor (FeedExecutor): Пулы для записи
+            window (float): Сколько секунд ждать попутных объявлений
+            max_size (int): Максимум объявлений в одной пачке
+            directory (str): Директория фидов
+            compress (bool): Писать рядом сжатые копии .gz
+            metrics (ServiceMetrics): Учет записанных фидов
+        """
+        self.executor = executor
+        self.window = window
+        self.max_size = max_size
+        self.directory = directory
+        self.compress = compress
+        self.metrics = metrics
+        self.batches = 0
+        self._pending: List[Tuple[Dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._writes: set = set()
+
+    async def add(self, ad_data: Union[Ad, Dict]) -> Dict[str, Any]:
+        """
+        Добавляет объявление в текущую пачку и ждет ее записи
+
+        Args:
+            ad_data (Union[Ad, Dict]): Объявление в формате MCP API
+
+        Returns:
+            Dict[str, Any]: Путь к фиду (file), позиция объявления в нем
+                (position, с нуля) и количество объявлений в фиде (batch_size)
+
+        Raises:
+            Exception: Ошибка сериализации объявления или записи пачки
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((ad_data, future))
+        if len(self._pending) >= self.max_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self.flush)
+        return await future
+
+    def flush(self) -> None:
+        """Отправляет накопленную пачку на запись, не дожидаясь окна"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._write(batch))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def _write(self, batch: List[Tuple[Dict, asyncio.Future]]) -> None:
+        try:
+            stats, results = await self.executor.run_io(
+                write_batch, [ad_data for ad_data, _ in batch], feed_filename('avito_ad'),
+                self.directory, self.compress
+            )
+        except Exception as e:
+            logger.error(f"Error writing batch of {len(batch)} ads: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        if stats is not None and self.metrics is not None:
+            self.metrics.record_feed('create_ad', stats)
+        for (_, future), result in zip(batch, results):
+            # Вызывающий мог отключиться и отменить ожидание
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result({
+                    'file': stats['file'],
+                    'position': result,
+                    'batch_size': stats['ads']
+                })
+
+    def stats(self) -> Dict[str, int]:
+        """Состояние пачек для /api/v1/health"""
+        return {
+            'pending': len(self._pending),
+            'writing': len(self._writes),
+            'batches': self.batches
+        }
+
+    async def close(self, app=None) -> None:
+        """Записывает накопленные объявления и ждет завершения записи"""
+        self.flush()
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
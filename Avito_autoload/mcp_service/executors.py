@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from loguru import logger
+
+class _PoolState:
+    """Пул исполнителя и счетчик незавершенных задач"""
+    
+    def __init__(self, name: str, max_workers: int, factory: Callable[[], Executor]):
+        self.name = name
+        self.max_workers = max_workers
+        self.pending = 0
+        self._factory = factory
+        self._executor: Optional[Executor] = None
+    
+    @property
+    def executor(self) -> Executor:
+        # Пул создается при первой задаче, чтобы не держать лишние процессы
+        if self._executor is None:
+            self._executor = self._factory()
+            logger.info(f"Started {self.name} pool with {self.max_workers} workers")
+        return self._executor
+    
+    def stats(self) -> Dict[str, int]:
+        running = min(self.pending, self.max_workers)
+        return {
+            'workers': self.max_workers,
+            'running': running,
+            'queued': self.pending - running
+        }
+    
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+class FeedExecutor:
+    """
+    Вынос построения XML и записи на диск из event loop
+    
+    Небольшие запросы выполняются в пуле потоков: запись на диск отпускает
+    GIL, и накладные расходы минимальны. Фиды от process_threshold объявлений
+    уходят в пул процессов, чтобы сериализация не конкурировала за GIL
+    с обработчиками aiohttp.
+    """
+    
+    def __init__(
+        self,
+        io_workers: int = 4,
+        cpu_workers: Optional[int] = None,
+        process_threshold: int = 1000
+    ):
+        """
+        Args:
+            io_workers (int): Количество потоков для ввода-вывода
+            cpu_workers (int): Количество процессов для больших фидов
+            process_threshold (int): Минимальное число объявлений для пула процессов
+        """
+        cpu_workers = cpu_workers or os.cpu_count() or 1
+        self.process_threshold = process_threshold
+        self.io = _PoolState(
+            'thread', io_workers,
+            lambda: ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix='feed-io')
+        )
+        self.cpu = _PoolState(
+            'process', cpu_workers,
+            lambda: ProcessPoolExecutor(max_workers=cpu_workers)
+        )
+    
+    @classmethod
+    def from_env(cls) -> 'FeedExecutor':
+        """Создает исполнитель по переменным окружения MCP_*"""
+        cpu_workers = os.getenv('MCP_CPU_WORKERS')
+        return cls(
+            io_workers=int(os.getenv('MCP_IO_WORKERS', '4')),
+            cpu_workers=int(cpu_workers) if cpu_workers else None,
+            process_threshold=int(os.getenv('MCP_PROCESS_THRESHOLD', '1000'))
+        )
+    
+    async def _submit(self, pool: _PoolState, fn: Callable, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        pool.pending += 1
+        try:
+            return await loop.run_in_executor(pool.executor, fn, *args)
+        finally:
+            pool.pending -= 1
+    
+    async def run_io(self, fn: Callable, *args) -> Any:
+        """Выполняет функцию в пуле потоков"""
+        return await self._submit(self.io, fn, *args)
+    
+    async def run_cpu(self, fn: Callable, *args) -> Any:
+        """Выполняет функцию в пуле процессов (аргументы должны сериализоваться pickle)"""
+        return await self._submit(self.cpu, fn, *args)
+    
+    async def run(self, size: int, fn: Callable, *args) -> Any:
+        """
+        Выбирает пул по размеру задачи
+        
+        Args:
+            size (int): Количество объявлений в задаче
+            fn (Callable): Функция уровня модуля
+        """
+        if size >= self.process_threshold:
+            return await self.run_cpu(fn, *args)
+        return await self.run_io(fn, *args)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Состояние пулов для /api/v1/health"""
+        return {
+            'process_threshold': self.process_threshold,
+            'thread': self.io.stats(),
+            'process': self.cpu.stats()
+        }
+    
+    def shutdown(self) -> None:
+        """Останавливает пулы"""
+        self.io.shutdown()
+        self.cpu.shutdown()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import uuid
+import asyncio
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from loguru import logger
+
+from root_xml import FeedWriter, feed_filename, serialize_ads
+from executors import FeedExecutor
+
+class Job:
+    """Задача фоновой генерации фида"""
+    
+    def __init__(self, category: str, ads: List[Dict]):
+        self.id = uuid.uuid4().hex
+        self.category = category
+        self.ads: Optional[List[Dict]] = ads
+        self.total = len(ads)
+        self.written = 0
+        self.status = 'queued'
+        self.file: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+    
+    @property
+    def finished(self) -> bool:
+        return self.status in ('done', 'failed')
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'category': self.category,
+            'total': self.total,
+            'written': self.written,
+            'file': self.file,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class JobManager:
+    """
+    Ограниченная очередь задач и пул фоновых обработчиков
+    
+    Каждая задача режется на пачки по chunk_size объявлений. Пачки
+    сериализуются параллельно в пуле исполнителя (для больших задач — в пуле
+    процессов), а записываются в файл по порядку, так что пропускная
+    способность определяется числом ядер, а не числом HTTP-соединений.
+    """
+    
+    def __init__(
+        self,
+        executor: FeedExecutor,
+        workers: int = 2,
+        queue_size: int = 100,
+        chunk_size: int = 1000,
+        max_jobs: int = 1000
+    ):
+        """
+        Args:
+            executor (FeedExecutor): Пулы для сериализации и записи
+            workers (int): Количество одновременно выполняемых задач
+            queue_size (int): Максимальная длина очереди задач
+            chunk_size (int): Количество объявлений в одной пачке
+            max_jobs (int): Сколько задач хранить для опроса статуса
+        """
+        self.executor = executor
+        self.workers = workers
+        self.queue_size = queue_size
+        self.chunk_size = chunk_size
+        self.max_jobs = max_jobs
+        # ServiceMetrics, обработка изображений, директория и сжатие фидов задаются сервисом
+        self.metrics = None
+        self.image_pipeline = None
+        self.directory = 'out_xml'
+        self.compress = False
+        self.jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+    
+    @classmethod
+    def from_env(cls, executor: FeedExecutor) -> 'JobManager':
+        """Создает менеджер задач по переменным окружения MCP_*"""
+        return cls(
+            executor,
+            workers=int(os.getenv('MCP_JOB_WORKERS', '2')),
+            queue_size=int(os.getenv('MCP_JOB_QUEUE_SIZE', '100'))
+        )
+    
+    async def start(self, app=None) -> None:
+        """Запускает обработчики задач"""
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ]
+    
+    async def stop(self, app=None) -> None:
+        """Останавливает обработчики задач"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    def submit(self, category: str, ads: List[Dict]) -> Job:
+        """
+        Ставит задачу в очередь
+        
+        Raises:
+            asyncio.QueueFull: Если очередь заполнена
+        """
+        job = Job(category, ads)
+        self._queue.put_nowait(job)
+        self.jobs[job.id] = job
+        self._prune()
+        return job
+    
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+    
+    def stats(self) -> Dict[str, int]:
+        """Состояние очереди для /api/v1/health"""
+        return {
+            'workers': self.workers,
+            'queued': self._queue.qsize() if self._queue else 0,
+            'running': sum(1 for job in self.jobs.values() if job.status == 'running')
+        }
+    
+    def _prune(self) -> None:
+        # Удаляем самые старые завершенные задачи сверх лимита
+        excess = len(self.jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        for job_id in [j.id for j in self.jobs.values() if j.finished][:excess]:
+            del self.jobs[job_id]
+    
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+    
+    async def _run(self, job: Job) -> None:
+        job.status = 'running'
+        filename = feed_filename('avito_job')
+        feed = FeedWriter(filename, category=job.category, directory=self.directory, compress=self.compress)
+        pending = deque()
+        # Текущая операция с файлом: поток пула не прерывается отменой задачи,
+        # и удалять файл можно только после ее завершения
+        file_op: Optional[asyncio.Future] = None
+        
+        async def run_file_op(fn, *args) -> Any:
+            nonlocal file_op
+            file_op = asyncio.ensure_future(self.executor.run_io(fn, *args))
+            return await asyncio.shield(file_op)
+        
+        async def write_next() -> None:
+            fragment, count = await pending.popleft()
+            await run_file_op(feed.write_fragment, fragment, count)
+            job.written += count
+        
+        try:
+            if self.image_pipeline is not None:
+                await self.executor.run_io(self.image_pipeline.process_ads, job.ads)
+            await run_file_op(feed.open)
+            # Держим в работе не больше пачек, чем процессов в пуле
+            in_flight = max(self.executor.cpu.max_workers, 1)
+            for start in range(0, job.total, self.chunk_size):
+                chunk = job.ads[start:start + self.chunk_size]
+                future = self.executor.run(job.total, serialize_ads, chunk)
+                pending.append(asyncio.ensure_future(self._with_count(future, len(chunk))))
+                if len(pending) >= in_flight:
+                    await write_next()
+            while pending:
+                await write_next()
+            
+            job.file = await run_file_op(feed.close)
+            job.status = 'done'
+            if self.metrics is not None:
+                self.metrics.record_feed('jobs', feed.stats)
+            
+        except asyncio.CancelledError:
+            # Остановка сервиса: задача не должна остаться в статусе running,
+            # а недописанный временный файл — на диске
+            for future in pending:
+                future.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            if file_op is not None:
+                await asyncio.gather(file_op, return_exceptions=True)
+            feed.abort()
+            job.status = 'failed'
+            job.error = 'Job cancelled'
+            logger.warning(f"Job {job.id} cancelled")
+            raise
+            
+        except Exception as e:
+            for future in pending:
+                future.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            await self.executor.run_io(feed.abort)
+            job.status = 'failed'
+            job.error = str(e)
+            logger.error(f"Error in job {job.id}: {str(e)}")
+            
+        finally:
+            job.ads = None
+            job.finished_at = datetime.now()
+    
+    @staticmethod
+    async def _with_count(future, count: int):
+        return await future, count
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+from aiohttp import web
+
+# Границы корзин гистограмм задержек в секундах
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    pairs = [
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """Базовая метрика с набором значений по меткам"""
+
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def samples(self) -> List[str]:
+        return [
+            f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+            for labels, value in self._values.items()
+        ]
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+class Counter(Metric):
+    """Монотонно растущий счетчик"""
+
+    type = 'counter'
+
+    def inc(self, amount: float = 1, labels: Tuple = ()) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+class Gauge(Metric):
+    """Значение, которое может расти и уменьшаться"""
+
+    type = 'gauge'
+
+    def set(self, value: float, labels: Tuple = ()) -> None:
+        self._values[labels] = value
+
+    def inc(self, amount: float = 1, labels: Tuple = ()) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, amount: float = 1, labels: Tuple = ()) -> None:
+        self.inc(-amount, labels)
+
+class Histogram(Metric):
+    """
+    Гистограмма с фиксированными корзинами
+
+    Наблюдение стоит одного двоичного поиска и трех сложений; накопленные
+    значения корзин считаются только при выдаче метрик.
+    """
+
+    type = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # По меткам: [счетчики корзин (+Inf последняя), сумма, количество]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, labels: Tuple = ()) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="{}"'.format(_format_value(bound) if bound != float('inf') else '+Inf')
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {count}')
+        return lines
+
+class Registry:
+    """Набор метрик в формате Prometheus"""
+
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self.metrics) + '\n'
+
+class ServiceMetrics:
+    """Метрики MCP сервиса: HTTP-запросы и этапы построения фидов"""
+
+    def __init__(self):
+        self.registry = Registry()
+        register = self.registry.register
+        self.requests = register(Counter(
+            'mcp_http_requests_total', 'HTTP requests by route and status',
+            ('method', 'route', 'status')
+        ))
+        self.latency = register(Histogram(
+            'mcp_http_request_duration_seconds', 'HTTP request latency', ('method', 'route')
+        ))
+        self.in_flight = register(Gauge(
+            'mcp_http_requests_in_flight', 'HTTP requests being processed'
+        ))
+        self.feeds = register(Counter(
+            'mcp_feeds_written_total', 'Feed files written', ('source',)
+        ))
+        self.ads = register(Counter(
+            'mcp_feed_ads_written_total', 'Ads written to feeds', ('source',)
+        ))
+        self.bytes = register(Counter(
+            'mcp_feed_bytes_written_total', 'Bytes written to feed files', ('source',)
+        ))
+        self.phase = register(Histogram(
+            'mcp_feed_phase_seconds', 'Time spent per feed generation phase', ('phase',)
+        ))
+        self.pool_queued = register(Gauge(
+            'mcp_executor_queued', 'Tasks waiting in executor pools', ('pool',)
+        ))
+        self.pool_running = register(Gauge(
+            'mcp_executor_running', 'Tasks running in executor pools', ('pool',)
+        ))
+        self.in_flight.set(0)
+
+    def record_feed(self, source: str, stats: Dict) -> None:
+        """
+        Учитывает статистику записанного фида
+
+        Args:
+            source (str): Обработчик, записавший фид
+            stats (Dict): FeedWriter.stats
+        """
+        self.feeds.inc(labels=(source,))
+        self.ads.inc(stats['ads'], (source,))
+        self.bytes.inc(stats['bytes'], (source,))
+        for phase in ('build', 'serialize', 'write'):
+            seconds = stats.get(f'{phase}_seconds')
+            if seconds:
+                self.phase.observe(seconds, (phase,))
+
+    def middleware(self):
+        """Middleware aiohttp для учета задержек и запросов в работе"""
+        @web.middleware
+        async def metrics_middleware(request: web.Request, handler):
+            resource = request.match_info.route.resource
+            route = resource.canonical if resource is not None else 'unmatched'
+            method = request.method
+            status = 500
+            self.in_flight.inc()
+            start = time.perf_counter()
+            try:
+                response = await handler(request)
+                status = response.status
+                return response
+            except web.HTTPException as e:
+                status = e.status
+                raise
+            finally:
+                self.in_flight.dec()
+                self.latency.observe(time.perf_counter() - start, (method, route))
+                self.requests.inc(labels=(method, route, status))
+        return metrics_middleware
+
+    def render(self, executor_stats: Optional[Dict] = None) -> str:
+        """Текст метрик; состояние пулов снимается в момент запроса"""
+        if executor_stats:
+            for pool in ('thread', 'process'):
+                self.pool_queued.set(executor_stats[pool]['queued'], (pool,))
+                self.pool_running.set(executor_stats[pool]['running'], (pool,))
+        return self.registry.render()
@@ -0,0 +1,104 @@
+import json
+import pickle
+import pytest
+import ad_model
+from ad_model import Ad, AdValidationError, ad_fields, decode_ad, decode_bulk, validate_ad
+
+AD = {
+    "title": "iPhone",
+    "description": "Описание",
+    "price": 1000,
+    "images": ["https://example.com/1.jpg"],
+    "params": {"Condition": "Новое", "Id": 7}
+}
+
+def test_from_dict():
+    """Тест разбора объявления и доступа по ключу, как у словаря"""
+    ad = Ad.from_dict(dict(AD, price='1500', category='Телефоны'))
+
+    assert ad.price == 1500
+    assert ad['title'] == 'iPhone'
+    assert ad.get('params')['Id'] == 7
+    assert 'category' in ad and 'id' not in ad
+    with pytest.raises(KeyError):
+        ad['id']
+    assert ad.to_dict() == dict(AD, price=1500, category='Телефоны')
+    assert Ad.from_dict(ad) is ad
+
+def test_from_dict_defaults():
+    """Тест необязательных полей"""
+    ad = Ad.from_dict({"title": "Товар", "description": "", "price": 10.0})
+
+    assert (ad.price, ad.images, ad.params) == (10, [], {})
+    assert not hasattr(ad, '__dict__')
+
+@pytest.mark.parametrize('changes, error', [
+    ({'price': [1000]}, 'price'),
+    ({'price': True}, 'price'),
+    ({'price': -1}, 'price'),
+    ({'price': 99.5}, 'price'),
+    ({'price': '²'}, 'price'),
+    ({'price': '١٢'}, 'price'),
+    ({'price': '-5'}, 'price'),
+    ({'price': '1_000'}, 'price'),
+    ({'title': None}, 'title'),
+    ({'images': 'https://example.com/1.jpg'}, 'images'),
+    ({'images': [1]}, 'images'),
+    ({'params': {'Brand': {'name': 'Apple'}}}, 'params.Brand'),
+])
+def test_from_dict_wrong_types(changes, error):
+    """Тест ошибок типов полей"""
+    with pytest.raises(AdValidationError, match=error):
+        Ad.from_dict(dict(AD, **changes))
+
+def test_missing_fields():
+    """Тест сообщений об отсутствующих полях"""
+    with pytest.raises(AdValidationError, match='Missing required field: description'):
+        Ad.from_dict({"title": "Товар", "price": 1})
+    with pytest.raises(AdValidationError, match='Missing required field: category'):
+        Ad.from_dict(AD, require_category=True)
+    with pytest.raises(AdValidationError, match='JSON object'):
+        Ad.from_dict([AD])
+
+def test_pickle_roundtrip():
+    """Тест передачи объявления в пул процессов"""
+    ad = Ad.from_dict(dict(AD, id='a-1'))
+
+    assert pickle.loads(pickle.dumps(ad)) == ad
+
+@pytest.mark.parametrize('use_orjson', [True, False])
+def test_decode_bulk(monkeypatch, use_orjson):
+    """Тест разбора массовой загрузки с orjson и стандартным json"""
+    if not use_orjson:
+        monkeypatch.setattr(ad_model, 'orjson', None)
+    elif ad_model.orjson is None:
+        pytest.skip('orjson не установлен')
+    body = json.dumps({"category": "Телефоны", "ads": [AD, dict(AD, price='1500')]}).encode('utf-8')
+
+    category, ads = decode_bulk(body)
+
+    assert category == 'Телефоны'
+    assert ads == [AD, dict(AD, price=1500)]
+    assert all(type(ad) is dict for ad in ads)
+
+def test_validate_ad_in_place():
+    """Тест проверки словаря без создания Ad"""
+    data = {"title": "Товар", "description": "", "price": '10'}
+
+    assert validate_ad(data) is data
+    assert data['price'] == 10
+    assert ad_fields(data) == ("Товар", "", 10, [], {})
+    ad = Ad.from_dict(AD)
+    assert validate_ad(ad) is ad
+    assert ad_fields(ad) == ad_fields(dict(AD))
+
+def test_decode_errors():
+    """Тест ошибок разбора JSON и номера некорректного объявления"""
+    with pytest.raises(AdValidationError, match='Invalid JSON'):
+        decode_ad(b'{"title": ')
+    with pytest.raises(AdValidationError, match='Missing required fields: category, ads'):
+        decode_bulk(b'{"ads": []}')
+    with pytest.raises(AdValidationError, match='Field category'):
+        decode_bulk({"category": ["Телефоны"], "ads": []})
+    with pytest.raises(AdValidationError, match='Ad 1: Field price'):
+        decode_bulk({"category": "Телефоны", "ads": [AD, dict(AD, price='дорого')]})
@@ -0,0 +1,69 @@
+import pytest
+from unittest.mock import patch
+from ad_store import AdStore
+from root_xml import write_feed
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Фикстура хранилища во временной директории"""
+    monkeypatch.chdir(tmp_path)
+    store = AdStore(str(tmp_path / 'data' / 'ads.sqlite3'))
+    yield store
+    store.close()
+
+def _ads(count, price=1000):
+    return [
+        {"title": f"Товар {i}", "description": "Описание & <теги>", "price": price,
+         "images": [f"https://example.com/{i}.jpg"], "params": {"Id": str(i)}}
+        for i in range(count)
+    ]
+
+def test_export_matches_write_feed(store):
+    """Тест совпадения собранного фида с потоковой записью"""
+    ads = _ads(5)
+    store.upsert(ads)
+
+    with open(store.export('merged.xml'), 'rb') as f:
+        merged = f.read()
+    with open(write_feed(ads, 'direct.xml'), 'rb') as f:
+        assert merged == f.read()
+
+def test_only_changed_ads_are_serialized(store):
+    """Тест повторной сериализации только измененных объявлений"""
+    ads = _ads(10)
+    store.upsert(ads)
+    ads[3]['price'] = 5000
+
+    with patch('ad_store.serialize_ad', wraps=__import__('ad_store').serialize_ad) as serialize:
+        stats = store.upsert(ads)
+
+    assert stats == {'added': 0, 'changed': 1, 'skipped': 9}
+    assert serialize.call_count == 1
+    assert store.count() == 10
+
+def test_delete_removes_ads_from_export(store):
+    """Тест удаления объявлений из хранилища и фида"""
+    store.upsert(_ads(5))
+
+    assert store.delete(['1', '3', 'unknown']) == 2
+    assert store.delete(['1']) == 0
+    assert store.count() == 3
+
+    with open(store.export('feed.xml'), 'rb') as f:
+        feed = f.read()
+    assert b'<Id>1</Id>' not in feed and b'<Id>3</Id>' not in feed
+    assert feed.count(b'<Ad>') == 3
+
+def test_prune_keeps_listed_ads(store, monkeypatch):
+    """Тест полной синхронизации: удаляются объявления, которых нет в каталоге"""
+    monkeypatch.setattr('ad_store.LOOKUP_BATCH_SIZE', 2)
+    store.upsert(_ads(6))
+
+    assert store.prune(['0', '2', '4', '4', 'new']) == 3
+    assert store.count() == 3
+    assert store.prune(['0', '2', '4']) == 0
+
+    stats = store.upsert(_ads(2))
+    assert stats == {'added': 1, 'changed': 0, 'skipped': 1}
+    assert store.prune([]) == 4
+    assert store.count() == 0
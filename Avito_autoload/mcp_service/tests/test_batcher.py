@@ -0,0 +1,46 @@
+import asyncio
+import xml.etree.ElementTree as ET
+from batcher import AdBatcher, write_batch
+from executors import FeedExecutor
+from ad_model import AdValidationError
+
+ADS = [
+    {"title": "Товар 1", "description": "Описание 1", "price": 1000},
+    {"title": "Товар 2", "description": "Описание 2", "price": 2000, "params": {"Condition": "Б/у"}},
+]
+
+def test_write_batch_skips_broken_ad(tmp_path):
+    """Тест: ошибка в одном объявлении не отменяет запись остальных"""
+    stats, results = write_batch([ADS[0], {"title": "Без описания"}, ADS[1]], 'batch.xml', str(tmp_path))
+
+    assert results[0] == 0 and results[2] == 1
+    assert isinstance(results[1], AdValidationError)
+    assert stats['ads'] == 2
+    titles = [ad.find('Title').text for ad in ET.parse(stats['file']).getroot()]
+    assert titles == ['Товар 1', 'Товар 2']
+
+def test_write_batch_all_broken(tmp_path):
+    """Тест: пачка без корректных объявлений не создает файл"""
+    stats, results = write_batch([{"title": "Без описания"}], 'batch.xml', str(tmp_path))
+
+    assert stats is None
+    assert isinstance(results[0], AdValidationError)
+    assert not list(tmp_path.iterdir())
+
+async def test_batcher_close_flushes_pending(tmp_path):
+    """Тест записи накопленной пачки при остановке, не дожидаясь окна"""
+    executor = FeedExecutor(io_workers=1)
+    batcher = AdBatcher(executor, window=60, directory=str(tmp_path))
+    try:
+        pending = [asyncio.ensure_future(batcher.add(ad)) for ad in ADS]
+        await asyncio.sleep(0)
+        assert batcher.stats()['pending'] == 2
+
+        await batcher.close()
+        results = await asyncio.gather(*pending)
+    finally:
+        executor.shutdown()
+
+    assert [r['position'] for r in results] == [0, 1]
+    assert results[0]['file'] == results[1]['file']
+    assert batcher.stats() == {'pending': 0, 'writing': 0, 'batches': 1}
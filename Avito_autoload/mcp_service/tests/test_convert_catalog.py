@@ -0,0 +1,140 @@
+import json
+import pytest
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from convert_catalog import convert_catalog, iter_yml_offers, main, parse_price, row_to_ad, CSV_MAPPING
+
+CSV = (
+    'Наименование;Описание;Цена;Фото;Артикул;Бренд;Цвет\n'
+    'Телефон;Новый телефон;"15 990,50";https://example.com/1.jpg|https://example.com/2.jpg;A-1;Apple;Черный\n'
+    'Без цены;Описание;;;A-2;Apple;\n'
+    'Чехол;Чехол для телефона;990;;A-3;;Красный\n'
+)
+
+YML = '''<?xml version="1.0" encoding="UTF-8"?>
+<yml_catalog date="2024-01-01 12:00">
+  <shop>
+    <categories>
+      <category id="1">Телефоны</category>
+    </categories>
+    <offers>
+      <offer id="101" available="true">
+        <name>Телефон</name>
+        <price>15990</price>
+        <categoryId>1</categoryId>
+        <picture>https://example.com/1.jpg</picture>
+        <picture>https://example.com/2.jpg</picture>
+        <vendor>Apple</vendor>
+        <description>Новый телефон</description>
+        <param name="Цвет">Черный</param>
+      </offer>
+      <offer id="102" available="true">
+        <name>Чехол</name>
+        <price>990.00</price>
+        <categoryId>1</categoryId>
+        <description>Чехол для телефона</description>
+      </offer>
+    </offers>
+  </shop>
+</yml_catalog>
+'''
+
+MAPPING = {
+    'title': 'Наименование',
+    'description': 'Описание',
+    'price': 'Цена',
+    'images': 'Фото',
+    'id': 'Артикул',
+    'params': {'Brand': 'Бренд'},
+    'defaults': {'Condition': 'Новое'},
+    'other_columns': False,
+    'images_separator': '|'
+}
+
+def feed_ads(path):
+    return [{child.tag: child for child in ad} for ad in ET.parse(path).getroot()]
+
+def test_parse_price():
+    """Тест разбора цены из текста каталога"""
+    assert parse_price('15 990,50') == 15990
+    assert parse_price('1\xa0000') == 1000
+    assert parse_price('990.00') == 990
+    assert parse_price('договорная') == 'договорная'
+    for value in ('inf', '-inf', 'nan', '1e400'):
+        assert parse_price(value) == value
+    assert parse_price(100) == 100
+
+def test_row_to_ad_other_columns():
+    """Тест: остальные колонки CSV по умолчанию становятся тегами"""
+    ad = row_to_ad(
+        {'title': 'Товар', 'description': 'Описание', 'price': '100', 'images': 'a.jpg, b.jpg', 'Brand': 'X', 'Empty': ''},
+        CSV_MAPPING
+    )
+    assert ad.images == ['a.jpg', 'b.jpg']
+    assert ad.params == {'Brand': 'X'}
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 100])
+def test_convert_csv(tmp_path, chunk_size):
+    """Тест конвертации CSV: порядок строк, сопоставление и отчет об ошибках"""
+    source = tmp_path / 'catalog.csv'
+    source.write_text(CSV, encoding='utf-8')
+    progress = []
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        stats = convert_catalog(
+            str(source), str(tmp_path / 'feed.xml'), mapping=MAPPING, chunk_size=chunk_size,
+            executor=executor, progress=lambda s: progress.append(s['rows'])
+        )
+
+    assert (stats['rows'], stats['ads'], stats['error_count']) == (3, 2, 1)
+    assert stats['errors'][0][0] == 2 and 'price' in stats['errors'][0][1]
+    assert progress[-1] == 3
+    ads = feed_ads(tmp_path / 'feed.xml')
+    assert [ad['Title'].text for ad in ads] == ['Телефон', 'Чехол']
+    assert ads[0]['Price'].text == '15990'
+    assert [img.get('url') for img in ads[0]['Images']] == ['https://example.com/1.jpg', 'https://example.com/2.jpg']
+    assert ads[0]['Brand'].text == 'Apple' and ads[0]['Id'].text == 'A-1'
+    assert ads[1]['Condition'].text == 'Новое' and 'Brand' not in ads[1]
+    assert 'Цвет' not in ads[0]
+
+def test_convert_csv_skips_infinite_price(tmp_path):
+    """Тест: цена inf отклоняется для своей строки, а не прерывает конвертацию"""
+    source = tmp_path / 'catalog.csv'
+    source.write_text('title,description,price\nТовар,Описание,100\nДругой,Описание,inf\n', encoding='utf-8')
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        stats = convert_catalog(str(source), str(tmp_path / 'feed.xml'), executor=executor)
+
+    assert (stats['ads'], stats['error_count']) == (1, 1)
+    assert stats['errors'][0][0] == 2
+
+def test_iter_yml_offers(tmp_path):
+    """Тест разбора предложений YML"""
+    source = tmp_path / 'catalog.yml'
+    source.write_text(YML, encoding='utf-8')
+    offers = list(iter_yml_offers(str(source)))
+
+    assert offers[0]['id'] == '101'
+    assert offers[0]['picture'] == ['https://example.com/1.jpg', 'https://example.com/2.jpg']
+    assert offers[0]['param:Цвет'] == 'Черный'
+    assert offers[0]['category'] == 'Телефоны'
+    assert offers[1]['picture'] == []
+
+def test_convert_yml_cli(tmp_path):
+    """Тест командной строки на каталоге YML с сопоставлением по умолчанию"""
+    source = tmp_path / 'catalog.yml'
+    source.write_text(YML, encoding='utf-8')
+    output = tmp_path / 'out' / 'feed.xml'
+    report = tmp_path / 'report.json'
+
+    code = main([str(source), '-o', str(output), '--default', 'Condition=Новое', '--workers', '1',
+                 '--gzip', '--report', str(report)])
+
+    assert code == 0
+    assert (tmp_path / 'out' / 'feed.xml.gz').exists()
+    ads = feed_ads(output)
+    assert [ad['Title'].text for ad in ads] == ['Телефон', 'Чехол']
+    assert ads[0]['Цвет'].text == 'Черный'
+    assert ads[0]['Category'].text == 'Телефоны'
+    assert ads[0]['Brand'].text == 'Apple'
+    assert ads[1]['Price'].text == '990'
+    assert ads[1]['Condition'].text == 'Новое'
+    assert json.loads(report.read_text(encoding='utf-8'))['ads'] == 2
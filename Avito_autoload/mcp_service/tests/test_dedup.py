@@ -0,0 +1,109 @@
+import random
+import pytest
+from dedup import DuplicateIndex, dedup_ads, fingerprint, minhash, similarity
+
+WORDS = ('телефон', 'отличное', 'состояние', 'гарантия', 'коробка', 'чек', 'доставка', 'торг',
+         'оригинал', 'царапин', 'аккумулятор', 'держит', 'долго', 'чехол', 'стекло', 'зарядка')
+
+def make_ad(i, words=40, **fields):
+    # Описание детерминировано номером объявления
+    rng = random.Random(i)
+    description = ' '.join(f'{rng.choice(WORDS)}{rng.randrange(100)}' for _ in range(words))
+    return {'title': f'Товар {i}', 'description': description, 'price': 1000,
+            'images': [f'https://example.com/{i}.jpg'], **fields}
+
+def test_fingerprint_normalization():
+    """Тест: регистр, пунктуация и порядок фото не влияют на точный отпечаток"""
+    a = {'title': 'iPhone 15, Pro!', 'description': 'Ёлка', 'images': ['1.jpg', '2.jpg']}
+    b = {'title': 'iphone 15 pro', 'description': 'елка', 'images': ['2.jpg', '1.jpg']}
+    assert fingerprint(a)[0] == fingerprint(b)[0]
+    assert fingerprint(a)[0] != fingerprint(dict(b, images=['1.jpg']))[0]
+
+def test_minhash_similarity():
+    """Тест: оценка сходства по сигнатурам близка к сходству Жаккара"""
+    tokens = {f'token {i}' for i in range(200)}
+    assert similarity(minhash(tokens), minhash(set(tokens))) == 1.0
+    # Сходство 180/220 ≈ 0.82
+    close = set(list(tokens)[:180]) | {f'other {i}' for i in range(20)}
+    assert 0.6 <= similarity(minhash(tokens), minhash(close)) <= 1.0
+    assert similarity(minhash(tokens), minhash({f'other {i}' for i in range(200)})) < 0.2
+    assert minhash(set()) is None
+
+def test_index_exact_and_near_duplicates():
+    """Тест поиска точных и почти одинаковых объявлений"""
+    index = DuplicateIndex(threshold=0.7)
+    for i in range(200):
+        assert index.add(make_ad(i), i) is None
+    assert len(index) == 200
+
+    copy = make_ad(5, title='ТОВАР 5!')
+    assert index.check(copy) == {'duplicate_of': 5, 'similarity': 1.0, 'exact': True}
+
+    # Одно слово описания заменено
+    near = make_ad(7)
+    words = near['description'].split()
+    words[20] = 'замена'
+    near['description'] = ' '.join(words)
+    match = index.check(near)
+    assert match['duplicate_of'] == 7 and not match['exact']
+    assert match['similarity'] >= 0.7
+
+    assert index.check(make_ad(1000)) is None
+    # check() не добавляет объявление в индекс
+    assert len(index) == 200
+
+def test_packed_score_matches_similarity():
+    """Тест: сравнение сигнатур в индексе дает ту же оценку, что similarity()"""
+    index = DuplicateIndex(threshold=0.5)
+    original = make_ad(1)
+    index.add(original, 1)
+    words = original['description'].split()
+    for changed in (5, 10):
+        near = dict(original, description=' '.join(words[:-changed] + ['замена'] * changed))
+        match = index.check(near)
+        expected = similarity(minhash(fingerprint(original)[1]), minhash(fingerprint(near)[1]))
+        assert match is not None and match['similarity'] == expected
+
+def test_max_candidates():
+    """Тест: при ограничении кандидатов первыми сравниваются попавшие в большее число корзин"""
+    original = make_ad(1000)
+
+    def changed(positions, word):
+        words = original['description'].split()
+        for position in positions:
+            words[position] = word
+        return dict(original, description=' '.join(words))
+
+    index = DuplicateIndex(threshold=0.85, max_candidates=1)
+    # Объявления с каждым четвертым словом заменено делят с оригиналом
+    # часть корзин, но не проходят порог и добавляются в индекс раньше него
+    for i in range(40):
+        assert index.add(changed(range(i % 4, 40, 4), f'слово{i}'), i) is None
+    index.add(original, 'original')
+
+    assert index.check(changed([20], 'замена'))['duplicate_of'] == 'original'
+
+def test_dedup_ads_modes():
+    """Тест режимов flag и drop с отчетом"""
+    ads = [make_ad(0), make_ad(1), make_ad(0, price=2000), make_ad(2), make_ad(1)]
+
+    kept, report = dedup_ads(ads, 'flag')
+    assert kept == ads
+    assert [(r['index'], r['duplicate_of']) for r in report] == [(2, 0), (4, 1)]
+    assert report[0]['title'] == 'Товар 0'
+
+    kept, report = dedup_ads(ads, 'drop')
+    assert kept == [ads[0], ads[1], ads[3]]
+    assert len(report) == 2
+
+    with pytest.raises(ValueError):
+        dedup_ads(ads, 'remove')
+
+def test_dedup_ads_shared_index():
+    """Тест проверки нескольких пачек по одному индексу с ключами-номерами строк"""
+    index = DuplicateIndex()
+    dedup_ads([make_ad(0), make_ad(1)], 'drop', index=index, keys=[1, 2])
+    kept, report = dedup_ads([make_ad(1), make_ad(3)], 'drop', index=index, keys=[3, 4])
+
+    assert kept == [make_ad(3)]
+    assert report[0]['index'] == 3 and report[0]['duplicate_of'] == 2
@@ -0,0 +1,131 @@
+import os
+import hashlib
+import pytest
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from feed_shards import (
+    build_sharded_feed, load_manifest, regenerate_shard, shard_filename, write_shard
+)
+from ad_model import AdValidationError
+
+def make_ads(count, prefix='Товар'):
+    return [
+        {"title": f"{prefix} {i}", "description": "Описание " * 10, "price": 1000 + i}
+        for i in range(count)
+    ]
+
+def sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def titles(path):
+    return [ad.find('Title').text for ad in ET.parse(path).getroot()]
+
+def test_build_sharded_feed_removes_shards_on_error(tmp_path):
+    """Тест: при ошибке одного шарда записанные шарды удаляются, манифест не пишется"""
+    ads = make_ads(25)
+    ads[15]['price'] = 'дорого'
+    (tmp_path / 'other_0000.xml').write_text('')
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        with pytest.raises(AdValidationError):
+            build_sharded_feed(ads, 'feed', str(tmp_path), shard_size=10, compress=True, executor=executor)
+
+    assert os.listdir(tmp_path) == ['other_0000.xml']
+
+def test_build_sharded_feed(tmp_path):
+    """Тест записи шардов и манифеста с размерами и контрольными суммами"""
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        manifest = build_sharded_feed(make_ads(25), 'feed', str(tmp_path), shard_size=10, executor=executor)
+
+    assert manifest == load_manifest(str(tmp_path), 'feed')
+    assert [part['file'] for part in manifest['shards']] == [shard_filename('feed', i) for i in range(3)]
+    assert [part['ads'] for part in manifest['shards']] == [10, 10, 5]
+    assert manifest['ads'] == 25
+    all_titles = []
+    for part in manifest['shards']:
+        path = tmp_path / part['file']
+        assert part['bytes'] == os.path.getsize(path)
+        assert part['sha256'] == sha256(path)
+        all_titles += titles(path)
+    assert all_titles == [ad['title'] for ad in make_ads(25)]
+
+def test_write_shard_max_bytes(tmp_path):
+    """Тест: шард, не помещающийся в лимит, продолжается в следующей части"""
+    parts = write_shard(make_ads(20), 'feed', 0, str(tmp_path), max_bytes=2000)
+
+    assert len(parts) > 1
+    assert [part['part'] for part in parts] == list(range(len(parts)))
+    assert sum(part['ads'] for part in parts) == 20
+    for part in parts:
+        assert os.path.getsize(part['file']) <= 2000
+        ET.parse(part['file'])
+
+def test_write_shard_invalid_ad(tmp_path):
+    """Тест: некорректное объявление обнаруживается до записи файлов"""
+    with pytest.raises(AdValidationError):
+        write_shard(make_ads(3) + [{"title": "Без цены", "description": ""}], 'feed', 0, str(tmp_path))
+    assert not list(tmp_path.iterdir())
+
+def test_regenerate_shard(tmp_path):
+    """Тест перезаписи одного шарда: остальные файлы не меняются"""
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        manifest = build_sharded_feed(
+            make_ads(30), 'feed', str(tmp_path), shard_size=10, max_shard_bytes=1500, executor=executor
+        )
+    shard_1 = [part for part in manifest['shards'] if part['index'] == 1]
+    assert len(shard_1) > 1
+    others = {part['file']: os.stat(tmp_path / part['file']).st_mtime_ns
+              for part in manifest['shards'] if part['index'] != 1}
+
+    updated = regenerate_shard('feed', 1, make_ads(2, 'Новый'), str(tmp_path))
+
+    new_shard_1 = [part for part in updated['shards'] if part['index'] == 1]
+    assert [part['file'] for part in new_shard_1] == [shard_filename('feed', 1)]
+    assert titles(tmp_path / shard_filename('feed', 1)) == ['Новый 0', 'Новый 1']
+    assert new_shard_1[0]['sha256'] == sha256(tmp_path / shard_filename('feed', 1))
+    # Лишние части прежней версии шарда удалены
+    for part in shard_1[1:]:
+        assert not (tmp_path / part['file']).exists()
+    assert {part['file']: os.stat(tmp_path / part['file']).st_mtime_ns
+            for part in updated['shards'] if part['index'] != 1} == others
+    assert updated['ads'] == 22
+    assert updated['created_at'] == manifest['created_at']
+    assert updated == load_manifest(str(tmp_path), 'feed')
+
+def test_regenerate_shard_out_of_range(tmp_path):
+    """Тест: номер шарда вне манифеста отклоняется, следующий за последним добавляет шард"""
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        build_sharded_feed(make_ads(10), 'feed', str(tmp_path), shard_size=5, executor=executor)
+
+    with pytest.raises(ValueError):
+        regenerate_shard('feed', 3, make_ads(1), str(tmp_path))
+    manifest = regenerate_shard('feed', 2, make_ads(1), str(tmp_path))
+    assert [part['index'] for part in manifest['shards']] == [0, 1, 2]
+    with pytest.raises(FileNotFoundError):
+        regenerate_shard('missing', 0, make_ads(1), str(tmp_path))
+
+def test_replace_shard_saves_manifest_first(tmp_path, monkeypatch):
+    """Тест: лишние части удаляются только после сохранения нового манифеста"""
+    import feed_shards
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        manifest = build_sharded_feed(
+            make_ads(10), 'feed', str(tmp_path), shard_size=10, max_shard_bytes=1500, executor=executor
+        )
+    stale = [part['file'] for part in manifest['shards']][1:]
+    assert stale
+
+    saved = []
+    save_manifest = feed_shards.save_manifest
+
+    def checking_save(directory, data):
+        # В момент сохранения файлы прежней версии шарда еще на месте
+        saved.append(all((tmp_path / name).exists() for name in stale))
+        return save_manifest(directory, data)
+
+    monkeypatch.setattr(feed_shards, 'save_manifest', checking_save)
+    regenerate_shard('feed', 0, make_ads(1), str(tmp_path))
+
+    assert saved == [True]
+    assert not any((tmp_path / name).exists() for name in stale)
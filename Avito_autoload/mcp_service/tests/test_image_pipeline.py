@@ -0,0 +1,117 @@
+import os
+import threading
+import pytest
+from PIL import Image
+from image_pipeline import ImagePipeline
+
+@pytest.fixture
+def pipeline(tmp_path):
+    """Фикстура конвейера с кешем во временной директории"""
+    pipeline = ImagePipeline(cache_dir=str(tmp_path / 'cache'), max_side=100, workers=1)
+    yield pipeline
+    pipeline.close()
+
+def _image(path, size=(400, 200), color='red', mode='RGB'):
+    Image.new(mode, size, color).save(path)
+    return str(path)
+
+def test_process_resizes_and_caches(pipeline, tmp_path):
+    """Тест уменьшения изображения и повторного использования кеша"""
+    src = _image(tmp_path / 'photo.png', mode='RGBA')
+
+    first = pipeline.process([src])
+    second = pipeline.process([src])
+
+    assert first == second
+    assert first[0].startswith(pipeline.cache_dir)
+    with Image.open(first[0]) as image:
+        assert image.format == 'JPEG'
+        assert image.size == (100, 50)
+    assert (pipeline.misses, pipeline.hits) == (1, 1)
+
+def test_process_deduplicates_by_content(pipeline, tmp_path):
+    """Тест однократной обработки одинаковых файлов"""
+    first = _image(tmp_path / 'a.png')
+    copy = _image(tmp_path / 'b.png')
+
+    results = pipeline.process([first, copy, 'https://example.com/1.jpg', 'missing.jpg'])
+
+    assert results[0] == results[1]
+    assert results[2:] == ['https://example.com/1.jpg', 'missing.jpg']
+    assert pipeline.misses == 1
+
+def test_concurrent_calls_process_image_once(pipeline, tmp_path):
+    """Тест: одновременные вызовы не обрабатывают одно изображение дважды"""
+    src = _image(tmp_path / 'photo.png', size=(2000, 1000))
+    barrier = threading.Barrier(4)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(pipeline.process([src]))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({result[0] for result in results}) == 1
+    assert pipeline.misses == 1
+    assert pipeline._inflight == {}
+
+def test_process_ads_with_url_prefix(tmp_path):
+    """Тест замены путей на ссылки для фида"""
+    pipeline = ImagePipeline(cache_dir=str(tmp_path / 'cache'), url_prefix='https://cdn.example.com/img/', workers=1)
+    src = _image(tmp_path / 'a.png')
+    ads = [{"title": "A", "images": [src]}, {"title": "B"}]
+
+    pipeline.process_ads(ads)
+    pipeline.close()
+
+    assert ads[0]['images'][0].startswith('https://cdn.example.com/img/')
+    assert ads[0]['images'][0].endswith('.jpg')
+    assert 'images' not in ads[1]
+
+def test_evict_removes_oldest(pipeline, tmp_path):
+    """Тест вытеснения давно неиспользованных файлов"""
+    old, new = pipeline.process([
+        _image(tmp_path / 'old.png', color='blue'),
+        _image(tmp_path / 'new.png', color='green')
+    ])
+    os.utime(old, (0, 0))
+    pipeline.max_cache_bytes = os.path.getsize(new)
+
+    assert pipeline.evict() == 1
+    assert not os.path.exists(old)
+    assert os.path.exists(new)
+
+def test_process_only_inside_source_dir(tmp_path):
+    """Тест: файлы вне source_dir (в том числе по ссылке) не обрабатываются"""
+    source_dir = tmp_path / 'images'
+    source_dir.mkdir()
+    inside = _image(source_dir / 'a.png')
+    outside = _image(tmp_path / 'secret.png', color='blue')
+    link = source_dir / 'link.png'
+    link.symlink_to(outside)
+    pipeline = ImagePipeline(
+        cache_dir=str(tmp_path / 'cache'), source_dir=str(source_dir),
+        url_prefix='https://cdn.example.com/img', workers=1
+    )
+
+    results = pipeline.process([inside, outside, str(link), str(source_dir / '..' / 'secret.png')])
+    pipeline.close()
+
+    assert results[0].startswith('https://cdn.example.com/img/')
+    assert results[1:] == [outside, str(link), str(source_dir / '..' / 'secret.png')]
+    assert pipeline.misses == 1
+
+def test_process_skips_large_source(tmp_path):
+    """Тест: слишком большой исходник не читается и не обрабатывается"""
+    src = _image(tmp_path / 'a.png')
+    pipeline = ImagePipeline(
+        cache_dir=str(tmp_path / 'cache'), max_source_bytes=os.path.getsize(src) - 1, workers=1
+    )
+
+    assert pipeline.process([src, str(tmp_path)]) == [src, str(tmp_path)]
+    assert pipeline.misses == 0
@@ -1,16 +1,19 @@
 import os
 import json
+import asyncio
 import pytest
 import xml.etree.ElementTree as ET
 from aiohttp import web
 from aiohttp.test_utils import TestClient, TestServer
 from datetime import datetime
 from avito_mcp import AvitoMCPService
+from executors import FeedExecutor
+from ad_store import AdStore
 
 @pytest.fixture
-async def client():
+async def client(tmp_path):
     """Фикстура для создания тестового клиента"""
-    service = AvitoMCPService()
+    service = AvitoMCPService(store=AdStore(str(tmp_path / 'ads.sqlite3')))
     app = service.app
     async with TestClient(TestServer(app)) as client:
         yield client
@@ -24,6 +27,8 @@ async def test_health_check(client):
     assert 'status' in data
     assert data['status'] == 'healthy'
     assert 'timestamp' in data
+    assert data['executors']['thread']['queued'] == 0
+    assert data['executors']['process']['queued'] == 0
 
 async def test_create_ad(client):
     """Тест создания одного объявления"""
@@ -149,4 +154,703 @@ async def test_create_bulk_ads_missing_category(client):
     
     data = await resp.json()
     assert 'error' in data
-    assert 'Missing required fields: category' in data['error'] 
\ No newline at end of file
+    assert 'Missing required fields: category' in data['error'] 
+async def test_create_bulk_ads_ndjson(client):
+    """Тест потокового создания объявлений из NDJSON"""
+    lines = [
+        json.dumps({"title": "iPhone 1", "description": "Description 1",
+                    "price": 100000, "params": {"Condition": "Новое"}}),
+        '',
+        json.dumps({"title": "iPhone 2", "price": 120000}),
+        '{broken json',
+        json.dumps({"title": "iPhone 3", "description": "Description 3",
+                    "price": 130000, "images": ["https://example.com/3.jpg"]}),
+    ]
+    body = '\n'.join(lines).encode('utf-8')
+
+    resp = await client.post(
+        '/api/v1/create_bulk_ads_ndjson',
+        params={'category': 'Электроника'},
+        data=body,
+        headers={'Content-Type': 'application/x-ndjson'}
+    )
+    assert resp.status == 200
+
+    data = await resp.json()
+    assert data['status'] == 'partial'
+    assert data['created'] == 2
+    assert [e['line'] for e in data['errors']] == [3, 4]
+    assert data['error_count'] == 2
+    assert 'Missing required field: description' in data['errors'][0]['error']
+
+    root = ET.parse(data['file']).getroot()
+    titles = [ad.find('Title').text for ad in root.findall('Ad')]
+    assert titles == ['iPhone 1', 'iPhone 3']
+
+async def test_create_bulk_ads_ndjson_error_limit(tmp_path):
+    """Тест ограничения числа ошибок, возвращаемых в ответе"""
+    service = AvitoMCPService(
+        store=AdStore(str(tmp_path / 'ads.sqlite3')),
+        feed_dir=str(tmp_path / 'feeds'),
+        max_ndjson_errors=2
+    )
+    lines = ['{broken'] * 5 + [json.dumps({"title": "iPhone", "description": "Description", "price": 1})]
+
+    async with TestClient(TestServer(service.app)) as client:
+        resp = await client.post(
+            '/api/v1/create_bulk_ads_ndjson',
+            params={'category': 'Электроника'},
+            data='\n'.join(lines).encode('utf-8'),
+            headers={'Content-Type': 'application/x-ndjson'}
+        )
+        data = await resp.json()
+
+    assert data['status'] == 'partial'
+    assert data['created'] == 1
+    assert [e['line'] for e in data['errors']] == [1, 2]
+    assert data['error_count'] == 5
+
+async def test_create_bulk_ads_ndjson_missing_category(client):
+    """Тест потокового создания объявлений без категории"""
+    resp = await client.post('/api/v1/create_bulk_ads_ndjson', data=b'{}\n')
+    assert resp.status == 400
+
+    data = await resp.json()
+    assert 'category' in data['error']
+
+async def test_iter_ndjson_lines_skips_oversized_line():
+    """Тест пропуска слишком длинной строки NDJSON"""
+    from aiohttp import StreamReader
+    from unittest.mock import MagicMock
+    from avito_mcp import iter_ndjson_lines
+
+    stream = StreamReader(MagicMock(), 2 ** 16, loop=asyncio.get_running_loop())
+    stream.feed_data(b'{"a": 1}\n' + b'x' * 100 + b'\n{"b": 2}')
+    stream.feed_eof()
+
+    lines = [item async for item in iter_ndjson_lines(stream, max_line_size=32, chunk_size=16)]
+    assert lines == [(1, b'{"a": 1}'), (2, None), (3, b'{"b": 2}')]
+
+async def test_create_bulk_ads_process_pool():
+    """Тест построения большого фида в пуле процессов"""
+    service = AvitoMCPService(executor=FeedExecutor(cpu_workers=1, process_threshold=2))
+    test_data = {
+        "category": "Электроника",
+        "ads": [
+            {"title": f"iPhone {i}", "description": "Description", "price": 1000 + i}
+            for i in range(3)
+        ]
+    }
+
+    async with TestClient(TestServer(service.app)) as client:
+        resp = await client.post('/api/v1/create_bulk_ads', json=test_data)
+        assert resp.status == 200
+        data = await resp.json()
+        assert service.executor.cpu._executor is not None
+        # Тело запроса разбирается в пуле потоков, фид — в пуле процессов
+        assert service.executor.io._executor is not None
+
+    root = ET.parse(data['file']).getroot()
+    assert len(root.findall('Ad')) == 3
+
+async def test_feed_executor_stats():
+    """Тест подсчета задач в очереди пула"""
+    executor = FeedExecutor(io_workers=1)
+    release = asyncio.Event()
+    loop = asyncio.get_running_loop()
+
+    def blocking():
+        asyncio.run_coroutine_threadsafe(release.wait(), loop).result()
+
+    tasks = [asyncio.create_task(executor.run_io(blocking)) for _ in range(3)]
+    await asyncio.sleep(0)
+    stats = executor.stats()['thread']
+    assert stats == {'workers': 1, 'running': 1, 'queued': 2}
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert executor.stats()['thread']['queued'] == 0
+    executor.shutdown()
+
+async def test_create_job(client):
+    """Тест фоновой генерации фида с опросом статуса"""
+    test_data = {
+        "category": "Электроника",
+        "ads": [
+            {"title": f"iPhone {i}", "description": "Description", "price": 1000 + i}
+            for i in range(5)
+        ]
+    }
+
+    resp = await client.post('/api/v1/jobs', json=test_data)
+    assert resp.status == 202
+    data = await resp.json()
+    assert data['status'] == 'queued'
+
+    for _ in range(100):
+        resp = await client.get(data['status_url'])
+        assert resp.status == 200
+        job = await resp.json()
+        if job['status'] in ('done', 'failed'):
+            break
+        await asyncio.sleep(0.01)
+
+    assert job['status'] == 'done'
+    assert job['total'] == job['written'] == 5
+    assert len(ET.parse(job['file']).getroot().findall('Ad')) == 5
+
+async def test_create_job_queue_full():
+    """Тест отказа при заполненной очереди задач"""
+    from jobs import JobManager
+
+    executor = FeedExecutor()
+    service = AvitoMCPService(
+        executor=executor,
+        jobs=JobManager(executor, workers=0, queue_size=1)
+    )
+    test_data = {
+        "category": "Электроника",
+        "ads": [{"title": "iPhone", "description": "Description", "price": 1000}]
+    }
+
+    async with TestClient(TestServer(service.app)) as client:
+        resp = await client.post('/api/v1/jobs', json=test_data)
+        assert resp.status == 202
+        resp = await client.post('/api/v1/jobs', json=test_data)
+        assert resp.status == 503
+
+async def test_get_unknown_job(client):
+    """Тест запроса несуществующей задачи"""
+    resp = await client.get('/api/v1/jobs/unknown')
+    assert resp.status == 404
+
+async def test_job_chunks_written_in_order():
+    """Тест порядка объявлений при параллельной сериализации пачек"""
+    from jobs import JobManager
+
+    executor = FeedExecutor(cpu_workers=2, process_threshold=1)
+    jobs = JobManager(executor, workers=1, chunk_size=2)
+    await jobs.start()
+    try:
+        job = jobs.submit('Электроника', [
+            {"title": f"iPhone {i}", "description": "Description", "price": i}
+            for i in range(7)
+        ])
+        await jobs._queue.join()
+    finally:
+        await jobs.stop()
+        executor.shutdown()
+
+    assert job.status == 'done'
+    assert job.written == 7
+    titles = [ad.find('Title').text for ad in ET.parse(job.file).getroot().findall('Ad')]
+    assert titles == [f"iPhone {i}" for i in range(7)]
+
+async def test_job_cancelled_on_stop(tmp_path, monkeypatch):
+    """Тест остановки обработчиков во время записи фида"""
+    import threading
+    from jobs import JobManager
+    from root_xml import FeedWriter
+
+    started = threading.Event()
+    release = threading.Event()
+    write_fragment = FeedWriter.write_fragment
+
+    def blocking_write(self, fragment, count):
+        started.set()
+        release.wait(5)
+        return write_fragment(self, fragment, count)
+
+    monkeypatch.setattr(FeedWriter, 'write_fragment', blocking_write)
+    executor = FeedExecutor()
+    jobs = JobManager(executor, workers=1)
+    jobs.directory = str(tmp_path)
+    await jobs.start()
+    try:
+        job = jobs.submit('Электроника', [
+            {"title": "iPhone", "description": "Description", "price": 1000}
+        ])
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        stopping = asyncio.create_task(jobs.stop())
+        await asyncio.sleep(0.05)
+        # Файл удаляется только после завершения записи в потоке пула
+        assert not stopping.done()
+        release.set()
+        await stopping
+    finally:
+        executor.shutdown()
+
+    assert job.status == 'failed'
+    assert job.error == 'Job cancelled'
+    assert job.finished_at is not None
+    assert os.listdir(tmp_path) == []
+
+async def test_sync_ads(client):
+    """Тест инкрементальной синхронизации каталога"""
+    ads = [
+        {"title": f"iPhone {i}", "description": "Description", "price": 1000,
+         "params": {"Id": f"sku-{i}"}}
+        for i in range(3)
+    ]
+
+    resp = await client.post('/api/v1/sync_ads', json={"category": "Электроника", "ads": ads})
+    assert resp.status == 200
+    data = await resp.json()
+    assert data['stats'] == {'added': 3, 'changed': 0, 'skipped': 0, 'removed': 0}
+
+    ads[1]['price'] = 2000
+    ads.append({"title": "iPhone 3", "description": "Description", "price": 1000, "id": "sku-3"})
+    resp = await client.post('/api/v1/sync_ads', json={"category": "Электроника", "ads": ads})
+    data = await resp.json()
+    assert data['stats'] == {'added': 1, 'changed': 1, 'skipped': 2, 'removed': 0}
+
+    prices = [ad.find('Price').text for ad in ET.parse(data['file']).getroot().findall('Ad')]
+    assert prices == ['1000', '2000', '1000', '1000']
+
+async def test_sync_ads_removes_ads(client):
+    """Тест удаления снятых с продажи объявлений при синхронизации"""
+    ads = [
+        {"title": f"iPhone {i}", "description": "Description", "price": 1000,
+         "params": {"Id": f"sku-{i}"}}
+        for i in range(4)
+    ]
+    resp = await client.post('/api/v1/sync_ads', json={"category": "Электроника", "ads": ads})
+    assert resp.status == 200
+
+    resp = await client.post('/api/v1/sync_ads', json={
+        "category": "Электроника", "ads": [], "delete": ["sku-0", "missing"]
+    })
+    data = await resp.json()
+    assert data['stats']['removed'] == 1
+
+    resp = await client.post('/api/v1/sync_ads', json={
+        "category": "Электроника", "ads": ads[2:], "full": True
+    })
+    data = await resp.json()
+    assert data['stats'] == {'added': 0, 'changed': 0, 'skipped': 2, 'removed': 1}
+    ids = [ad.find('Id').text for ad in ET.parse(data['file']).getroot().findall('Ad')]
+    assert ids == ['sku-2', 'sku-3']
+
+    for body in ({"full": "yes"}, {"delete": "sku-2"}, {"delete": [{"id": 1}]}):
+        resp = await client.post('/api/v1/sync_ads', json={"category": "Электроника", "ads": [], **body})
+        assert resp.status == 400
+
+async def test_sync_ads_missing_id(client):
+    """Тест синхронизации объявления без идентификатора"""
+    ads = [{"title": "iPhone", "description": "Description", "price": 1000}]
+
+    resp = await client.post('/api/v1/sync_ads', json={"category": "Электроника", "ads": ads})
+    assert resp.status == 400
+    data = await resp.json()
+    assert 'Missing ad id' in data['error']
+
+async def test_metrics(client):
+    """Тест метрик в формате Prometheus"""
+    test_data = {
+        "category": "Электроника",
+        "ads": [{"title": "iPhone", "description": "Description", "price": 1000}]
+    }
+    resp = await client.post('/api/v1/create_bulk_ads', json=test_data)
+    assert resp.status == 200
+    await client.get('/api/v1/jobs/unknown')
+
+    resp = await client.get('/metrics')
+    assert resp.status == 200
+    assert resp.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    text = await resp.text()
+
+    assert 'mcp_http_requests_total{method="POST",route="/api/v1/create_bulk_ads",status="200"} 1' in text
+    assert 'mcp_http_requests_total{method="GET",route="/api/v1/jobs/{job_id}",status="404"} 1' in text
+    assert 'mcp_http_request_duration_seconds_count{method="POST",route="/api/v1/create_bulk_ads"} 1' in text
+    assert 'mcp_http_requests_in_flight 1' in text
+    assert 'mcp_feed_ads_written_total{source="create_bulk_ads"} 1' in text
+    assert 'mcp_feed_phase_seconds_count{phase="serialize"} 1' in text
+    assert 'mcp_executor_queued{pool="thread"} 0' in text
+
+async def test_create_bulk_ads_large_body(client):
+    """Тест пакета больше стандартного лимита aiohttp в 1 МБ"""
+    ad = {"title": "Товар", "description": "Описание " * 200, "price": 1000}
+    test_data = {"category": "Электроника", "ads": [ad] * 1000}
+
+    resp = await client.post('/api/v1/create_bulk_ads', json=test_data)
+    assert resp.status == 200
+
+async def test_decode_body_off_event_loop(client, monkeypatch):
+    """Тест разбора тела массовых запросов вне потока event loop"""
+    import threading
+    import avito_mcp
+
+    threads = []
+    decode_json, decode_bulk = avito_mcp.decode_json, avito_mcp.decode_bulk
+
+    def record(decoder):
+        def wrapper(data):
+            threads.append(threading.current_thread())
+            return decoder(data)
+        return wrapper
+
+    monkeypatch.setattr(avito_mcp, 'decode_json', record(decode_json))
+    monkeypatch.setattr(avito_mcp, 'decode_bulk', record(decode_bulk))
+    test_data = {
+        "category": "Электроника",
+        "ads": [{"id": "1", "title": "iPhone", "description": "Description", "price": 1000}]
+    }
+
+    for path in ('/api/v1/create_bulk_ads', '/api/v1/sync_ads', '/api/v1/jobs'):
+        resp = await client.post(path, json=test_data)
+        assert resp.status in (200, 202)
+    resp = await client.post('/api/v1/create_bulk_ads', data=b'{"category": ')
+    assert resp.status == 400
+
+    assert len(threads) == 6
+    assert threading.main_thread() not in threads
+
+@pytest.fixture
+async def feed_client(tmp_path):
+    """Клиент сервиса с директорией фидов во временной директории"""
+    service = AvitoMCPService(
+        store=AdStore(str(tmp_path / 'ads.sqlite3')),
+        feed_dir=str(tmp_path / 'feeds'),
+        public_url='https://feeds.example.com/'
+    )
+    async with TestClient(TestServer(service.app)) as client:
+        yield client
+
+async def test_serve_feed(feed_client, tmp_path):
+    """Тест отдачи фида с ETag, Range и сжатой копией"""
+    test_data = {
+        "category": "Электроника",
+        "ads": [{"title": f"Товар {i}", "description": "Описание", "price": 1000} for i in range(50)]
+    }
+    resp = await feed_client.post('/api/v1/create_bulk_ads', json=test_data)
+    data = await resp.json()
+    name = os.path.basename(data['file'])
+    assert data['url'] == f'https://feeds.example.com/feeds/{name}'
+    with open(data['file'], 'rb') as f:
+        content = f.read()
+
+    resp = await feed_client.get(f'/feeds/{name}', headers={'Accept-Encoding': 'identity'})
+    assert resp.status == 200
+    assert await resp.read() == content
+    assert resp.headers['Content-Type'] == 'application/xml; charset=utf-8'
+    etag = resp.headers['ETag']
+
+    # Повторный запрос неизменного фида
+    resp = await feed_client.get(
+        f'/feeds/{name}', headers={'Accept-Encoding': 'identity', 'If-None-Match': etag}
+    )
+    assert resp.status == 304
+    assert await resp.read() == b''
+
+    resp = await feed_client.get(
+        f'/feeds/{name}', headers={'Accept-Encoding': 'identity', 'Range': 'bytes=0-37'}
+    )
+    assert resp.status == 206
+    assert await resp.read() == content[:38]
+
+    resp = await feed_client.get(f'/feeds/{name}', headers={'Accept-Encoding': 'gzip'})
+    assert resp.status == 200
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert await resp.read() == content
+
+async def test_serve_feed_not_found(feed_client, tmp_path):
+    """Тест отказа для несуществующих файлов и путей вне директории фидов"""
+    (tmp_path / 'secret.xml').write_text('<secret />')
+
+    for name in ('missing.xml', '..%2Fsecret.xml', 'ads.sqlite3'):
+        resp = await feed_client.get(f'/feeds/{name}')
+        assert resp.status == 404
+
+async def test_create_ad_unique_files(client):
+    """Тест: объявления, созданные в одну секунду, не перезаписывают друг друга"""
+    ads = [
+        {"title": f"Товар {i}", "description": "Описание", "price": 1000, "category": "Электроника"}
+        for i in range(5)
+    ]
+    responses = await asyncio.gather(*(client.post('/api/v1/create_ad', json=ad) for ad in ads))
+    files = {(await resp.json())['file'] for resp in responses}
+
+    assert len(files) == len(ads)
+
+@pytest.fixture
+async def batch_client(tmp_path):
+    """Клиент сервиса с групповой записью create_ad"""
+    service = AvitoMCPService(
+        store=AdStore(str(tmp_path / 'ads.sqlite3')),
+        feed_dir=str(tmp_path / 'feeds'),
+        ad_batch_window=0.2,
+        ad_batch_size=4
+    )
+    async with TestClient(TestServer(service.app)) as client:
+        yield client
+
+async def test_create_ad_batched(batch_client, tmp_path):
+    """Тест групповой записи одиночных объявлений в общие фиды"""
+    ads = [
+        {"title": f"Товар {i}", "description": "Описание", "price": 1000 + i, "category": "Электроника"}
+        for i in range(6)
+    ]
+    responses = await asyncio.gather(*(batch_client.post('/api/v1/create_ad', json=ad) for ad in ads))
+    results = [await resp.json() for resp in responses]
+
+    assert all(resp.status == 200 for resp in responses)
+    # 6 объявлений при размере пачки 4: полная пачка и остаток по окну
+    feeds = sorted(name for name in os.listdir(tmp_path / 'feeds') if name.endswith('.xml'))
+    assert feeds == sorted({os.path.basename(r['file']) for r in results})
+    assert sorted(r['batch_size'] for r in results) == [2, 2, 4, 4, 4, 4]
+    for ad, result in zip(ads, results):
+        feed_ads = ET.parse(result['file']).getroot().findall('Ad')
+        assert len(feed_ads) == result['batch_size']
+        assert feed_ads[result['position']].find('Title').text == ad['title']
+
+    resp = await batch_client.get('/api/v1/health')
+    assert (await resp.json())['ad_batches']['batches'] == 2
+
+async def test_create_ad_wrong_types(client):
+    """Тест: неверный тип поля или некорректный JSON — ошибка клиента, а не 500"""
+    test_data = {"title": "Товар", "description": "Описание", "price": [1000], "category": "Электроника"}
+    resp = await client.post('/api/v1/create_ad', json=test_data)
+    assert resp.status == 400
+    assert 'price' in (await resp.json())['error']
+
+    resp = await client.post('/api/v1/create_ad', json=dict(test_data, price='²'))
+    assert resp.status == 400
+
+    resp = await client.post('/api/v1/create_ad', data=b'{"title": ')
+    assert resp.status == 400
+    assert 'Invalid JSON' in (await resp.json())['error']
+
+    test_data = {"category": "Электроника", "ads": [{"title": "Товар", "description": "", "price": 1, "images": "a.jpg"}]}
+    resp = await client.post('/api/v1/create_bulk_ads', json=test_data)
+    assert resp.status == 400
+    assert (await resp.json())['error'] == 'Ad 0: Field images must be a list of strings'
+
+async def test_images_processed_in_all_write_paths(tmp_path):
+    """Тест обработки изображений во всех способах записи фида"""
+    from PIL import Image
+    from image_pipeline import ImagePipeline
+
+    source_dir = tmp_path / 'images'
+    source_dir.mkdir()
+    src = str(source_dir / 'photo.png')
+    Image.new('RGB', (40, 20), 'red').save(src)
+    pipeline = ImagePipeline(
+        cache_dir=str(tmp_path / 'cache'), source_dir=str(source_dir),
+        url_prefix='https://cdn.example.com/img', workers=1
+    )
+    service = AvitoMCPService(
+        store=AdStore(str(tmp_path / 'ads.sqlite3')),
+        feed_dir=str(tmp_path / 'feeds'),
+        image_pipeline=pipeline
+    )
+    ad = {"id": "1", "title": "iPhone", "description": "Description", "price": 1000, "images": [src]}
+    bulk = {"category": "Электроника", "ads": [ad]}
+
+    async with TestClient(TestServer(service.app)) as client:
+        files = []
+        for path, body in (('/api/v1/create_bulk_ads', bulk), ('/api/v1/sync_ads', bulk)):
+            resp = await client.post(path, json=body)
+            assert resp.status == 200
+            files.append((await resp.json())['file'])
+
+        resp = await client.post(
+            '/api/v1/create_bulk_ads_ndjson?category=Электроника',
+            data=json.dumps(ad).encode('utf-8'),
+            headers={'Content-Type': 'application/x-ndjson'}
+        )
+        assert resp.status == 200
+        files.append((await resp.json())['file'])
+
+        resp = await client.post('/api/v1/jobs', json=bulk)
+        status_url = (await resp.json())['status_url']
+        for _ in range(200):
+            job = await (await client.get(status_url)).json()
+            if job['status'] in ('done', 'failed'):
+                break
+            await asyncio.sleep(0.01)
+        assert job['status'] == 'done'
+        files.append(job['file'])
+
+    for path in files:
+        image = ET.parse(path).getroot().find('Ad/Images/Image')
+        assert image.attrib['url'].startswith('https://cdn.example.com/img/')
+    assert pipeline.misses == 1
+
+async def test_serve_image(tmp_path):
+    """Тест отдачи обработанных изображений по ссылкам из фида"""
+    from PIL import Image
+    from image_pipeline import ImagePipeline
+
+    source_dir = tmp_path / 'images'
+    source_dir.mkdir()
+    src = str(source_dir / 'photo.png')
+    Image.new('RGB', (40, 20), 'red').save(src)
+    pipeline = ImagePipeline(
+        cache_dir=str(tmp_path / 'cache'), source_dir=str(source_dir),
+        url_prefix='https://feeds.example.com/images', workers=1
+    )
+    service = AvitoMCPService(
+        feed_dir=str(tmp_path / 'feeds'),
+        public_url='https://feeds.example.com',
+        image_pipeline=pipeline
+    )
+    ad = {"title": "iPhone", "description": "Description", "price": 1000, "images": [src]}
+
+    async with TestClient(TestServer(service.app)) as client:
+        resp = await client.post('/api/v1/create_bulk_ads', json={"category": "Электроника", "ads": [ad]})
+        path = (await resp.json())['file']
+        url = ET.parse(path).getroot().find('Ad/Images/Image').attrib['url']
+        assert url.startswith('https://feeds.example.com/images/')
+
+        resp = await client.get(url[len('https://feeds.example.com'):])
+        assert resp.status == 200
+        assert resp.headers['Content-Type'] == 'image/jpeg'
+        with open(os.path.join(pipeline.cache_dir, url.rsplit('/', 1)[1]), 'rb') as f:
+            assert await resp.read() == f.read()
+
+        for name in ('missing.jpg', '0' * 64 + '.png', '..%2Fphoto.png'):
+            resp = await client.get(f'/images/{name}')
+            assert resp.status == 404
+
+async def test_create_bulk_ads_sharded(feed_client, tmp_path):
+    """Тест шардированного фида: манифест, отдача шардов и перезапись одного шарда"""
+    test_data = {
+        "category": "Электроника",
+        "shard_size": 10,
+        "ads": [{"title": f"Товар {i}", "description": "Описание", "price": 1000} for i in range(25)]
+    }
+    resp = await feed_client.post('/api/v1/create_bulk_ads', json=test_data)
+    assert resp.status == 200
+    data = await resp.json()
+    manifest = data['manifest']
+    assert [part['ads'] for part in manifest['shards']] == [10, 10, 5]
+
+    resp = await feed_client.get(f"/feeds/{os.path.basename(data['file'])}")
+    assert resp.status == 200
+    assert resp.headers['Content-Type'] == 'application/json; charset=utf-8'
+    assert (await resp.json())['shards'][0]['sha256'] == manifest['shards'][0]['sha256']
+
+    resp = await feed_client.get(f"/feeds/{manifest['shards'][2]['file']}")
+    assert resp.status == 200
+    etag = resp.headers['ETag']
+
+    resp = await feed_client.post(
+        f"/api/v1/feeds/{manifest['name']}/shards/0",
+        json={"ads": [{"title": "Новый", "description": "Описание", "price": 1}]}
+    )
+    assert resp.status == 200
+    updated = (await resp.json())['manifest']
+    assert updated['ads'] == 16
+    assert updated['shards'][0]['sha256'] != manifest['shards'][0]['sha256']
+    assert updated['shards'][1:] == manifest['shards'][1:]
+
+    # Неизмененный шард клиент не скачивает заново
+    resp = await feed_client.get(
+        f"/feeds/{manifest['shards'][2]['file']}", headers={'If-None-Match': etag}
+    )
+    assert resp.status == 304
+
+async def test_create_bulk_ads_sharded_failure_cleanup(tmp_path, monkeypatch):
+    """Тест удаления записанных шардов, если один из шардов не записался"""
+    import avito_mcp
+
+    write_shard = avito_mcp.write_shard
+
+    def failing_write_shard(ads, base, index, *args):
+        if index == 1:
+            raise OSError('disk full')
+        return write_shard(ads, base, index, *args)
+
+    monkeypatch.setattr(avito_mcp, 'write_shard', failing_write_shard)
+    feed_dir = tmp_path / 'feeds'
+    service = AvitoMCPService(store=AdStore(str(tmp_path / 'ads.sqlite3')), feed_dir=str(feed_dir))
+    test_data = {
+        "category": "Электроника",
+        "shard_size": 10,
+        "ads": [{"title": f"Товар {i}", "description": "Описание", "price": 1000} for i in range(25)]
+    }
+
+    async with TestClient(TestServer(service.app)) as client:
+        resp = await client.post('/api/v1/create_bulk_ads', json=test_data)
+        assert resp.status == 500
+
+    assert not feed_dir.exists() or os.listdir(feed_dir) == []
+
+async def test_regenerate_shard_errors(feed_client):
+    """Тест ошибок перезаписи шарда"""
+    ads = {"ads": [{"title": "Товар", "description": "Описание", "price": 1}]}
+    resp = await feed_client.post('/api/v1/feeds/missing/shards/0', json=ads)
+    assert resp.status == 404
+
+    resp = await feed_client.post(
+        '/api/v1/create_bulk_ads', json={"category": "Электроника", "shard_size": 5, **ads}
+    )
+    name = (await resp.json())['manifest']['name']
+    for index, body in (('5', ads), ('x', ads), ('0', {"ads": [{"title": "Без цены"}]})):
+        resp = await feed_client.post(f'/api/v1/feeds/{name}/shards/{index}', json=body)
+        assert resp.status == 400
+
+    resp = await feed_client.post(
+        '/api/v1/create_bulk_ads', json={"category": "Электроника", "shard_size": -1, **ads}
+    )
+    assert resp.status == 400
+
+async def test_create_bulk_ads_dedup(feed_client, tmp_path):
+    """Тест поиска дублей при массовой загрузке"""
+    ads = [
+        {"title": "Телефон", "description": "Новый телефон в коробке", "price": 1000},
+        {"title": "Ноутбук", "description": "Ноутбук для работы", "price": 50000},
+        {"title": "ТЕЛЕФОН!", "description": "Новый телефон, в коробке", "price": 900},
+    ]
+    resp = await feed_client.post('/api/v1/create_bulk_ads', json={"category": "Электроника", "ads": ads})
+    assert 'duplicates' not in await resp.json()
+
+    resp = await feed_client.post(
+        '/api/v1/create_bulk_ads', json={"category": "Электроника", "ads": ads, "dedup": "drop"}
+    )
+    assert resp.status == 200
+    data = await resp.json()
+    assert [(d['index'], d['duplicate_of'], d['exact']) for d in data['duplicates']] == [(2, 0, True)]
+    titles = [ad.find('Title').text for ad in ET.parse(data['file']).getroot()]
+    assert titles == ['Телефон', 'Ноутбук']
+
+    resp = await feed_client.post(
+        '/api/v1/create_bulk_ads', json={"category": "Электроника", "ads": ads, "dedup": "remove"}
+    )
+    assert resp.status == 400
+
+    body = '\n'.join(json.dumps(ad, ensure_ascii=False) for ad in ads)
+    resp = await feed_client.post(
+        '/api/v1/create_bulk_ads_ndjson?category=Электроника&dedup=flag', data=body.encode('utf-8')
+    )
+    data = await resp.json()
+    assert data['created'] == 3
+    assert [(d['line'], d['duplicate_of']) for d in data['duplicates']] == [(3, 1)]
+
+async def test_dedup_off_event_loop(feed_client, monkeypatch):
+    """Тест поиска дублей вне потока event loop"""
+    import threading
+    import avito_mcp
+
+    threads = []
+    dedup_ads = avito_mcp.dedup_ads
+
+    def wrapper(*args):
+        threads.append(threading.current_thread())
+        return dedup_ads(*args)
+
+    monkeypatch.setattr(avito_mcp, 'dedup_ads', wrapper)
+    ad = {"title": "Телефон", "description": "Новый телефон в коробке", "price": 1000}
+    resp = await feed_client.post(
+        '/api/v1/create_bulk_ads', json={"category": "Электроника", "ads": [ad, ad], "dedup": "drop"}
+    )
+    assert resp.status == 200
+    body = json.dumps(ad, ensure_ascii=False).encode('utf-8')
+    resp = await feed_client.post(
+        '/api/v1/create_bulk_ads_ndjson?category=Электроника&dedup=drop', data=body + b'\n' + body
+    )
+    assert resp.status == 200
+
+    assert len(threads) == 2
+    assert threading.main_thread() not in threads
@@ -0,0 +1,34 @@
+from metrics import Counter, Gauge, Histogram, Registry
+
+def test_histogram_render():
+    """Тест накопленных корзин гистограммы"""
+    histogram = Histogram('latency_seconds', 'Latency', ('route',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 5.0):
+        histogram.observe(value, ('/a',))
+
+    lines = histogram.render().splitlines()
+
+    assert lines[:2] == ['# HELP latency_seconds Latency', '# TYPE latency_seconds histogram']
+    assert lines[2:] == [
+        'latency_seconds_bucket{route="/a",le="0.1"} 2',
+        'latency_seconds_bucket{route="/a",le="1.0"} 3',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 4',
+        'latency_seconds_sum{route="/a"} 5.65',
+        'latency_seconds_count{route="/a"} 4',
+    ]
+
+def test_registry_render():
+    """Тест счетчиков, шкал и экранирования меток"""
+    registry = Registry()
+    counter = registry.register(Counter('requests_total', 'Requests', ('path',)))
+    gauge = registry.register(Gauge('in_flight', 'In flight'))
+    counter.inc(labels=('/a"b',))
+    counter.inc(2, ('/a"b',))
+    gauge.inc()
+    gauge.dec()
+
+    text = registry.render()
+
+    assert 'requests_total{path="/a\\"b"} 3' in text
+    assert 'in_flight 0' in text
+    assert text.endswith('\n')
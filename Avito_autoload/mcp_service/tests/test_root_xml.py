@@ -0,0 +1,129 @@
+import os
+import pytest
+import root_xml
+from root_xml import create_root_xml, add_ad_element, save_xml, FeedWriter, serialize_ad_direct, serialize_ad_etree
+from ad_model import AdValidationError
+
+ADS = [
+    {
+        "title": "iPhone 1",
+        "description": "Описание <1> & \"кавычки\"",
+        "price": 100000,
+        "images": ["https://example.com/1.jpg?a=1&b=2"],
+        "params": {"Condition": "Новое", "Brand": "Apple"}
+    },
+    {
+        "title": "iPhone 2",
+        "description": "",
+        "price": 120000,
+        "images": [],
+        "params": {}
+    }
+]
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Фикстура для запуска в отдельной директории"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+def _save_with_tree(ads, filename):
+    root = create_root_xml('Электроника')
+    for ad in ads:
+        add_ad_element(root=root, **ad)
+    return save_xml(root, filename)
+
+@pytest.mark.parametrize('serializer', ['direct', 'etree'])
+@pytest.mark.parametrize('ads', [ADS, ADS[:1], []])
+def test_feed_writer_matches_save_xml(workdir, ads, serializer):
+    """Тест побайтового совпадения потоковой записи с save_xml"""
+    expected_path = _save_with_tree(ads, 'tree.xml')
+
+    with FeedWriter('stream.xml', category='Электроника', serializer=serializer) as feed:
+        for ad in ads:
+            feed.add_ad(**ad)
+
+    with open(expected_path, 'rb') as f:
+        expected = f.read()
+    with open(feed.filepath, 'rb') as f:
+        assert f.read() == expected
+    assert feed.count == len(ads)
+
+def test_feed_writer_add_ads_from_iterator(workdir):
+    """Тест записи объявлений из итератора"""
+    with FeedWriter('stream.xml') as feed:
+        written = feed.add_ads(iter(ADS))
+
+    assert written == 2
+    assert os.path.exists(feed.filepath)
+    assert not os.path.exists(feed._tmp_path)
+
+def test_feed_writer_abort_on_error(workdir):
+    """Тест удаления недописанного файла при ошибке"""
+    with pytest.raises(AdValidationError):
+        with FeedWriter('broken.xml') as feed:
+            feed.add_ads([ADS[0], {"title": "Без описания"}])
+
+    assert not os.path.exists(feed.filepath)
+    assert not os.path.exists(feed._tmp_path)
+
+def test_feed_writer_gzip_copy(workdir):
+    """Тест сжатой копии, записанной в том же проходе"""
+    import gzip
+
+    with FeedWriter('stream.xml', compress=True) as feed:
+        feed.add_ads(ADS)
+
+    with open(feed.filepath, 'rb') as f, gzip.open(feed.gzip_path) as gz:
+        assert gz.read() == f.read()
+    assert not os.path.exists(feed._gzip_tmp_path)
+
+    # Перезапись без сжатия удаляет устаревшую копию
+    with FeedWriter('stream.xml') as feed:
+        feed.add_ads(ADS[:1])
+    assert not os.path.exists(feed.gzip_path)
+
+def test_feed_writer_gzip_abort(workdir):
+    """Тест удаления недописанной сжатой копии при ошибке"""
+    with pytest.raises(AdValidationError):
+        with FeedWriter('broken.xml', compress=True) as feed:
+            feed.add_ads([{"title": "Без описания"}])
+
+    assert not os.path.exists(feed.gzip_path)
+    assert not os.path.exists(feed._gzip_tmp_path)
+
+@pytest.mark.parametrize('ad', [
+    dict(title='', description='', price='', images=[], params={}),
+    dict(title='a&b<c>d', description='"кавычки" \'апостроф\'\r\n\tтаб', price=0, images=[], params=None),
+    dict(title='t', description='d', price=1.5, images=['a&b', 'q"x<y>', 'r\rn\nt\t', ''], params={}),
+    dict(title='t', description='d', price=True, images=['https://example.com/1.jpg', 'https://example.com/2.jpg'], params={
+        'Empty': '', 'Bool': False, 'Int': 0, 'Float': 2.0, 'Escaped': '<a & b>', 'Long': 'x&' * 100
+    }),
+    dict(title='t', description='d', price=1, images=[], params={'{urn:avito}Tag': 'namespace'}),
+])
+def test_serialize_ad_direct_matches_etree(ad):
+    """Тест побайтового совпадения прямой сериализации с ElementTree"""
+    assert serialize_ad_direct(**ad) == serialize_ad_etree(**ad)
+
+def test_serializer_selection(monkeypatch):
+    """Тест выбора сериализатора во время работы"""
+    monkeypatch.setattr(root_xml, '_serializer', root_xml._serializer)
+
+    root_xml.set_serializer('etree')
+    assert root_xml.get_serializer() is serialize_ad_etree
+    assert FeedWriter('stream.xml')._serialize is serialize_ad_etree
+    assert FeedWriter('stream.xml', serializer='direct')._serialize is serialize_ad_direct
+    with pytest.raises(ValueError, match='Unknown XML serializer'):
+        root_xml.set_serializer('lxml')
+
+def test_add_ad_element_validates():
+    """Тест проверки полей объявления моделью при добавлении в дерево"""
+    root = create_root_xml('Электроника')
+    ad = add_ad_element(root, 'Товар', 'Описание', '1500', ['1.jpg'])
+    assert ad.find('Price').text == '1500'
+
+    with pytest.raises(AdValidationError, match='price'):
+        add_ad_element(root, 'Товар', 'Описание', [1500], [])
+    with pytest.raises(AdValidationError, match='images'):
+        add_ad_element(root, 'Товар', 'Описание', 1500, 'a.jpg')
+    assert len(root) == 1
@@ -0,0 +1,147 @@
+import pytest
+import xml.etree.ElementTree as ET
+from utils import create_directory, validate_xml_file, validate_ad
+from category_rules import CategoryRules
+
+FEED = """<?xml version='1.0' encoding='utf-8'?>
+<Ads formatVersion="3" target="Avito.ru">
+<Ad><Id>1</Id><Title>Ok</Title><Description>Ok</Description><Price>100</Price></Ad>
+<Ad><Id>2</Id><Title></Title><Price>100</Price></Ad>
+<Ad><Id>3</Id><Title>Phone</Title><Description>Ok</Description><Price>100</Price><Category>Телефоны</Category></Ad>
+<Ad><Title>Ok</Title><Description>Ok</Description></Ad>
+</Ads>"""
+
+@pytest.fixture
+def feed_path(tmp_path):
+    """Фикстура файла фида с ошибками"""
+    path = tmp_path / 'feed.xml'
+    path.write_text(FEED, encoding='utf-8')
+    return str(path)
+
+def test_validate_xml_file_collects_all_errors(feed_path):
+    """Тест сбора всех ошибок фида за один проход"""
+    report = validate_xml_file(feed_path)
+
+    assert report['valid'] is False
+    assert report['ads'] == 4
+    assert report['invalid_ads'] == 3
+    assert [(e['index'], e['id'], e['field']) for e in report['errors']] == [
+        (1, '2', 'Title'),
+        (1, '2', 'Description'),
+        (2, '3', 'Brand'),
+        (2, '3', 'Condition'),
+        (3, None, 'Price'),
+    ]
+
+def test_validate_xml_file_max_errors(feed_path):
+    """Тест остановки проверки после лимита ошибок"""
+    report = validate_xml_file(feed_path, max_errors=1)
+
+    assert len(report['errors']) == 1
+    assert report['ads'] == 2
+
+def test_validate_xml_file_root_and_parse_errors(tmp_path):
+    """Тест ошибок корневого элемента и синтаксиса"""
+    path = tmp_path / 'broken.xml'
+    path.write_text('<Feed target="Avito.ru"><Ad>', encoding='utf-8')
+
+    report = validate_xml_file(str(path))
+
+    messages = [e['message'] for e in report['errors']]
+    assert messages[0] == "Root element must be 'Ads'"
+    assert messages[1] == "Missing 'formatVersion' attribute"
+    assert messages[2].startswith('XML parse error')
+
+RULES = CategoryRules({
+    "*": {
+        "required": ["Title", "Price"],
+        "fields": {"Price": {"type": "int", "min": 0}}
+    },
+    "Телефоны": {
+        "required": ["Condition"],
+        "fields": {
+            "Price": {"type": "int", "min": 100, "max": 1000},
+            "Condition": {"enum": ["Новое", "Б/у"]}
+        }
+    }
+})
+
+def _ad(**fields):
+    ad = ET.Element('Ad')
+    for tag, text in fields.items():
+        ET.SubElement(ad, tag).text = text
+    return ad
+
+@pytest.mark.parametrize('fields, category, expected', [
+    ({'Title': 'Ok', 'Price': '10'}, None, []),
+    ({'Title': 'Ok', 'Price': 'десять'}, None, [('Price', "Field Price must be int, got 'десять'")]),
+    ({'Title': 'Ok', 'Price': '-1'}, None, [('Price', 'Field Price must be >= 0')]),
+    # int() разобрал бы арабско-индийские цифры и подчеркивания
+    ({'Title': 'Ok', 'Price': '١٢'}, None, [('Price', "Field Price must be int, got '١٢'")]),
+    ({'Title': 'Ok', 'Price': '1_000'}, None, [('Price', "Field Price must be int, got '1_000'")]),
+    ({'Title': 'Ok', 'Price': '10'}, 'Телефоны', [
+        ('Price', 'Field Price must be >= 100'),
+        ('Condition', 'Missing required field: Condition'),
+    ]),
+    ({'Title': 'Ok', 'Price': '500', 'Condition': 'Битый'}, 'Телефоны', [
+        ('Condition', 'Field Condition must be one of: Новое, Б/у'),
+    ]),
+    ({'Title': 'Ok', 'Price': '5000', 'Condition': 'Новое', 'Category': 'Телефоны'}, None, [
+        ('Price', 'Field Price must be <= 1000'),
+    ]),
+])
+def test_category_rules(fields, category, expected):
+    """Тест скомпилированных правил категорий"""
+    assert RULES.check_ad(_ad(**fields), category) == expected
+
+def test_invalid_ads_matches_check_ad():
+    """Тест: проверка фида находит те же ошибки, что и check_ad"""
+    ads = [
+        _ad(Title='Ok', Price='10'),
+        _ad(Title='Ok', Price='1_000'),
+        _ad(Title='Ok', Price=' 500 ', Condition='Новое', Category='Телефоны'),
+        _ad(Title='Ok', Price='10', Condition='Битый', Category='Телефоны'),
+        _ad(Price='10'),
+    ]
+
+    invalid = list(RULES.invalid_ads(ads))
+
+    assert [(ads.index(ad), errors) for ad, errors in invalid] == [
+        (index, RULES.check_ad(ad)) for index, ad in enumerate(ads) if RULES.check_ad(ad)
+    ]
+    assert [ads.index(ad) for ad, _ in invalid] == [1, 3, 4]
+
+def test_check_reads_first_child_once():
+    """Тест проверки по первому вхождению тега, как у findtext"""
+    ad = _ad(Title='Ok', Price='10')
+    ET.SubElement(ad, 'Price').text = 'десять'
+    ET.SubElement(ad, 'Title')
+
+    assert RULES.check_ad(ad) == []
+    assert RULES.check_ad(_ad(Title='', Price='10')) == [('Title', 'Missing required field: Title')]
+
+def test_validate_ad_uses_category_rules():
+    """Тест проверки объявления по правилам из category_rules.json"""
+    ad = _ad(Title='iPhone', Description='Ok', Price='50000')
+
+    assert validate_ad(ad)
+    assert not validate_ad(ad, 'Телефоны')
+
+def test_default_rules_match_previous_checks():
+    """Тест: без категории проверяются только прежние обязательные поля"""
+    ad = _ad(Title='x' * 100, Description='Ok', Price='договорная')
+
+    assert validate_ad(ad)
+    assert not validate_ad(_ad(Title='iPhone', Price='100'))
+
+def test_create_directory_created_concurrently(tmp_path, monkeypatch):
+    """Тест директории, созданной другим потоком между проверкой и созданием"""
+    path = tmp_path / 'feeds'
+    path.mkdir()
+    monkeypatch.setattr('utils.os.path.exists', lambda _: False)
+
+    create_directory(str(path))
+
+    (tmp_path / 'file').write_text('')
+    with pytest.raises(FileExistsError):
+        create_directory(str(tmp_path / 'file'))
@@ -3,10 +3,38 @@
 
 import os
 import sys
+import gzip
+import hashlib
+import time
+import uuid
 import xml.etree.ElementTree as ET
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Any, Callable, List, Dict, Optional, Iterable, Union
 from utils import create_directory, validate_xml
+from ad_model import Ad, ad_fields
+
+# Заголовок и корневой тег фида в том виде, в каком их пишет ElementTree
+XML_DECLARATION = b"<?xml version='1.0' encoding='utf-8'?>\n"
+ROOT_ATTRIBUTES = {'formatVersion': '3', 'target': 'Avito.ru'}
+_ROOT_ATTRS = ''.join(f' {k}="{v}"' for k, v in ROOT_ATTRIBUTES.items())
+ROOT_OPEN_TAG = f'<Ads{_ROOT_ATTRS}>'.encode('utf-8')
+ROOT_EMPTY_TAG = f'<Ads{_ROOT_ATTRS} />'.encode('utf-8')
+ROOT_CLOSE_TAG = b'</Ads>'
+
+def feed_filename(prefix: str) -> str:
+    """
+    Уникальное имя файла фида
+    
+    К времени с точностью до секунды добавляется случайный суффикс, чтобы
+    запросы, пришедшие в одну секунду, не перезаписывали файлы друг друга.
+    
+    Args:
+        prefix (str): Начало имени, например avito_bulk
+    
+    Returns:
+        str: Имя вида <prefix>_<ГГГГММДД_ЧЧММСС>_<8 hex>.xml
+    """
+    return f'{prefix}_{datetime.now().strftime("%Y%m%d_%H%M%S")}_{uuid.uuid4().hex[:8]}.xml'
 
 def create_root_xml(category: str, params: Optional[Dict] = None) -> ET.Element:
     """
@@ -19,11 +47,10 @@ def create_root_xml(category: str, params: Optional[Dict] = None) -> ET.Element:
     Returns:
         ET.Element: Корневой элемент XML
     """
-    root = ET.Element('Ads', formatVersion="3", target="Avito.ru")
+    root = ET.Element('Ads', **ROOT_ATTRIBUTES)
     return root
 
-def add_ad_element(
-    root: ET.Element,
+def build_ad_element(
     title: str,
     description: str,
     price: int,
@@ -31,10 +58,9 @@ def add_ad_element(
     params: Optional[Dict] = None
 ) -> ET.Element:
     """
-    Добавляет элемент объявления в XML
+    Создает отдельный элемент объявления, не привязанный к корню
     
     Args:
-        root (ET.Element): Корневой элемент XML
         title (str): Заголовок объявления
         description (str): Описание объявления
         price (int): Цена
@@ -44,7 +70,7 @@ def add_ad_element(
     Returns:
         ET.Element: Элемент объявления
     """
-    ad = ET.SubElement(root, 'Ad')
+    ad = ET.Element('Ad')
     
     # Основные параметры
     ET.SubElement(ad, 'Title').text = title
@@ -63,6 +89,42 @@ def add_ad_element(
     
     return ad
 
+def add_ad_element(
+    root: ET.Element,
+    title: str,
+    description: str,
+    price: int,
+    images: List[str],
+    params: Optional[Dict] = None
+) -> ET.Element:
+    """
+    Добавляет элемент объявления в XML
+    
+    Поля проверяются моделью Ad (см. Ad.from_dict); цена, переданная
+    строкой из цифр, приводится к int.
+    
+    Args:
+        root (ET.Element): Корневой элемент XML
+        title (str): Заголовок объявления
+        description (str): Описание объявления
+        price (int): Цена
+        images (List[str]): Список путей к изображениям
+        params (Dict): Дополнительные параметры
+    
+    Returns:
+        ET.Element: Элемент объявления
+    
+    Raises:
+        AdValidationError: Поле имеет неверный тип
+    """
+    ad = Ad.from_dict({
+        'title': title, 'description': description, 'price': price,
+        'images': images, 'params': params
+    })
+    element = build_ad_element(ad.title, ad.description, ad.price, ad.images, ad.params)
+    root.append(element)
+    return element
+
 def save_xml(root: ET.Element, filename: str) -> str:
     """
     Сохраняет XML в файл
@@ -80,6 +142,453 @@ def save_xml(root: ET.Element, filename: str) -> str:
     tree.write(filepath, encoding='utf-8', xml_declaration=True)
     return filepath
 
+def serialize_ad_etree(
+    title: str,
+    description: str,
+    price: int,
+    images: List[str],
+    params: Optional[Dict] = None
+) -> bytes:
+    """
+    Сериализует объявление через дерево ElementTree
+    
+    Returns:
+        bytes: XML-фрагмент объявления в кодировке UTF-8
+    """
+    ad = build_ad_element(title, description, price, images, params)
+    return ET.tostring(ad, encoding='unicode').encode('utf-8')
+
+def _escape_text(text: str) -> str:
+    # Те же замены и в том же порядке, что и в ElementTree
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    return text
+
+def _escape_attribute(text: str) -> str:
+    text = _escape_text(text)
+    if '"' in text:
+        text = text.replace('"', '&quot;')
+    if '\r' in text:
+        text = text.replace('\r', '&#13;')
+    if '\n' in text:
+        text = text.replace('\n', '&#10;')
+    if '\t' in text:
+        text = text.replace('\t', '&#09;')
+    return text
+
+# Имя тега -> (открывающий, закрывающий, пустой тег). Имена params задает
+# клиент, поэтому кеш ограничен: сверх лимита строки тега собираются заново
+_TAGS_LIMIT = 4096
+_TAGS: Dict[str, tuple] = {
+    tag: (f'<{tag}>', f'</{tag}>', f'<{tag} />') for tag in ('Title', 'Description', 'Price')
+}
+
+def _tags(tag: Any) -> Optional[tuple]:
+    """Строки тега или None, если тег нужно отдать ElementTree (не строка, пространство имен)"""
+    tags = _TAGS.get(tag)
+    if tags is None and type(tag) is str and tag and tag[0] != '{':
+        tags = (f'<{tag}>', f'</{tag}>', f'<{tag} />')
+        if len(_TAGS) < _TAGS_LIMIT:
+            _TAGS[tag] = tags
+    return tags
+
+def serialize_ad_direct(
+    title: str,
+    description: str,
+    price: int,
+    images: List[str],
+    params: Optional[Dict] = None
+) -> bytes:
+    """
+    Сериализует объявление напрямую в строку, без дерева элементов
+    
+    Результат побайтово совпадает с serialize_ad_etree: то же экранирование,
+    пустой текст пишется самозакрывающимся тегом. Строки тегов берутся из
+    кеша, текст проверяется на спецсимволы без вызова функций, а в UTF-8
+    кодируется один раз все объявление. Данные, которые ElementTree
+    обрабатывает особо (нестроковый текст, теги с пространством имен),
+    сериализуются через serialize_ad_etree.
+    
+    Returns:
+        bytes: XML-фрагмент объявления в кодировке UTF-8
+    """
+    if type(title) is not str or type(description) is not str:
+        return serialize_ad_etree(title, description, price, images, params)
+    price = str(price)
+    parts = [
+        '<Ad>',
+        f'<Title>{_escape_text(title)}</Title>' if title else '<Title />',
+        f'<Description>{_escape_text(description)}</Description>' if description else '<Description />',
+        f'<Price>{_escape_text(price)}</Price>' if price else '<Price />'
+    ]
+    if images:
+        try:
+            urls = ''.join(images)
+        except TypeError:
+            return serialize_ad_etree(title, description, price, images, params)
+        # Обычно ни одна ссылка не требует экранирования: проверяем все разом
+        if '&' in urls or '<' in urls or '>' in urls or '"' in urls or '\r' in urls or '\n' in urls or '\t' in urls:
+            urls = map(_escape_attribute, images)
+        else:
+            urls = images
+        parts.append('<Images><Image url="' + '" /><Image url="'.join(urls) + '" /></Images>')
+    else:
+        parts.append('<Images />')
+    if params:
+        append = parts.append
+        for key, value in params.items():
+            tags = _TAGS.get(key) or _tags(key)
+            if tags is None:
+                return serialize_ad_etree(title, description, price, images, params)
+            if type(value) is not str:
+                value = str(value)
+            if not value:
+                append(tags[2])
+                continue
+            if '&' in value or '<' in value or '>' in value:
+                value = _escape_text(value)
+            append(tags[0])
+            append(value)
+            append(tags[1])
+    parts.append('</Ad>')
+    return ''.join(parts).encode('utf-8')
+
+SERIALIZERS: Dict[str, Callable[..., bytes]] = {
+    'etree': serialize_ad_etree,
+    'direct': serialize_ad_direct
+}
+
+def get_serializer(name: Optional[str] = None) -> Callable[..., bytes]:
+    """
+    Функция сериализации объявления по имени
+    
+    Args:
+        name (str): etree или direct; по умолчанию — выбранная set_serializer()
+            или переменной окружения AVITO_XML_SERIALIZER (direct, если не задана)
+    
+    Raises:
+        ValueError: Неизвестное имя
+    """
+    if name is None:
+        return _serializer
+    try:
+        return SERIALIZERS[name]
+    except KeyError:
+        raise ValueError(f'Unknown XML serializer: {name} (expected one of {", ".join(SERIALIZERS)})')
+
+def set_serializer(name: str) -> None:
+    """
+    Выбирает сериализатор для serialize_ad, serialize_ads и FeedWriter
+    
+    Действует на текущий процесс; процессы пула, запущенные раньше, и
+    процессы, запущенные не через fork, берут значение из AVITO_XML_SERIALIZER.
+    """
+    global _serializer
+    _serializer = get_serializer(name)
+
+_serializer = get_serializer(os.getenv('AVITO_XML_SERIALIZER', 'direct'))
+
+def serialize_ad(
+    title: str,
+    description: str,
+    price: int,
+    images: List[str],
+    params: Optional[Dict] = None
+) -> bytes:
+    """
+    Сериализует одно объявление в байты <Ad>...</Ad>
+    
+    Результат совпадает с тем, как объявление выглядит внутри файла,
+    записанного через save_xml, при любом выбранном сериализаторе.
+    
+    Returns:
+        bytes: XML-фрагмент объявления в кодировке UTF-8
+    """
+    return _serializer(title, description, price, images, params)
+
+def serialize_ads(ads: Iterable[Union[Ad, Dict]], serializer: Optional[str] = None) -> bytes:
+    """
+    Сериализует пачку объявлений формата MCP API в один XML-фрагмент
+    
+    Функция уровня модуля, чтобы ее можно было отправить в пул процессов.
+    
+    Args:
+        ads (Iterable[Union[Ad, Dict]]): Объявления (Ad или словари с ключами
+            title, description, price, images, params)
+        serializer (str): etree или direct, по умолчанию выбранный в процессе
+    
+    Returns:
+        bytes: Последовательность элементов <Ad> в кодировке UTF-8
+    
+    Raises:
+        AdValidationError: Объявление-словарь не прошло проверку типов
+    """
+    serialize = get_serializer(serializer)
+    return b''.join(serialize(*fields) for fields in map(ad_fields, ads))
+
+class FeedWriter:
+    """
+    Потоковая запись фида: каждое <Ad> пишется на диск сразу после добавления
+    
+    Потребление памяти не зависит от количества объявлений, а итоговый файл
+    побайтово совпадает с результатом save_xml для того же набора объявлений.
+    Файл пишется во временный и переименовывается при успешном закрытии,
+    поэтому читатели никогда не видят недописанный фид. С compress=True
+    рядом в том же проходе пишется сжатая копия <файл>.gz, которую
+    HTTP-сервер отдает клиентам с Accept-Encoding: gzip без сжатия на лету.
+    
+    Пример:
+        with FeedWriter('avito_export.xml') as feed:
+            feed.add_ad(title='...', description='...', price=1000, images=[])
+            feed.add_ads(iter_ads())
+    """
+    
+    def __init__(
+        self,
+        filename: str,
+        category: Optional[str] = None,
+        directory: str = 'out_xml',
+        buffer_size: int = 1024 * 1024,
+        compress: bool = False,
+        compress_level: int = 6,
+        serializer: Optional[str] = None,
+        checksum: bool = False
+    ):
+        """
+        Args:
+            filename (str): Имя файла
+            category (str): Категория товара
+            directory (str): Директория для сохранения
+            buffer_size (int): Размер буфера записи в байтах
+            compress (bool): Писать рядом сжатую копию <файл>.gz
+            compress_level (int): Уровень сжатия gzip (1-9)
+            serializer (str): etree или direct, по умолчанию выбранный в процессе
+                (см. set_serializer)
+            checksum (bool): Считать SHA-256 файла при записи (stats['sha256'])
+        """
+        self.category = category
+        self.directory = directory
+        self.filepath = os.path.join(directory, filename)
+        self.buffer_size = buffer_size
+        self.count = 0
+        self.bytes_written = 0
+        # Время этапов: построение элементов, сериализация, запись на диск
+        self.build_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.write_seconds = 0.0
+        self.compress = compress
+        self.compress_level = compress_level
+        self._serialize = get_serializer(serializer)
+        self._sha256 = hashlib.sha256() if checksum else None
+        self.gzip_path = self.filepath + '.gz'
+        # Временные файлы уникальны: несколько писателей одного фида не портят друг друга
+        suffix = uuid.uuid4().hex[:8]
+        self._tmp_path = f'{self.filepath}.{suffix}.tmp'
+        self._gzip_tmp_path = f'{self.gzip_path}.{suffix}.tmp'
+        self._file = None
+        self._gzip_raw = None
+        self._gzip = None
+        self._root_opened = False
+    
+    def open(self) -> 'FeedWriter':
+        """Открывает файл и пишет XML-заголовок"""
+        create_directory(self.directory)
+        self._file = open(self._tmp_path, 'wb', buffering=self.buffer_size)
+        if self.compress:
+            self._gzip_raw = open(self._gzip_tmp_path, 'wb', buffering=self.buffer_size)
+            # mtime=0: одинаковое содержимое дает одинаковый архив
+            self._gzip = gzip.GzipFile(
+                filename='', mode='wb', fileobj=self._gzip_raw,
+                compresslevel=self.compress_level, mtime=0
+            )
+        self._write(XML_DECLARATION)
+        return self
+    
+    def _write(self, data: bytes) -> None:
+        self._file.write(data)
+        if self._gzip is not None:
+            self._gzip.write(data)
+        if self._sha256 is not None:
+            self._sha256.update(data)
+        self.bytes_written += len(data)
+    
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Статистика записи: количество объявлений, байты и время этапов"""
+        stats = {
+            'file': self.filepath,
+            'ads': self.count,
+            'bytes': self.bytes_written,
+            'build_seconds': self.build_seconds,
+            'serialize_seconds': self.serialize_seconds,
+            'write_seconds': self.write_seconds
+        }
+        if self._sha256 is not None:
+            stats['sha256'] = self._sha256.hexdigest()
+        return stats
+    
+    def write_fragment(self, data: bytes, count: int = 1) -> None:
+        """
+        Дописывает готовый XML-фрагмент из одного или нескольких <Ad>
+        
+        Args:
+            data (bytes): Сериализованные объявления
+            count (int): Количество объявлений во фрагменте
+        """
+        if self._file is None:
+            raise RuntimeError('FeedWriter is not open')
+        start = time.perf_counter()
+        if not self._root_opened:
+            self._write(ROOT_OPEN_TAG)
+            self._root_opened = True
+        self._write(data)
+        self.write_seconds += time.perf_counter() - start
+        self.count += count
+    
+    def add_ad(
+        self,
+        title: str,
+        description: str,
+        price: int,
+        images: List[str],
+        params: Optional[Dict] = None
+    ) -> int:
+        """
+        Сериализует объявление и сразу пишет его в файл
+        
+        Returns:
+            int: Порядковый номер объявления в фиде (с нуля)
+        """
+        start = time.perf_counter()
+        if self._serialize is serialize_ad_etree:
+            ad = build_ad_element(title, description, price, images, params)
+            built = time.perf_counter()
+            data = ET.tostring(ad, encoding='unicode').encode('utf-8')
+        else:
+            # Прямой сериализатор не строит дерево: все его время — сериализация
+            built = time.perf_counter()
+            data = self._serialize(title, description, price, images, params)
+        self.build_seconds += built - start
+        self.serialize_seconds += time.perf_counter() - built
+        self.write_fragment(data)
+        return self.count - 1
+    
+    def add_ads(self, ads: Iterable[Union[Ad, Dict]]) -> int:
+        """
+        Записывает объявления из итератора объявлений формата MCP API
+        
+        Args:
+            ads (Iterable[Union[Ad, Dict]]): Объявления (Ad или словари с ключами
+                title, description, price, images, params)
+        
+        Returns:
+            int: Количество записанных объявлений
+        
+        Raises:
+            AdValidationError: Объявление-словарь не прошло проверку типов
+        """
+        written = 0
+        for fields in map(ad_fields, ads):
+            self.add_ad(*fields)
+            written += 1
+        return written
+    
+    def close(self) -> str:
+        """
+        Закрывает корневой элемент и публикует файл
+        
+        Returns:
+            str: Путь к сохраненному файлу
+        """
+        if self._file is None:
+            return self.filepath
+        start = time.perf_counter()
+        # Пустой фид ElementTree записывает самозакрывающимся тегом
+        tail = ROOT_CLOSE_TAG if self._root_opened else ROOT_EMPTY_TAG
+        self._write(tail)
+        self._file.close()
+        self._file = None
+        if self._gzip is not None:
+            self._close_gzip()
+            os.replace(self._gzip_tmp_path, self.gzip_path)
+        elif os.path.exists(self.gzip_path):
+            # Сжатая копия прошлой версии фида больше не соответствует файлу
+            os.remove(self.gzip_path)
+        os.replace(self._tmp_path, self.filepath)
+        self.write_seconds += time.perf_counter() - start
+        return self.filepath
+    
+    def _close_gzip(self) -> None:
+        if self._gzip is not None:
+            self._gzip.close()
+            self._gzip_raw.close()
+            self._gzip = None
+            self._gzip_raw = None
+    
+    def abort(self) -> None:
+        """Прерывает запись и удаляет недописанный файл"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._close_gzip()
+        for path in (self._tmp_path, self._gzip_tmp_path):
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def __enter__(self) -> 'FeedWriter':
+        return self.open()
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def build_feed(
+    ads: Iterable[Dict],
+    filename: str,
+    category: Optional[str] = None,
+    directory: str = 'out_xml',
+    compress: bool = False
+) -> Dict[str, Any]:
+    """
+    Записывает объявления в файл фида потоково
+    
+    Функция не зависит от состояния модуля, поэтому ее можно выполнять
+    как в пуле потоков, так и в пуле процессов.
+    
+    Args:
+        ads (Iterable[Dict]): Объявления в формате MCP API
+        filename (str): Имя файла
+        category (str): Категория товара
+        directory (str): Директория для сохранения
+        compress (bool): Писать рядом сжатую копию <файл>.gz
+    
+    Returns:
+        Dict[str, Any]: Статистика записи (FeedWriter.stats) с путем в ключе file
+    """
+    with FeedWriter(filename, category=category, directory=directory, compress=compress) as feed:
+        feed.add_ads(ads)
+    return feed.stats
+
+def write_feed(
+    ads: Iterable[Dict],
+    filename: str,
+    category: Optional[str] = None,
+    directory: str = 'out_xml'
+) -> str:
+    """
+    Записывает объявления в файл фида потоково (см. build_feed)
+    
+    Returns:
+        str: Путь к сохраненному файлу
+    """
+    return build_feed(ads, filename, category, directory)['file']
+
 if __name__ == '__main__':
     # Пример использования
     root = create_root_xml('Электроника')
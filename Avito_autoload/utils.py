@@ -4,8 +4,9 @@
 import os
 import sys
 import xml.etree.ElementTree as ET
-from typing import Optional
+from typing import Any, Dict, Optional
 from loguru import logger
+from category_rules import CategoryRules, load_rules
 
 def create_directory(path: str) -> None:
     """
@@ -18,16 +19,21 @@ def create_directory(path: str) -> None:
         if not os.path.exists(path):
             os.makedirs(path)
             logger.info(f"Created directory: {path}")
+    except FileExistsError:
+        # Директорию успел создать параллельный поток (шарды пишутся одновременно)
+        if not os.path.isdir(path):
+            raise
     except Exception as e:
         logger.error(f"Error creating directory {path}: {str(e)}")
         raise
 
-def validate_xml(root: ET.Element) -> bool:
+def validate_xml(root: ET.Element, category: Optional[str] = None) -> bool:
     """
     Проверяет корректность XML
     
     Args:
         root (ET.Element): Корневой элемент XML
+        category (str): Категория для объявлений без <Category>
     
     Returns:
         bool: True если XML корректен, False в противном случае
@@ -47,9 +53,9 @@ def validate_xml(root: ET.Element) -> bool:
             return False
             
         # Проверка объявлений
-        for ad in root.findall('Ad'):
-            if not validate_ad(ad):
-                return False
+        for _, errors in load_rules().invalid_ads(root.iterfind('Ad'), category):
+            logger.error(errors[0][1])
+            return False
                 
         return True
         
@@ -57,22 +63,106 @@ def validate_xml(root: ET.Element) -> bool:
         logger.error(f"Error validating XML: {str(e)}")
         return False
 
-def validate_ad(ad: ET.Element) -> bool:
+def validate_ad(
+    ad: ET.Element,
+    category: Optional[str] = None,
+    rules: Optional[CategoryRules] = None
+) -> bool:
     """
-    Проверяет корректность элемента объявления
+    Проверяет корректность элемента объявления по правилам его категории
     
     Args:
         ad (ET.Element): Элемент объявления
+        category (str): Категория для объявлений без <Category>
+        rules (CategoryRules): Правила проверки, по умолчанию category_rules.json
     
     Returns:
         bool: True если объявление корректно, False в противном случае
     """
-    required_fields = ['Title', 'Description', 'Price']
+    errors = (rules or load_rules()).check_ad(ad, category)
+    if errors:
+        logger.error(errors[0][1])
+        return False
+            
+    return True
+
+def validate_xml_file(
+    path: str,
+    rules: Optional[CategoryRules] = None,
+    default_category: Optional[str] = None,
+    max_errors: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Потоково проверяет файл фида и собирает все ошибки за один проход
     
-    for field in required_fields:
-        element = ad.find(field)
-        if element is None or not element.text:
-            logger.error(f"Missing required field: {field}")
-            return False
+    Файл читается через iterparse, каждое объявление удаляется из дерева
+    сразу после проверки, поэтому память не зависит от размера фида.
+    
+    Args:
+        path (str): Путь к файлу фида
+        rules (CategoryRules): Правила проверки, по умолчанию category_rules.json;
+            категория берется из <Category> объявления
+        default_category (str): Категория для объявлений без <Category>
+        max_errors (int): Остановить проверку после стольких ошибок
+    
+    Returns:
+        Dict[str, Any]: Отчет с ключами file, valid, ads, invalid_ads, errors;
+            каждая ошибка содержит index и id объявления, field и message
+    """
+    rules = rules or load_rules()
+    report = {'file': path, 'valid': True, 'ads': 0, 'invalid_ads': 0, 'errors': []}
+    errors = report['errors']
+    
+    def add_error(index, ad_id, field, message) -> bool:
+        errors.append({'index': index, 'id': ad_id, 'field': field, 'message': message})
+        return max_errors is not None and len(errors) >= max_errors
+    
+    root = None
+    depth = 0
+    try:
+        for event, elem in ET.iterparse(path, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if root is None:
+                    root = elem
+                    stop = False
+                    if root.tag != 'Ads':
+                        stop = add_error(None, None, None, "Root element must be 'Ads'")
+                    for attribute in ('formatVersion', 'target'):
+                        if not stop and attribute not in root.attrib:
+                            stop = add_error(
+                                None, None, attribute, f"Missing '{attribute}' attribute"
+                            )
+                    if stop:
+                        break
+                continue
+            
+            depth -= 1
+            if depth != 1:
+                continue
             
-    return True 
\ No newline at end of file
+            if elem.tag == 'Ad':
+                index = report['ads']
+                report['ads'] += 1
+                ad_errors = rules.check_ad(elem, default_category)
+                
+                if ad_errors:
+                    report['invalid_ads'] += 1
+                    id_element = elem.find('Id')
+                    ad_id = id_element.text if id_element is not None else None
+                    stop = False
+                    for field, message in ad_errors:
+                        stop = add_error(index, ad_id, field, message)
+                        if stop:
+                            break
+                    if stop:
+                        break
+            
+            # Освобождаем уже проверенные элементы
+            root.clear()
+            
+    except ET.ParseError as e:
+        add_error(None, None, None, f"XML parse error: {str(e)}")
+    
+    report['valid'] = not errors
+    return report 
\ No newline at end of file
@@ -1,16 +1,32 @@
 import os
 import time
-from typing import List, Dict, Optional
+from collections import deque
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Tuple
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
 from dotenv import load_dotenv
 from loguru import logger
 from fake_useragent import UserAgent
 import logging
+from session_cache import SessionCache
+from Avito_autoload.image_pipeline import ImagePipeline
+from Avito_autoload.ad_model import Ad, AdValidationError
+from image_prefetch import ImagePrefetcher
+from tracing import Tracer, network_timings
+
+# Маркеры завершения шагов на тестовом сайте fake_avito. На avito.ru они
+# не проверены, поэтому по умолчанию не используются: шаги ждут признаков,
+# которые есть на любой версии страниц (адрес, форма, поле файла). Маркеры,
+# подтвержденные на реальных страницах, передаются в config
+# (profile_locator, image_preview_locator, publish_success_locator)
+PROFILE_LOCATOR = (By.CSS_SELECTOR, '[data-marker="profile"]')
+IMAGE_PREVIEW_LOCATOR = (By.CSS_SELECTOR, '[data-marker="image-preview"]')
+PUBLISH_SUCCESS_LOCATOR = (By.CSS_SELECTOR, '[data-marker="publish-success"]')
 
 class AvitoAgent:
     def __init__(self, config):
@@ -20,11 +36,52 @@ class AvitoAgent:
         self.proxy = config.get('proxy')
         self.user_agent = config.get('user_agent')
         self.selenium_hub_url = config.get('selenium_hub_url', 'http://localhost:4444/wd/hub')
+        # Локальный Chrome вместо Selenium Grid (например, для замеров на тестовом сайте)
+        self.local_driver = config.get('local_driver', False)
+        self.headless = config.get('headless', False)
+        self.base_url = config.get('base_url', 'https://www.avito.ru').rstrip('/')
+        # Кеш cookies и localStorage, чтобы не проходить форму входа при каждом запуске.
+        # Включается явно: cookies авторизации хранятся на диске открытым текстом
+        self.session_cache = (
+            SessionCache(config.get('session_dir', 'sessions'))
+            if config.get('session_cache', False) else None
+        )
+        self.logged_in = False
+        # Скачивание фото по ссылкам: поле загрузки принимает только локальные файлы
+        self.image_prefetcher = ImagePrefetcher.for_config(config)
+        # Уменьшение и пережатие фото перед загрузкой (общий кеш и пул процессов)
+        self.image_pipeline = config.get('image_pipeline')
+        if self.image_pipeline is None and config.get('process_images', True):
+            self.image_pipeline = ImagePipeline.shared(config.get('image_cache_dir', 'image_cache'))
+        # Таймауты ожиданий в секундах
+        self.page_timeout = config.get('page_timeout', 10)
+        self.login_timeout = config.get('login_timeout', 10)
+        self.upload_timeout = config.get('upload_timeout', 30)
+        self.publish_timeout = config.get('publish_timeout', 30)
+        self.poll_frequency = config.get('poll_frequency', 0.1)
+        # Необязательные маркеры страниц (см. PROFILE_LOCATOR и соседние)
+        self.profile_locator = config.get('profile_locator')
+        self.image_preview_locator = config.get('image_preview_locator')
+        self.publish_success_locator = config.get('publish_success_locator')
+        # Фактическое время ожидания по шагам: (шаг, секунды)
+        self.wait_timings = deque(maxlen=config.get('wait_timings_size', 1000))
+        # Трассировка шагов; общий Tracer можно передать в config['tracer']
+        self._own_tracer = config.get('tracer') is None
+        self.tracer = config.get('tracer') or Tracer(
+            enabled=config.get('tracing', True),
+            path=config.get('trace_file')
+        )
+        # Сетевые запросы шагов из performance-лога Chrome
+        self.trace_network = config.get('trace_network', False) and self.tracer.enabled
         self.driver = None
         self.setup_driver()
         
     def setup_driver(self):
         """Настройка и инициализация драйвера"""
+        with self._span('setup_driver'):
+            self._setup_driver()
+            
+    def _setup_driver(self):
         options = Options()
         
         # Настройка прокси
@@ -42,81 +99,305 @@ class AvitoAgent:
         options.add_argument('--disable-gpu')
         options.add_argument('--disable-extensions')
         options.add_argument('--disable-infobars')
+        if self.headless:
+            options.add_argument('--headless=new')
+        if self.trace_network:
+            options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
         
-        self.driver = webdriver.Remote(
-            command_executor=self.selenium_hub_url,
-            options=options
-        )
+        with self._span('start_session'):
+            if self.local_driver:
+                self.driver = webdriver.Chrome(options=options)
+            else:
+                self.driver = webdriver.Remote(
+                    command_executor=self.selenium_hub_url,
+                    options=options
+                )
+        with self._span('restore_session', network=True) as span:
+            self.logged_in = span['restored'] = self.restore_session()
         
-    def login(self):
-        """Авторизация на сайте"""
+    def restore_session(self) -> bool:
+        """
+        Восстановление сохраненной сессии аккаунта
+        
+        Cookies ставятся через CDP до первой загрузки, поэтому сессию проверяет
+        одна загрузка профиля. Если CDP недоступен, cookies ставятся на легкой
+        странице домена (robots.txt) перед загрузкой профиля.
+        
+        Returns:
+            bool: True если агент авторизован без ввода логина и пароля
+        """
+        if not self.session_cache:
+            return False
+        state = self.session_cache.load(self.username)
+        if state is None:
+            return False
         try:
-            self.driver.get('https://www.avito.ru/profile')
+            if not self.session_cache.set_cookies(self.driver, state, self.base_url):
+                self.driver.get(f'{self.base_url}/robots.txt')
+                self.session_cache.apply_cookies(self.driver, state)
+            self.driver.get(f'{self.base_url}/profile')
+            if self._logged_in_page(self.driver):
+                # localStorage восстанавливается на уже открытой странице профиля
+                self.session_cache.apply_local_storage(self.driver, state)
+                logger.info(f"Сессия {self.username} восстановлена из кеша")
+                return True
+        except Exception as e:
+            logging.warning(f"Не удалось восстановить сессию: {str(e)}")
+        # Сессия истекла: очищаем кеш и выполним полный вход
+        self.session_cache.clear(self.username)
+        self.driver.delete_all_cookies()
+        return False
+        
+    @contextmanager
+    def _span(self, name: str, network: bool = False, **attrs):
+        """
+        Span трассировки шага
+        
+        Args:
+            name (str): Название шага
+            network (bool): Добавить к шагу сетевые запросы из performance-лога
+            **attrs: Дополнительные поля span'а
+        """
+        with self.tracer.span(name, **attrs) as span:
+            try:
+                yield span
+            finally:
+                if network and self.trace_network and self.driver:
+                    try:
+                        # Лог очищается при чтении: в шаг попадают запросы с прошлого чтения
+                        span.update(network_timings(self.driver.get_log('performance')))
+                    except Exception as e:
+                        logger.debug(f"Не удалось прочитать performance-лог: {str(e)}")
+                        
+    def _wait(self, step: str, condition, timeout: float):
+        """
+        Ожидание условия с записью фактического времени шага
+        
+        Args:
+            step (str): Название шага
+            condition: Условие для WebDriverWait
+            timeout (float): Таймаут в секундах
+        """
+        start = time.monotonic()
+        try:
+            with self._span(step, timeout=timeout):
+                return WebDriverWait(
+                    self.driver, timeout, poll_frequency=self.poll_frequency
+                ).until(condition)
+        finally:
+            elapsed = time.monotonic() - start
+            self.wait_timings.append((step, elapsed))
+            logger.debug(f"Шаг {step}: ожидание {elapsed:.3f} с")
             
-            # Ждем появления формы логина
-            login_form = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.NAME, "login"))
-            )
-            login_form.send_keys(self.username)
+    def step_summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Сводка по времени ожиданий
+        
+        Returns:
+            Dict[str, Dict[str, float]]: Количество, среднее и максимум по шагам
+        """
+        summary = {}
+        for step, elapsed in self.wait_timings:
+            stats = summary.setdefault(step, {'count': 0, 'total': 0.0, 'max': 0.0})
+            stats['count'] += 1
+            stats['total'] += elapsed
+            stats['max'] = max(stats['max'], elapsed)
+        for stats in summary.values():
+            stats['avg'] = stats['total'] / stats['count']
+        return summary
+        
+    def _logged_in_page(self, driver) -> bool:
+        """
+        Условие: открыта страница профиля вошедшего пользователя
+
+        Профиль открывается по тому же адресу, что и форма входа, поэтому
+        кроме адреса проверяется, что формы входа на странице нет.
+        """
+        if 'profile' not in driver.current_url or driver.find_elements(By.NAME, "login"):
+            return False
+        return not self.profile_locator or bool(driver.find_elements(*self.profile_locator))
+
+    def _image_uploaded(self, image_input, count: int):
+        """
+        Условие: изображение принято формой
+
+        С image_preview_locator ждем count превью на странице, иначе —
+        выбранный файл в поле загрузки (или перерисовку поля после выбора).
+        """
+        def condition(driver):
+            if self.image_preview_locator:
+                return len(driver.find_elements(*self.image_preview_locator)) >= count
+            try:
+                return bool(image_input.get_attribute('value'))
+            except StaleElementReferenceException:
+                return True
+        return condition
+        
+    def login(self):
+        """Авторизация на сайте (пропускается, если сессия восстановлена из кеша)"""
+        if self.logged_in:
+            return True
+        with self._span('login') as span:
+            if not self._login():
+                span['status'] = 'error'
+                return False
+            return True
+            
+    def _login(self) -> bool:
+        try:
+            with self._span('open_profile', network=True):
+                self.driver.get(f'{self.base_url}/profile')
+                
+                # Ждем появления формы логина
+                login_form = self._wait(
+                    'login_form',
+                    EC.presence_of_element_located((By.NAME, "login")),
+                    self.page_timeout
+                )
             
-            password_form = self.driver.find_element(By.NAME, "password")
-            password_form.send_keys(self.password)
+            with self._span('fill_form'):
+                login_form.send_keys(self.username)
+                
+                password_form = self.driver.find_element(By.NAME, "password")
+                password_form.send_keys(self.password)
             
-            submit_button = self.driver.find_element(By.CLASS_NAME, "submit-button")
-            submit_button.click()
+            with self._span('submit', network=True):
+                submit_button = self.driver.find_element(By.CLASS_NAME, "submit-button")
+                submit_button.click()
+                
+                # Проверяем успешность авторизации: страница с формой сменилась
+                # и открылся профиль без формы входа
+                try:
+                    self._wait(
+                        'login_submit',
+                        EC.all_of(EC.staleness_of(login_form), self._logged_in_page),
+                        self.login_timeout
+                    )
+                except TimeoutException:
+                    return False
             
-            # Проверяем успешность авторизации
-            time.sleep(2)
-            return 'profile' in self.driver.current_url
+            self.logged_in = True
+            if self.session_cache:
+                try:
+                    with self._span('save_session'):
+                        self.session_cache.save(self.driver, self.username)
+                except Exception as e:
+                    logging.warning(f"Не удалось сохранить сессию: {str(e)}")
+            return True
             
         except Exception as e:
             logging.error(f"Ошибка при авторизации: {str(e)}")
             raise
             
     def create_listing(self, listing_data):
-        """Создание объявления"""
+        """
+        Создание объявления
+        
+        Args:
+            listing_data: Ad или словарь с title, description, price, category
+                и необязательным images
+        
+        Returns:
+            bool: True если объявление опубликовано
+        """
+        with self._span('create_listing') as span:
+            try:
+                listing = Ad.from_dict(listing_data, require_category=True)
+            except AdValidationError as e:
+                # Некорректное объявление не открывает форму
+                logging.error(f"Некорректное объявление: {str(e)}")
+                span['status'] = 'error'
+                return False
+            if not self._create_listing(listing):
+                span['status'] = 'error'
+                return False
+            return True
+            
+    def _create_listing(self, listing: Ad) -> bool:
         try:
-            self.driver.get('https://www.avito.ru/additem')
+            with self._span('open_form', network=True):
+                self.driver.get(f'{self.base_url}/additem')
+                form_url = self.driver.current_url
+                
+                title_input = self._wait(
+                    'listing_form',
+                    EC.presence_of_element_located((By.NAME, "title")),
+                    self.page_timeout
+                )
             
             # Заполнение основной информации
-            title_input = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.NAME, "title"))
-            )
-            title_input.send_keys(listing_data['title'])
-            
-            description_input = self.driver.find_element(By.NAME, "description")
-            description_input.send_keys(listing_data['description'])
-            
-            price_input = self.driver.find_element(By.NAME, "price")
-            price_input.send_keys(listing_data['price'])
-            
-            # Выбор категории
-            category_select = self.driver.find_element(By.NAME, "category")
-            category_select.send_keys(listing_data['category'])
+            with self._span('fill_form'):
+                title_input.send_keys(listing.title)
+                
+                description_input = self.driver.find_element(By.NAME, "description")
+                description_input.send_keys(listing.description)
+                
+                price_input = self.driver.find_element(By.NAME, "price")
+                price_input.send_keys(str(listing.price))
+                
+                # Выбор категории
+                category_select = self.driver.find_element(By.NAME, "category")
+                category_select.send_keys(listing.category)
             
             # Загрузка изображений
-            if 'images' in listing_data:
-                for image in listing_data['images']:
-                    image_input = self.driver.find_element(By.NAME, "image")
-                    image_input.send_keys(image)
-                    time.sleep(1)  # Ждем загрузки каждого изображения
+            if listing.images:
+                images = listing.images
+                if self.image_prefetcher:
+                    with self._span('prefetch_images', images=len(images)):
+                        images = self.image_prefetcher.localize(images)
+                if self.image_pipeline:
+                    with self._span('process_images', images=len(images)):
+                        images = self.image_pipeline.process(images)
+                with self._span('upload_images', network=True, images=len(images)):
+                    uploaded = (
+                        len(self.driver.find_elements(*self.image_preview_locator))
+                        if self.image_preview_locator else 0
+                    )
+                    for image in images:
+                        image_input = self.driver.find_element(By.NAME, "image")
+                        image_input.send_keys(image)
+                        # Ждем, пока форма примет изображение
+                        uploaded += 1
+                        self._wait('image_upload', self._image_uploaded(image_input, uploaded), self.upload_timeout)
             
             # Публикация объявления
-            submit_button = self.driver.find_element(By.CLASS_NAME, "submit-button")
-            submit_button.click()
-            
-            # Ждем завершения публикации
-            time.sleep(5)
+            with self._span('submit', network=True):
+                submit_button = self.driver.find_element(By.CLASS_NAME, "submit-button")
+                submit_button.click()
+                
+                # Ждем подтверждения публикации: переход со страницы формы,
+                # перерисовка формы или сообщение об успехе, если маркер задан
+                conditions = [EC.url_changes(form_url), EC.staleness_of(title_input)]
+                if self.publish_success_locator:
+                    conditions.append(EC.presence_of_element_located(self.publish_success_locator))
+                self._wait('publish', EC.any_of(*conditions), self.publish_timeout)
             return True
             
         except Exception as e:
             logging.error(f"Ошибка при создании объявления: {str(e)}")
             return False
             
-    def __del__(self):
-        """Закрытие драйвера при удалении объекта"""
+    def is_alive(self) -> bool:
+        """Проверка, что сессия браузера отвечает"""
+        if not self.driver:
+            return False
+        try:
+            self.driver.execute_script('return 1')
+            return True
+        except Exception:
+            return False
+            
+    def close(self):
+        """Закрытие драйвера"""
         if self.driver:
             try:
                 self.driver.quit()
             except:
-                pass 
\ No newline at end of file
+                pass
+            self.driver = None
+        if self._own_tracer:
+            self.tracer.close()
+            
+    def __del__(self):
+        """Закрытие драйвера при удалении объекта"""
+        self.close()
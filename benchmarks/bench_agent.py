@@ -0,0 +1,123 @@
+"""
+Сквозной замер публикации объявлений AvitoAgent на тестовом сайте
+
+Поднимает fake_avito.FakeAvitoServer с заданными задержками и отказами,
+открывает пул сессий (локальный headless Chrome или Selenium Grid через
+--hub) и публикует объявления. Выводит объявления в минуту, долю
+успешных публикаций, сводку p50/p95 по шагам агента и счетчики сайта.
+
+Запуск:
+    python benchmarks/bench_agent.py --listings 50 --sessions 4
+    python benchmarks/bench_agent.py --hub http://localhost:4444/wd/hub \\
+        --site-host 0.0.0.0 --site-url http://host.docker.internal:8800 --site-port 8800
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from avito_agent import IMAGE_PREVIEW_LOCATOR, PROFILE_LOCATOR, PUBLISH_SUCCESS_LOCATOR
+from fake_avito import FakeAvitoServer, add_arguments, config_from_args
+from session_pool import SessionPool
+from tracing import Tracer
+
+def make_images(directory: str, count: int, size: int = 200 * 1024) -> list:
+    """Файлы изображений для поля загрузки (сайт не проверяет содержимое)"""
+    paths = []
+    for n in range(count):
+        path = os.path.join(directory, f'image_{n}.jpg')
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size))
+        paths.append(path)
+    return paths
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--listings', type=int, default=20, help='Количество объявлений')
+    parser.add_argument('--sessions', type=int, default=2, help='Количество параллельных сессий')
+    parser.add_argument('--images', type=int, default=3, help='Фото в каждом объявлении')
+    parser.add_argument('--hub', help='Selenium Grid вместо локального Chrome')
+    parser.add_argument('--no-headless', action='store_true', help='Показывать окно браузера')
+    parser.add_argument('--site-host', default='127.0.0.1', help='Адрес, на котором слушает тестовый сайт')
+    parser.add_argument('--site-port', type=int, default=0, help='Порт тестового сайта (0 — любой свободный)')
+    parser.add_argument('--site-url', help='Адрес сайта для браузера, если отличается (Grid в контейнере)')
+    parser.add_argument('--timeout', type=float, default=30, help='Таймауты ожиданий агента, с')
+    parser.add_argument('--output', help='Файл отчета JSON')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.TemporaryDirectory(prefix='bench_agent_')
+    images = make_images(tmp_dir.name, args.images)
+    tracer = Tracer()
+
+    with FakeAvitoServer(config_from_args(args), host=args.site_host, port=args.site_port) as server:
+        config = {
+            'username': 'bench',
+            'password': 'bench',
+            'base_url': args.site_url or server.url,
+            'local_driver': not args.hub,
+            'selenium_hub_url': args.hub,
+            'headless': not args.no_headless,
+            'session_cache': False,
+            'prefetch_images': False,
+            'process_images': False,
+            'page_timeout': args.timeout,
+            'login_timeout': args.timeout,
+            'upload_timeout': args.timeout,
+            'publish_timeout': args.timeout,
+            # Маркеры тестового сайта: ожидания идут до появления превью и подтверждения
+            'profile_locator': PROFILE_LOCATOR,
+            'image_preview_locator': IMAGE_PREVIEW_LOCATOR,
+            'publish_success_locator': PUBLISH_SUCCESS_LOCATOR,
+            'tracer': tracer
+        }
+        listings = [
+            {
+                'title': f'Тестовое объявление {n}',
+                'description': 'Описание тестового объявления',
+                'price': str(1000 + n),
+                'category': 'Электроника',
+                'images': images
+            }
+            for n in range(args.listings)
+        ]
+
+        start = time.perf_counter()
+        with SessionPool(config, size=args.sessions) as pool:
+            setup_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            results = pool.create_listings(listings)
+            seconds = time.perf_counter() - start
+        site_stats = server.stats
+    tmp_dir.cleanup()
+
+    published = sum(results)
+    report = {
+        'listings': len(results),
+        'published': published,
+        'failed': len(results) - published,
+        'sessions': args.sessions,
+        'setup_seconds': setup_seconds,
+        'seconds': seconds,
+        'listings_per_minute': published / seconds * 60 if seconds else 0.0,
+        'steps': tracer.summary(),
+        'site': site_stats
+    }
+    print(tracer.format_summary())
+    print(
+        f"\nСессий: {args.sessions}, открытие {setup_seconds:.1f} с\n"
+        f"Опубликовано {published} из {len(results)} за {seconds:.1f} с: "
+        f"{report['listings_per_minute']:.1f} объявлений в минуту\n"
+        f"Сайт: {json.dumps(site_stats, ensure_ascii=False)}"
+    )
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+import html
+import random
+import asyncio
+import secrets
+import argparse
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+from aiohttp import web
+
+SESSION_COOKIE = 'sessid'
+
+@dataclass
+class FakeAvitoConfig:
+    """
+    Настройки тестового сайта
+
+    Задержки задаются в секундах, к каждой добавляется случайный разброс
+    до jitter. Доли отказов — вероятность от 0 до 1.
+    """
+    username: Optional[str] = None
+    password: Optional[str] = None
+    page_latency: float = 0.05
+    upload_latency: float = 0.2
+    publish_latency: float = 0.3
+    jitter: float = 0.05
+    # Ответ 500 на любую страницу
+    error_rate: float = 0.0
+    # Отказ в авторизации при верных данных
+    login_failure_rate: float = 0.0
+    # Загрузка фото, после которой превью не появляется
+    upload_failure_rate: float = 0.0
+    # Публикация, после которой форма возвращается с ошибкой
+    publish_failure_rate: float = 0.0
+    seed: Optional[int] = None
+
+@dataclass
+class FakeAvitoState:
+    sessions: set = field(default_factory=set)
+    items: Dict[int, Dict] = field(default_factory=dict)
+    stats: Dict[str, int] = field(default_factory=lambda: {
+        'logins': 0, 'login_failures': 0, 'uploads': 0, 'upload_failures': 0,
+        'listings': 0, 'publish_failures': 0, 'errors': 0
+    })
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Вход</title></head>
+<body>
+{error}
+<form method="post" action="/login">
+  <input name="login" type="text">
+  <input name="password" type="password">
+  <button class="submit-button" type="submit">Войти</button>
+</form>
+</body></html>"""
+
+PROFILE_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Профиль</title></head>
+<body><h1 data-marker="profile">Профиль</h1><a href="/additem">Разместить объявление</a></body></html>"""
+
+# Загрузка фото как на сайте: файл уходит на сервер сразу после выбора,
+# превью появляется после ответа
+ADDITEM_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Новое объявление</title></head>
+<body>
+{error}
+<form id="item-form" method="post" action="/additem">
+  <input name="title" type="text">
+  <textarea name="description"></textarea>
+  <input name="price" type="text">
+  <input name="category" type="text">
+  <input name="images" type="hidden" value="">
+  <input name="image" type="file" accept="image/*">
+  <div id="previews"></div>
+  <button class="submit-button" type="submit">Разместить</button>
+</form>
+<script>
+var input = document.querySelector('input[name=image]');
+var ids = [];
+input.addEventListener('change', function () {{
+  var file = input.files[0];
+  if (!file) return;
+  var body = new FormData();
+  body.append('image', file);
+  input.value = '';
+  fetch('/upload', {{method: 'POST', body: body}})
+    .then(function (r) {{ return r.ok ? r.json() : null; }})
+    .then(function (data) {{
+      if (!data) return;
+      ids.push(data.id);
+      document.querySelector('input[name=images]').value = ids.join(',');
+      var preview = document.createElement('div');
+      preview.setAttribute('data-marker', 'image-preview');
+      preview.textContent = data.name;
+      document.getElementById('previews').appendChild(preview);
+    }});
+}});
+</script>
+</body></html>"""
+
+ITEM_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title></head>
+<body><div data-marker="publish-success">Объявление опубликовано</div><h1>{title}</h1></body></html>"""
+
+class FakeAvito:
+    """
+    Локальная замена avito.ru для сквозных замеров AvitoAgent
+
+    Отдает страницы входа, профиля и подачи объявления с теми же именами
+    элементов, на которые опирается агент (login, password, title,
+    description, price, category, image, submit-button, превью
+    data-marker="image-preview"), с настраиваемыми задержками и отказами.
+    Счетчики доступны по GET /__stats.
+    """
+
+    def __init__(self, config: Optional[FakeAvitoConfig] = None):
+        self.config = config or FakeAvitoConfig()
+        self.state = FakeAvitoState()
+        self.random = random.Random(self.config.seed)
+        self._upload_ids = 0
+        self.app = web.Application(middlewares=[self._faults])
+        self.app.router.add_get('/robots.txt', self.robots)
+        self.app.router.add_get('/profile', self.profile)
+        self.app.router.add_get('/login', self.login_page)
+        self.app.router.add_post('/login', self.login)
+        self.app.router.add_get('/additem', self.additem)
+        self.app.router.add_post('/additem', self.publish)
+        self.app.router.add_post('/upload', self.upload)
+        self.app.router.add_get('/items/{item_id}', self.item)
+        self.app.router.add_get('/__stats', self.stats)
+
+    async def _delay(self, seconds: float) -> None:
+        total = seconds + self.random.uniform(0, self.config.jitter)
+        if total > 0:
+            await asyncio.sleep(total)
+
+    def _chance(self, rate: float) -> bool:
+        return rate > 0 and self.random.random() < rate
+
+    @web.middleware
+    async def _faults(self, request: web.Request, handler):
+        if request.path == '/__stats':
+            return await handler(request)
+        await self._delay(self.config.page_latency)
+        if self._chance(self.config.error_rate):
+            self.state.stats['errors'] += 1
+            return web.Response(status=500, text='Internal Server Error')
+        return await handler(request)
+
+    def _logged_in(self, request: web.Request) -> bool:
+        return request.cookies.get(SESSION_COOKIE) in self.state.sessions
+
+    @staticmethod
+    def _html(body: str, status: int = 200) -> web.Response:
+        return web.Response(text=body, status=status, content_type='text/html')
+
+    async def robots(self, request: web.Request) -> web.Response:
+        return web.Response(text='User-agent: *\nDisallow:\n')
+
+    async def profile(self, request: web.Request) -> web.Response:
+        if self._logged_in(request):
+            return self._html(PROFILE_PAGE)
+        return self._html(LOGIN_PAGE.format(error=''))
+
+    async def login_page(self, request: web.Request) -> web.Response:
+        return self._html(LOGIN_PAGE.format(error='<p class="error">Неверный логин или пароль</p>'))
+
+    async def login(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        username, password = form.get('login', ''), form.get('password', '')
+        valid = bool(username and password) and (
+            self.config.username is None
+            or (username == self.config.username and password == self.config.password)
+        )
+        if not valid or self._chance(self.config.login_failure_rate):
+            self.state.stats['login_failures'] += 1
+            raise web.HTTPSeeOther('/login')
+        token = secrets.token_hex(16)
+        self.state.sessions.add(token)
+        self.state.stats['logins'] += 1
+        response = web.Response(status=303, headers={'Location': '/profile'})
+        response.set_cookie(SESSION_COOKIE, token, max_age=30 * 24 * 3600)
+        return response
+
+    async def additem(self, request: web.Request) -> web.Response:
+        if not self._logged_in(request):
+            raise web.HTTPSeeOther('/profile')
+        return self._html(ADDITEM_PAGE.format(error=''))
+
+    async def upload(self, request: web.Request) -> web.Response:
+        if not self._logged_in(request):
+            return web.json_response({'error': 'unauthorized'}, status=401)
+        reader = await request.multipart()
+        part = await reader.next()
+        size = 0
+        name = part.filename if part is not None else ''
+        if part is not None:
+            while True:
+                chunk = await part.read_chunk()
+                if not chunk:
+                    break
+                size += len(chunk)
+        await self._delay(self.config.upload_latency)
+        if self._chance(self.config.upload_failure_rate):
+            self.state.stats['upload_failures'] += 1
+            return web.json_response({'error': 'upload failed'}, status=500)
+        self._upload_ids += 1
+        self.state.stats['uploads'] += 1
+        return web.json_response({'id': self._upload_ids, 'name': name, 'size': size})
+
+    async def publish(self, request: web.Request) -> web.Response:
+        if not self._logged_in(request):
+            raise web.HTTPSeeOther('/profile')
+        form = await request.post()
+        await self._delay(self.config.publish_latency)
+        missing = [name for name in ('title', 'description', 'price') if not form.get(name)]
+        if missing or self._chance(self.config.publish_failure_rate):
+            self.state.stats['publish_failures'] += 1
+            return self._html(ADDITEM_PAGE.format(
+                error='<p class="error">Не удалось разместить объявление</p>'
+            ), status=400)
+        item_id = len(self.state.items) + 1
+        self.state.items[item_id] = {
+            'title': form['title'],
+            'description': form['description'],
+            'price': form['price'],
+            'category': form.get('category', ''),
+            'images': [image for image in form.get('images', '').split(',') if image]
+        }
+        self.state.stats['listings'] += 1
+        raise web.HTTPSeeOther(f'/items/{item_id}')
+
+    async def item(self, request: web.Request) -> web.Response:
+        item = self.state.items.get(int(request.match_info['item_id']))
+        if item is None:
+            raise web.HTTPNotFound()
+        return self._html(ITEM_PAGE.format(title=html.escape(item['title'])))
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response(dict(self.state.stats, items=len(self.state.items)))
+
+class FakeAvitoServer:
+    """
+    Запуск тестового сайта в фоновом потоке
+
+    Пример:
+        with FakeAvitoServer(FakeAvitoConfig(page_latency=0.1)) as server:
+            config['base_url'] = server.url
+    """
+
+    def __init__(self, config: Optional[FakeAvitoConfig] = None, host: str = '127.0.0.1', port: int = 0):
+        self.site = FakeAvito(config)
+        self.host = host
+        self.port = port
+        self.url = None
+        self._loop = asyncio.new_event_loop()
+        self._runner = web.AppRunner(self.site.app)
+        self._thread = None
+
+    def start(self) -> str:
+        """Запускает сервер и возвращает его адрес"""
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._runner.setup())
+            tcp_site = web.TCPSite(self._runner, self.host, self.port)
+            self._loop.run_until_complete(tcp_site.start())
+            self.port = self._runner.addresses[0][1]
+            self.url = f'http://{self.host}:{self.port}'
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name='fake-avito', daemon=True)
+        self._thread.start()
+        ready.wait(timeout=10)
+        return self.url
+
+    def stop(self) -> None:
+        """Останавливает сервер"""
+        if self._thread is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(timeout=10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=10)
+        self._thread = None
+        self._loop.close()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return dict(self.site.state.stats, items=len(self.site.state.items))
+
+    def __enter__(self) -> 'FakeAvitoServer':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+def config_from_args(args: argparse.Namespace) -> FakeAvitoConfig:
+    return FakeAvitoConfig(
+        username=args.username,
+        password=args.password,
+        page_latency=args.page_latency,
+        upload_latency=args.upload_latency,
+        publish_latency=args.publish_latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        login_failure_rate=args.login_failure_rate,
+        upload_failure_rate=args.upload_failure_rate,
+        publish_failure_rate=args.publish_failure_rate,
+        seed=args.seed
+    )
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Параметры тестового сайта для командной строки"""
+    parser.add_argument('--username', help='Принимаемый логин (по умолчанию любой)')
+    parser.add_argument('--password', help='Принимаемый пароль')
+    parser.add_argument('--page-latency', type=float, default=0.05, help='Задержка страниц, с')
+    parser.add_argument('--upload-latency', type=float, default=0.2, help='Задержка загрузки фото, с')
+    parser.add_argument('--publish-latency', type=float, default=0.3, help='Задержка публикации, с')
+    parser.add_argument('--jitter', type=float, default=0.05, help='Случайная добавка к задержкам, с')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов 500')
+    parser.add_argument('--login-failure-rate', type=float, default=0.0, help='Доля отказов во входе')
+    parser.add_argument('--upload-failure-rate', type=float, default=0.0, help='Доля неудачных загрузок фото')
+    parser.add_argument('--publish-failure-rate', type=float, default=0.0, help='Доля неудачных публикаций')
+    parser.add_argument('--seed', type=int, help='Зерно генератора случайных чисел')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Локальная замена avito.ru для тестов AvitoAgent')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8800)
+    add_arguments(parser)
+    args = parser.parse_args()
+    web.run_app(FakeAvito(config_from_args(args)).app, host=args.host, port=args.port)
@@ -0,0 +1,289 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+class ImagePrefetcher:
+    """
+    Параллельная предзагрузка изображений объявлений по ссылкам
+
+    Скачивание идет через общую сессию requests с keep-alive и пулом
+    соединений, с ограничением одновременных запросов к одному хосту.
+    Файлы кешируются на диске и при повторном запросе перепроверяются
+    через ETag / If-Modified-Since, так что неизменные файлы не качаются.
+
+    Результаты предзагрузки, которые так и не запросили через get(),
+    хранятся только для последних max_finished ссылок; более старые
+    при запросе просто перепроверяются по кешу. Когда кеш на диске
+    превышает max_cache_bytes, удаляются давно не использованные файлы.
+    """
+
+    _shared: Dict[str, 'ImagePrefetcher'] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        cache_dir: str = 'image_downloads',
+        workers: int = 16,
+        per_host: int = 4,
+        timeout: float = 30,
+        max_bytes: int = 25 * 1024 * 1024,
+        max_finished: int = 1000,
+        max_cache_bytes: int = 1024 * 1024 * 1024
+    ):
+        """
+        Инициализация загрузчика
+
+        Args:
+            cache_dir (str): Директория для скачанных файлов
+            workers (int): Общее количество одновременных загрузок
+            per_host (int): Максимум одновременных загрузок с одного хоста
+            timeout (float): Таймаут запроса в секундах
+            max_bytes (int): Максимальный размер файла, больший не скачивается
+            max_finished (int): Сколько завершенных загрузок хранить до get()
+            max_cache_bytes (int): Максимальный размер кеша на диске
+        """
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_finished = max_finished
+        self.max_cache_bytes = max_cache_bytes
+        self.downloaded = 0
+        self.revalidated = 0
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-prefetch')
+        self._host_limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._futures: Dict[str, Future] = {}
+        # Завершенные загрузки в порядке завершения, для вытеснения
+        self._finished = deque()
+        # Размер кеша на диске: None — еще не считали
+        self._cache_bytes: Optional[int] = None
+        # Защищает _futures, _finished, _host_limits и счетчики, которые меняются из потоков пула
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, cache_dir: str = 'image_downloads', **kwargs) -> 'ImagePrefetcher':
+        """Общий экземпляр на директорию, чтобы агенты делили пул соединений"""
+        with cls._shared_lock:
+            if cache_dir not in cls._shared:
+                cls._shared[cache_dir] = cls(cache_dir, **kwargs)
+            return cls._shared[cache_dir]
+
+    @classmethod
+    def for_config(cls, config: Dict) -> Optional['ImagePrefetcher']:
+        """
+        Загрузчик по конфигурации агента
+        
+        Returns:
+            Optional[ImagePrefetcher]: config['image_prefetcher'], общий экземпляр
+                для image_download_dir или None при prefetch_images=False
+        """
+        if config.get('image_prefetcher') is not None:
+            return config['image_prefetcher']
+        if config.get('prefetch_images', True):
+            return cls.shared(config.get('image_download_dir', 'image_downloads'))
+        return None
+
+    @staticmethod
+    def is_remote(path: str) -> bool:
+        return path.startswith(('http://', 'https://'))
+
+    def path(self, url: str) -> str:
+        """Путь к локальной копии файла"""
+        extension = os.path.splitext(urlsplit(url).path)[1][:5] or '.img'
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode('utf-8')).hexdigest() + extension)
+
+    def prefetch(self, urls: Iterable[str]) -> None:
+        """
+        Ставит ссылки в очередь на скачивание, не дожидаясь результата
+
+        Args:
+            urls (Iterable[str]): Ссылки или локальные пути (пути пропускаются)
+        """
+        self._submit(urls)
+
+    def _submit(self, urls: Iterable[str]) -> Dict[str, Future]:
+        """Загрузки ссылок: уже идущие или новые"""
+        futures = {}
+        submitted = []
+        with self._lock:
+            for url in urls:
+                if not self.is_remote(url):
+                    continue
+                future = self._futures.get(url)
+                if future is None:
+                    self._futures[url] = future = self._executor.submit(self._download, url)
+                    submitted.append((url, future))
+                futures[url] = future
+        # Вне блокировки: у уже завершенной загрузки callback вызывается сразу
+        for url, future in submitted:
+            future.add_done_callback(lambda future, url=url: self._on_done(url, future))
+        return futures
+
+    def _on_done(self, url: str, future: Future) -> None:
+        with self._lock:
+            self._finished.append((url, future))
+            while len(self._finished) > self.max_finished:
+                old_url, old_future = self._finished.popleft()
+                if self._futures.get(old_url) is old_future:
+                    del self._futures[old_url]
+
+    def prefetch_listings(self, listings: Iterable[Dict]) -> None:
+        """Ставит в очередь изображения всех объявлений пачки"""
+        self.prefetch(image for listing in listings for image in listing.get('images', []))
+
+    def get(self, url: str) -> str:
+        """
+        Возвращает локальный путь, при необходимости дожидаясь загрузки
+
+        Args:
+            url (str): Ссылка или локальный путь
+
+        Returns:
+            str: Путь к файлу на диске
+        """
+        if not self.is_remote(url):
+            return url
+        # Загрузка берется под той же блокировкой, что и вытеснение:
+        # вытесненная между prefetch() и get() ссылка просто ставится заново
+        future = self._submit([url])[url]
+        try:
+            return future.result()
+        finally:
+            # Следующий запрос той же ссылки заново перепроверит кеш
+            with self._lock:
+                if self._futures.get(url) is future:
+                    del self._futures[url]
+
+    def localize(self, images: List[str]) -> List[str]:
+        """Заменяет ссылки на локальные пути, сохраняя порядок"""
+        self.prefetch(images)
+        return [self.get(image) for image in images]
+
+    def _download(self, url: str) -> str:
+        path = self.path(url)
+        meta_path = path + '.meta.json'
+        headers = {}
+        if os.path.exists(path) and os.path.exists(meta_path):
+            try:
+                with open(meta_path, encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                meta = {}
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        with self._host_limit(urlsplit(url).netloc):
+            response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+            try:
+                if response.status_code == 304:
+                    # Файл снова используется и вытесняется последним
+                    os.utime(path)
+                    with self._lock:
+                        self.revalidated += 1
+                    return path
+                response.raise_for_status()
+                length = response.headers.get('Content-Length', '')
+                if length.isdigit() and int(length) > self.max_bytes:
+                    raise ValueError(f'Image {url} is larger than {self.max_bytes} bytes')
+
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = f'{path}.{threading.get_ident()}.tmp'
+                try:
+                    size = 0
+                    with open(tmp_path, 'wb') as f:
+                        for chunk in response.iter_content(chunk_size=64 * 1024):
+                            # Content-Length может отсутствовать или не совпадать с телом
+                            size += len(chunk)
+                            if size > self.max_bytes:
+                                raise ValueError(f'Image {url} is larger than {self.max_bytes} bytes')
+                            f.write(chunk)
+                    os.replace(tmp_path, path)
+                except BaseException:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+            finally:
+                response.close()
+
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'url': url,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified')
+            }, f)
+        with self._lock:
+            self.downloaded += 1
+            if self._cache_bytes is not None:
+                self._cache_bytes += size
+            over_limit = self._cache_bytes is None or self._cache_bytes > self.max_cache_bytes
+        if over_limit:
+            self.evict()
+        logging.debug(f"Скачано изображение {url}")
+        return path
+
+    def _host_limit(self, host: str) -> threading.BoundedSemaphore:
+        # Семафор создается под блокировкой, иначе два потока могут
+        # получить разные семафоры одного хоста
+        with self._lock:
+            limit = self._host_limits.get(host)
+            if limit is None:
+                limit = self._host_limits[host] = threading.BoundedSemaphore(self.per_host)
+            return limit
+
+    def evict(self) -> int:
+        """
+        Удаляет давно не использованные файлы, пока кеш больше max_cache_bytes
+
+        Returns:
+            int: Количество удаленных файлов
+        """
+        with self._evict_lock:
+            entries = []
+            total = 0
+            try:
+                with os.scandir(self.cache_dir) as it:
+                    for entry in it:
+                        if entry.is_file() and not entry.name.endswith(('.meta.json', '.tmp')):
+                            stat = entry.stat()
+                            entries.append((stat.st_mtime, stat.st_size, entry.path))
+                            total += stat.st_size
+            except FileNotFoundError:
+                pass
+
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_cache_bytes:
+                    break
+                for victim in (path, path + '.meta.json'):
+                    try:
+                        os.remove(victim)
+                    except FileNotFoundError:
+                        pass
+                total -= size
+                removed += 1
+            with self._lock:
+                self._cache_bytes = total
+        if removed:
+            logging.info(f"Удалено {removed} изображений из кеша {self.cache_dir}")
+        return removed
+
+    def close(self) -> None:
+        """Останавливает загрузки и закрывает соединения"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self.session.close()
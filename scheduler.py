@@ -0,0 +1,334 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+from avito_agent import AvitoAgent
+from image_prefetch import ImagePrefetcher
+from tracing import Tracer
+
+class TokenBucket:
+    """
+    Ограничение частоты действий
+
+    Токены пополняются со скоростью rate в секунду до capacity; каждое
+    действие расходует один токен.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            rate (float): Токенов в секунду (0 — без ограничения)
+            capacity (float): Максимум накопленных токенов (размер всплеска)
+            clock (Callable): Источник времени
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+
+    def _refill(self, now: float) -> None:
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Сколько секунд до появления токена"""
+        if not self.rate:
+            return 0.0
+        self._refill(self.clock())
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def consume(self) -> bool:
+        """
+        Расходует токен, если он есть
+
+        Returns:
+            bool: True если токен был
+        """
+        if not self.rate:
+            return True
+        self._refill(self.clock())
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+class _Account:
+    """Состояние аккаунта в планировщике"""
+
+    def __init__(self, config: Dict, bucket: TokenBucket, action_delay: float):
+        self.config = config
+        self.username = config['username']
+        self.bucket = bucket
+        self.action_delay = action_delay
+        # Время, раньше которого нельзя начинать следующее действие
+        self.next_action = 0.0
+        self.busy = False
+        self.disabled = False
+        self.login_failures = 0
+        self.agent: Optional[AvitoAgent] = None
+        self.last_used = 0.0
+        self.published = 0
+        self.failed = 0
+
+    def ready_in(self, now: float) -> float:
+        return max(self.bucket.wait_time(), self.next_action - now)
+
+class AccountScheduler:
+    """
+    Публикация очереди объявлений с нескольких аккаунтов
+
+    Каждый из slots потоков (слотов Selenium Grid) берет аккаунт, который
+    раньше других может начать следующую публикацию, и публикует с него
+    очередное объявление. Частота публикаций аккаунта ограничена токенами
+    (одна публикация в delay_between_listings секунд), между любыми двумя
+    действиями аккаунта выдерживается delay_between_actions. Один аккаунт
+    в каждый момент работает не больше чем в одной сессии, поэтому при
+    достаточном числе аккаунтов заняты все слоты, и общий темп растет с
+    числом аккаунтов: min(аккаунты / delay_between_listings,
+    слоты / время публикации).
+
+    Сессии аккаунтов переиспользуются; если живых сессий столько же, сколько
+    слотов, давно не использованная сессия свободного аккаунта закрывается.
+    """
+
+    def __init__(
+        self,
+        accounts: Iterable[Dict],
+        config: Optional[Dict] = None,
+        slots: Optional[int] = None,
+        delay_between_listings: float = 300,
+        delay_between_actions: float = 2,
+        burst: int = 1,
+        max_login_failures: int = 3
+    ):
+        """
+        Args:
+            accounts (Iterable[Dict]): Учетные данные аккаунтов (username, password
+                и при необходимости proxy, user_agent, delay_between_listings)
+            config (Dict): Общая конфигурация AvitoAgent
+            slots (int): Количество одновременных сессий, по умолчанию SE_NODE_MAX_SESSIONS
+            delay_between_listings (float): Минимальный интервал между публикациями аккаунта, с
+            delay_between_actions (float): Пауза между действиями аккаунта (вход, публикация), с
+            burst (int): Сколько публикаций аккаунт может сделать подряд после простоя
+            max_login_failures (int): После скольких неудачных входов аккаунт отключается
+        """
+        self.config = dict(config or {})
+        self.slots = slots or int(os.getenv('SE_NODE_MAX_SESSIONS', '5'))
+        self.max_login_failures = max_login_failures
+        self._own_tracer = self.config.get('tracer') is None
+        if self._own_tracer:
+            self.config['tracer'] = Tracer(
+                enabled=self.config.get('tracing', True),
+                path=self.config.get('trace_file')
+            )
+        self.tracer = self.config['tracer']
+
+        self.accounts: List[_Account] = []
+        for account in accounts:
+            delay = account.get('delay_between_listings', delay_between_listings)
+            self.accounts.append(_Account(
+                dict(self.config, **account),
+                TokenBucket(1 / delay if delay else 0, capacity=burst),
+                account.get('delay_between_actions', delay_between_actions)
+            ))
+        if not self.accounts:
+            raise ValueError('Не задано ни одного аккаунта')
+        self._cond = threading.Condition()
+        self._live = 0
+
+    @classmethod
+    def from_env(cls, config: Optional[Dict] = None, accounts: Optional[List[Dict]] = None) -> 'AccountScheduler':
+        """
+        Планировщик с настройками из окружения
+
+        Задержки берутся из DELAY_BETWEEN_LISTINGS и DELAY_BETWEEN_ACTIONS,
+        число слотов из SE_NODE_MAX_SESSIONS. Аккаунты, если не переданы,
+        читаются из JSON-файла AVITO_ACCOUNTS_FILE (список объектов с
+        username и password) или берутся из AVITO_LOGIN / AVITO_PASSWORD.
+        """
+        if accounts is None:
+            accounts_file = os.getenv('AVITO_ACCOUNTS_FILE')
+            if accounts_file:
+                with open(accounts_file, encoding='utf-8') as f:
+                    accounts = json.load(f)
+            else:
+                accounts = [{'username': os.getenv('AVITO_LOGIN'), 'password': os.getenv('AVITO_PASSWORD')}]
+        return cls(
+            accounts,
+            config,
+            delay_between_listings=float(os.getenv('DELAY_BETWEEN_LISTINGS', '300')),
+            delay_between_actions=float(os.getenv('DELAY_BETWEEN_ACTIONS', '2'))
+        )
+
+    def _acquire(self, listings: deque) -> Optional[_Account]:
+        """
+        Ожидание аккаунта, готового к публикации
+
+        Returns:
+            Optional[_Account]: Аккаунт (токен уже списан) или None, если
+                объявления закончились или все аккаунты отключены
+        """
+        with self._cond:
+            while True:
+                if not listings:
+                    return None
+                candidates = [a for a in self.accounts if not a.busy and not a.disabled]
+                if not candidates:
+                    if all(a.disabled for a in self.accounts):
+                        return None
+                    self._cond.wait()
+                    continue
+                now = time.monotonic()
+                # Первым идет аккаунт, который раньше готов; при равенстве — с открытой
+                # сессией (не нужно входить заново), затем давно не работавший
+                account = min(candidates, key=lambda a: (max(a.ready_in(now), 0), a.agent is None, a.last_used))
+                wait = account.ready_in(now)
+                if wait <= 0 and account.bucket.consume():
+                    account.busy = True
+                    return account
+                self._cond.wait(timeout=max(wait, 0.01))
+
+    def _release(self, account: _Account) -> None:
+        with self._cond:
+            account.busy = False
+            account.last_used = time.monotonic()
+            account.next_action = account.last_used + account.action_delay
+            self._cond.notify_all()
+
+    def _reserve_session(self) -> None:
+        """
+        Учет новой сессии
+
+        Если живых сессий уже столько же, сколько слотов, закрывается давно
+        не использованная сессия свободного аккаунта.
+        """
+        agent = None
+        with self._cond:
+            if self._live >= self.slots:
+                idle = [a for a in self.accounts if a.agent is not None and not a.busy]
+                if idle:
+                    victim = min(idle, key=lambda a: a.last_used)
+                    agent, victim.agent = victim.agent, None
+                    self._live -= 1
+            self._live += 1
+        if agent is not None:
+            agent.close()
+
+    def _session(self, account: _Account) -> Optional[AvitoAgent]:
+        """Живая авторизованная сессия аккаунта"""
+        agent = account.agent
+        if agent is not None and agent.is_alive():
+            return agent
+        if agent is not None:
+            account.agent = None
+            agent.close()
+            with self._cond:
+                self._live -= 1
+
+        self._reserve_session()
+        try:
+            agent = AvitoAgent(account.config)
+        except Exception:
+            with self._cond:
+                self._live -= 1
+            raise
+        if not agent.login():
+            agent.close()
+            with self._cond:
+                self._live -= 1
+            account.login_failures += 1
+            if account.login_failures >= self.max_login_failures:
+                account.disabled = True
+                logging.error(f"Аккаунт {account.username} отключен после {account.login_failures} неудачных входов")
+            return None
+        account.login_failures = 0
+        account.agent = agent
+        # После входа аккаунт выдерживает паузу перед следующим действием
+        time.sleep(account.action_delay)
+        return agent
+
+    def _worker(self, listings: deque, results: List[Optional[bool]]) -> None:
+        while True:
+            account = self._acquire(listings)
+            if account is None:
+                return
+            with self._cond:
+                if not listings:
+                    account.busy = False
+                    self._cond.notify_all()
+                    return
+                index, listing = listings.popleft()
+            try:
+                agent = self._session(account)
+                if agent is None:
+                    # Вход не удался: объявление опубликует другой аккаунт
+                    with self._cond:
+                        listings.appendleft((index, listing))
+                    continue
+                ok = agent.create_listing(listing)
+            except Exception as e:
+                logging.error(f"Ошибка публикации с аккаунта {account.username}: {str(e)}")
+                ok = False
+            finally:
+                self._release(account)
+            results[index] = ok
+            if ok:
+                account.published += 1
+            else:
+                account.failed += 1
+
+    def run(self, listings: Iterable[Dict]) -> List[Optional[bool]]:
+        """
+        Публикация очереди объявлений
+
+        Args:
+            listings (Iterable[Dict]): Данные объявлений для create_listing
+
+        Returns:
+            List[Optional[bool]]: Результаты в порядке входных объявлений;
+                None — объявление не опубликовано, потому что все аккаунты отключены
+        """
+        listings = list(listings)
+        prefetcher = ImagePrefetcher.for_config(self.config)
+        if prefetcher:
+            prefetcher.prefetch_listings(listings)
+        queue = deque(enumerate(listings))
+        results: List[Optional[bool]] = [None] * len(listings)
+        workers = min(self.slots, len(self.accounts), len(listings)) or 1
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='avito-slot') as executor:
+            for future in [executor.submit(self._worker, queue, results) for _ in range(workers)]:
+                future.result()
+        return results
+
+    def stats(self) -> Dict[str, Dict]:
+        """Опубликованные и неудачные объявления по аккаунтам"""
+        return {
+            account.username: {
+                'published': account.published,
+                'failed': account.failed,
+                'disabled': account.disabled
+            }
+            for account in self.accounts
+        }
+
+    def close(self) -> None:
+        """Закрытие всех сессий"""
+        for account in self.accounts:
+            if account.agent is not None:
+                account.agent.close()
+                account.agent = None
+        self._live = 0
+        if self._own_tracer:
+            self.tracer.close()
+
+    def __enter__(self) -> 'AccountScheduler':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,151 @@
+import os
+import re
+import json
+import time
+import logging
+from typing import Dict, Optional
+
+# Копия localStorage текущей страницы
+LOCAL_STORAGE_DUMP = 'return Object.assign({}, window.localStorage);'
+LOCAL_STORAGE_LOAD = (
+    'var items = arguments[0];'
+    'for (var key in items) { window.localStorage.setItem(key, items[key]); }'
+)
+
+class SessionCache:
+    """
+    Файловый кеш состояния авторизованного браузера
+
+    Для каждого аккаунта хранит cookies и localStorage в отдельном
+    JSON-файле, доступном только владельцу.
+    """
+
+    def __init__(self, directory: str = 'sessions'):
+        """
+        Args:
+            directory (str): Директория для файлов сессий
+        """
+        self.directory = directory
+
+    def path(self, username: str) -> str:
+        """Путь к файлу сессии аккаунта"""
+        safe_name = re.sub(r'[^A-Za-z0-9_.@-]', '_', username)
+        return os.path.join(self.directory, f'{safe_name}.json')
+
+    def save(self, driver, username: str) -> str:
+        """
+        Сохраняет cookies и localStorage текущей страницы
+
+        Args:
+            driver: Авторизованный WebDriver
+            username (str): Логин аккаунта
+
+        Returns:
+            str: Путь к файлу сессии
+        """
+        state = {
+            'saved_at': time.time(),
+            'cookies': driver.get_cookies(),
+            'local_storage': driver.execute_script(LOCAL_STORAGE_DUMP) or {}
+        }
+        data = json.dumps(state, ensure_ascii=False)
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(username)
+        tmp_path = path + '.tmp'
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return path
+
+    def load(self, username: str) -> Optional[Dict]:
+        """
+        Загружает сохраненное состояние без просроченных cookies
+
+        Returns:
+            Optional[Dict]: Состояние или None, если живых cookies не осталось
+        """
+        path = self.path(username)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Не удалось прочитать сессию {path}: {str(e)}")
+            return None
+
+        now = time.time()
+        state['cookies'] = [
+            cookie for cookie in state.get('cookies', [])
+            if cookie.get('expiry') is None or cookie['expiry'] > now
+        ]
+        return state if state['cookies'] else None
+
+    def set_cookies(self, driver, state: Dict, url: str) -> bool:
+        """
+        Ставит cookies через CDP (Network.setCookies) до загрузки страниц домена
+
+        Args:
+            driver: WebDriver Chrome
+            state (Dict): Состояние из load()
+            url (str): Адрес сайта для cookies без домена
+
+        Returns:
+            bool: False, если драйвер не поддерживает CDP
+        """
+        cookies = []
+        for cookie in state['cookies']:
+            param = {
+                'name': cookie['name'],
+                'value': cookie['value'],
+                'path': cookie.get('path', '/'),
+                'secure': cookie.get('secure', False),
+                'httpOnly': cookie.get('httpOnly', False)
+            }
+            if cookie.get('domain'):
+                param['domain'] = cookie['domain']
+            else:
+                param['url'] = url
+            if cookie.get('expiry') is not None:
+                param['expires'] = cookie['expiry']
+            if cookie.get('sameSite'):
+                param['sameSite'] = cookie['sameSite']
+            cookies.append(param)
+        try:
+            driver.execute_cdp_cmd('Network.setCookies', {'cookies': cookies})
+        except Exception as e:
+            logging.debug(f"CDP недоступен, cookies ставятся через страницу домена: {str(e)}")
+            return False
+        return True
+
+    def apply_cookies(self, driver, state: Dict) -> None:
+        """
+        Восстанавливает cookies на открытой странице домена
+
+        Args:
+            driver: WebDriver, уже открывший страницу нужного домена
+            state (Dict): Состояние из load()
+        """
+        for cookie in state['cookies']:
+            try:
+                driver.add_cookie(cookie)
+            except Exception as e:
+                logging.warning(f"Не удалось восстановить cookie {cookie.get('name')}: {str(e)}")
+
+    def apply_local_storage(self, driver, state: Dict) -> None:
+        """
+        Восстанавливает localStorage на открытой странице домена
+
+        Args:
+            driver: WebDriver, уже открывший страницу нужного домена
+            state (Dict): Состояние из load()
+        """
+        if state.get('local_storage'):
+            driver.execute_script(LOCAL_STORAGE_LOAD, state['local_storage'])
+
+    def clear(self, username: str) -> None:
+        """Удаляет сохраненную сессию аккаунта"""
+        path = self.path(username)
+        if os.path.exists(path):
+            os.remove(path)
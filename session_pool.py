@@ -0,0 +1,158 @@
+import os
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+from avito_agent import AvitoAgent
+from image_prefetch import ImagePrefetcher
+from tracing import Tracer
+
+class SessionPool:
+    """
+    Пул авторизованных сессий WebDriver
+
+    Держит size живых агентов (по одной сессии Selenium Grid на агента)
+    и распределяет между ними публикацию объявлений. Перед выдачей сессия
+    проверяется, неотвечающие сессии пересоздаются.
+    """
+
+    def __init__(self, config: Dict, size: Optional[int] = None, login: bool = True):
+        """
+        Инициализация пула
+
+        Args:
+            config (Dict): Конфигурация AvitoAgent
+            size (int): Количество сессий, по умолчанию SE_NODE_MAX_SESSIONS
+            login (bool): Авторизовывать ли новые сессии
+        """
+        self.config = dict(config)
+        # Общий трассировщик: сводка по шагам собирается со всех сессий
+        self._own_tracer = self.config.get('tracer') is None
+        if self._own_tracer:
+            self.config['tracer'] = Tracer(
+                enabled=config.get('tracing', True),
+                path=config.get('trace_file')
+            )
+        self.tracer = self.config['tracer']
+        self.size = size or int(os.getenv('SE_NODE_MAX_SESSIONS', '5'))
+        self.login = login
+        self.replaced = 0
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._agents: List[AvitoAgent] = []
+
+        # Сессии открываются параллельно: каждая занимает несколько секунд
+        try:
+            with ThreadPoolExecutor(max_workers=self.size) as executor:
+                for agent in executor.map(lambda _: self._create_agent(), range(self.size)):
+                    self._idle.put(agent)
+        except BaseException:
+            # Пул не достанется вызывающему коду, поэтому уже открытые
+            # сессии Grid закрываем здесь (выход из with дождался всех)
+            self.close()
+            raise
+
+    def _create_agent(self) -> AvitoAgent:
+        """Создание и авторизация новой сессии"""
+        agent = AvitoAgent(self.config)
+        try:
+            if self.login and not agent.login():
+                raise RuntimeError('Не удалось авторизоваться в новой сессии')
+        except BaseException:
+            agent.close()
+            raise
+        with self._lock:
+            self._agents.append(agent)
+        return agent
+
+    def _replace(self, agent: AvitoAgent) -> AvitoAgent:
+        """Замена неотвечающей сессии"""
+        logging.warning('Сессия браузера не отвечает, создаем новую')
+        with self._lock:
+            if agent in self._agents:
+                self._agents.remove(agent)
+        agent.close()
+        self.replaced += 1
+        return self._create_agent()
+
+    @contextmanager
+    def session(self, timeout: Optional[float] = None) -> Iterator[AvitoAgent]:
+        """
+        Выдача проверенной сессии на время работы
+
+        Args:
+            timeout (float): Сколько ждать свободную сессию
+        """
+        agent = self._idle.get(timeout=timeout)
+        try:
+            if not agent.is_alive():
+                agent = self._replace(agent)
+            yield agent
+        finally:
+            self._idle.put(agent)
+
+    def _publish(self, listing: Dict) -> bool:
+        try:
+            with self.session() as agent:
+                return agent.create_listing(listing)
+        except Exception as e:
+            logging.error(f"Ошибка при публикации объявления: {str(e)}")
+            return False
+
+    def create_listings(self, listings: Iterable[Dict]) -> List[bool]:
+        """
+        Параллельная публикация объявлений во всех сессиях пула
+
+        Args:
+            listings (Iterable[Dict]): Данные объявлений для create_listing
+
+        Returns:
+            List[bool]: Результаты в порядке входных объявлений
+        """
+        listings = list(listings)
+        # Картинки всей пачки качаются заранее, параллельно с работой браузеров
+        prefetcher = ImagePrefetcher.for_config(self.config)
+        if prefetcher:
+            prefetcher.prefetch_listings(listings)
+        with ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='avito-session') as executor:
+            return list(executor.map(self._publish, listings))
+
+    def health_check(self) -> Dict[str, int]:
+        """
+        Проверка и замена неотвечающих свободных сессий
+
+        Returns:
+            Dict[str, int]: Количество живых и замененных сессий
+        """
+        alive = replaced = 0
+        for _ in range(self._idle.qsize()):
+            try:
+                agent = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                if agent.is_alive():
+                    alive += 1
+                else:
+                    agent = self._replace(agent)
+                    replaced += 1
+            finally:
+                self._idle.put(agent)
+        return {'alive': alive, 'replaced': replaced}
+
+    def close(self):
+        """Закрытие всех сессий"""
+        with self._lock:
+            agents, self._agents = self._agents, []
+        for agent in agents:
+            agent.close()
+        if self._own_tracer:
+            self.tracer.close()
+
+    def __enter__(self) -> 'SessionPool':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
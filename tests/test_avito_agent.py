@@ -3,7 +3,7 @@ from unittest.mock import patch, MagicMock
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from avito_agent import AvitoAgent
+from avito_agent import AvitoAgent, IMAGE_PREVIEW_LOCATOR, PROFILE_LOCATOR
 
 class TestAvitoAgent(unittest.TestCase):
     def setUp(self):
@@ -97,5 +97,436 @@ class TestAvitoAgent(unittest.TestCase):
         self.assertEqual(self.agent.user_agent, 'Mozilla/5.0 Test Agent')
         self.assertIn('--user-agent=Mozilla/5.0 Test Agent', options.arguments)
 
+class TestAvitoAgentWaits(unittest.TestCase):
+    def setUp(self):
+        """Подготовка агента с замоканным драйвером"""
+        patcher = patch('avito_agent.webdriver.Remote')
+        self.mock_remote = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.driver = self.mock_remote.return_value
+        self.agent = AvitoAgent({
+            'username': 'test_user',
+            'password': 'test_pass',
+            'session_cache': False,
+            'login_timeout': 0.3,
+            'upload_timeout': 0.3,
+            'publish_timeout': 0.3,
+            'poll_frequency': 0.01
+        })
+
+    def _fake_uploads(self):
+        """Каждая отправка файла выбирает его в поле и добавляет превью на страницу"""
+        previews = []
+        image_input = MagicMock()
+        image_input.send_keys.side_effect = lambda path: previews.append(path)
+        image_input.get_attribute.side_effect = lambda name: previews[-1] if previews else ''
+        self.driver.find_element.return_value = image_input
+        self.driver.find_elements.side_effect = lambda *args: list(previews)
+        return previews
+
+    def _submit_login(self, page_elements):
+        """Форма входа исчезает после отправки, на странице остаются page_elements"""
+        from selenium.common.exceptions import StaleElementReferenceException
+
+        form = MagicMock()
+        form.is_enabled.side_effect = StaleElementReferenceException()
+        self.driver.find_element.side_effect = [form, MagicMock(), MagicMock()]
+        self.driver.find_elements.side_effect = lambda by, value: page_elements.get((by, value), [])
+        self.driver.current_url = 'https://www.avito.ru/profile'
+
+    def test_login_waits_for_profile(self):
+        """Тест ожидания успешной авторизации вместо паузы"""
+        self._submit_login({})
+
+        self.assertTrue(self.agent.login())
+        self.assertEqual([step for step, _ in self.agent.wait_timings], ['login_form', 'login_submit'])
+        self.driver.find_elements.assert_called_with(By.NAME, 'login')
+
+    def test_login_form_still_shown_on_profile_url(self):
+        """Тест: адрес /profile с формой входа не считается входом"""
+        self._submit_login({(By.NAME, 'login'): [MagicMock()]})
+
+        self.assertFalse(self.agent.login())
+        self.assertFalse(self.agent.logged_in)
+
+    def test_login_with_profile_locator(self):
+        """Тест: заданный маркер профиля тоже должен появиться"""
+        self.agent.profile_locator = PROFILE_LOCATOR
+        self._submit_login({})
+
+        self.assertFalse(self.agent.login())
+
+        self.agent.wait_timings.clear()
+        self._submit_login({PROFILE_LOCATOR: [MagicMock()]})
+
+        self.assertTrue(self.agent.login())
+
+    def test_login_timeout(self):
+        """Тест неудачной авторизации по таймауту"""
+        self.driver.current_url = 'https://www.avito.ru/login'
+
+        self.assertFalse(self.agent.login())
+        step, elapsed = self.agent.wait_timings[-1]
+        self.assertEqual(step, 'login_submit')
+        self.assertGreaterEqual(elapsed, 0.3)
+
+    def test_create_listing_waits_for_each_image_and_publish(self):
+        """Тест ожидания загрузки изображений и подтверждения публикации"""
+        self._fake_uploads()
+        urls = iter(['https://www.avito.ru/additem', 'https://www.avito.ru/items/1'])
+        type(self.driver).current_url = property(lambda driver: next(urls, 'https://www.avito.ru/items/1'))
+
+        result = self.agent.create_listing({
+            'title': 'Test Item',
+            'description': 'Test Description',
+            'price': '1000',
+            'category': 'Electronics',
+            'images': ['test1.jpg', 'test2.jpg']
+        })
+
+        self.assertTrue(result)
+        steps = [step for step, _ in self.agent.wait_timings]
+        self.assertEqual(steps, ['listing_form', 'image_upload', 'image_upload', 'publish'])
+        summary = self.agent.step_summary()
+        self.assertEqual(summary['image_upload']['count'], 2)
+        self.assertLess(summary['publish']['max'], 0.3)
+
+    def test_create_listing_waits_for_image_previews(self):
+        """Тест ожидания превью, если маркер превью задан"""
+        previews = self._fake_uploads()
+        self.agent.image_preview_locator = IMAGE_PREVIEW_LOCATOR
+        image_input = self.driver.find_element.return_value
+        # Сайт показывает превью только первого файла
+        image_input.send_keys.side_effect = lambda text: previews.append(text) if text == 'test1.jpg' else None
+        self.driver.current_url = 'https://www.avito.ru/additem'
+
+        result = self.agent.create_listing({
+            'title': 'Test Item',
+            'description': 'Test Description',
+            'price': '1000',
+            'category': 'Electronics',
+            'images': ['test1.jpg', 'test2.jpg']
+        })
+
+        self.assertFalse(result)
+        self.assertEqual([step for step, _ in self.agent.wait_timings], ['listing_form', 'image_upload', 'image_upload'])
+        self.driver.find_elements.assert_called_with(*IMAGE_PREVIEW_LOCATOR)
+
+    def test_create_listing_published_when_form_is_replaced(self):
+        """Тест подтверждения публикации по перерисовке формы без смены адреса"""
+        from selenium.common.exceptions import StaleElementReferenceException
+
+        title_input = MagicMock()
+        self.driver.find_element.return_value = title_input
+        self.driver.current_url = 'https://www.avito.ru/additem'
+        # Форма пропадает после нажатия кнопки публикации
+        title_input.click.side_effect = lambda: setattr(
+            title_input.is_enabled, 'side_effect', StaleElementReferenceException()
+        )
+
+        result = self.agent.create_listing({
+            'title': 'Test Item',
+            'description': 'Test Description',
+            'price': '1000',
+            'category': 'Electronics'
+        })
+
+        self.assertTrue(result)
+        self.assertLess(self.agent.step_summary()['publish']['max'], 0.3)
+
+    def test_create_listing_uploads_processed_images(self):
+        """Тест загрузки изображений после обработки"""
+        self._fake_uploads()
+        self.agent.image_pipeline = MagicMock()
+        self.agent.image_pipeline.process.return_value = ['/cache/1.jpg']
+        self.driver.current_url = 'https://www.avito.ru/additem'
+        self.agent.publish_timeout = 0
+
+        self.agent.create_listing({
+            'title': 'Test Item',
+            'description': 'Test Description',
+            'price': '1000',
+            'category': 'Electronics',
+            'images': ['raw.png']
+        })
+
+        self.agent.image_pipeline.process.assert_called_once_with(['raw.png'])
+        self.driver.find_element.return_value.send_keys.assert_any_call('/cache/1.jpg')
+
+    def test_create_listing_publish_timeout(self):
+        """Тест неудачной публикации без подтверждения"""
+        from selenium.common.exceptions import NoSuchElementException
+
+        def find_element(by, value):
+            if by == By.CSS_SELECTOR:
+                raise NoSuchElementException()
+            return MagicMock()
+
+        self.driver.find_element.side_effect = find_element
+        self.driver.current_url = 'https://www.avito.ru/additem'
+
+        result = self.agent.create_listing({
+            'title': 'Test Item',
+            'description': 'Test Description',
+            'price': '1000',
+            'category': 'Electronics'
+        })
+
+        self.assertFalse(result)
+        self.assertEqual(self.agent.wait_timings[-1][0], 'publish')
+
+    def test_create_listing_rejects_invalid_data(self):
+        """Тест: объявление с неверными типами не открывает форму"""
+        result = self.agent.create_listing({
+            'title': 'Test Item',
+            'description': 'Test Description',
+            'price': 'договорная',
+            'category': 'Electronics'
+        })
+
+        self.assertFalse(result)
+        self.driver.get.assert_not_called()
+
+    def test_local_headless_driver(self):
+        """Тест локального headless Chrome вместо Selenium Grid"""
+        self.mock_remote.reset_mock()
+        with patch('avito_agent.webdriver.Chrome') as mock_chrome:
+            agent = AvitoAgent({
+                'username': 'test_user',
+                'password': 'test_pass',
+                'session_cache': False,
+                'local_driver': True,
+                'headless': True
+            })
+
+        self.assertIs(agent.driver, mock_chrome.return_value)
+        self.assertIn('--headless=new', mock_chrome.call_args.kwargs['options'].arguments)
+        self.mock_remote.assert_not_called()
+
+class TestAvitoAgentTracing(unittest.TestCase):
+    def setUp(self):
+        """Подготовка агента с замоканным драйвером"""
+        patcher = patch('avito_agent.webdriver.Remote')
+        self.mock_remote = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.driver = self.mock_remote.return_value
+        self.config = {
+            'username': 'test_user',
+            'password': 'test_pass',
+            'session_cache': False,
+            'prefetch_images': False,
+            'process_images': False,
+            'publish_timeout': 0.3,
+            'poll_frequency': 0.01
+        }
+
+    def _create_listing(self, agent):
+        urls = iter(['https://www.avito.ru/additem', 'https://www.avito.ru/items/1'])
+        type(self.driver).current_url = property(lambda driver: next(urls, 'https://www.avito.ru/items/1'))
+        return agent.create_listing({
+            'title': 'Test Item',
+            'description': 'Test Description',
+            'price': '1000',
+            'category': 'Electronics'
+        })
+
+    def test_create_listing_spans(self):
+        """Тест span'ов по шагам публикации"""
+        agent = AvitoAgent(self.config)
+
+        self.assertTrue(self._create_listing(agent))
+        steps = [record['span'] for record in agent.tracer.spans]
+        self.assertEqual(steps, [
+            'setup_driver/start_session',
+            'setup_driver/restore_session',
+            'setup_driver',
+            'create_listing/open_form/listing_form',
+            'create_listing/open_form',
+            'create_listing/fill_form',
+            'create_listing/submit/publish',
+            'create_listing/submit',
+            'create_listing'
+        ])
+        self.assertEqual(agent.tracer.summary()['create_listing']['errors'], 0)
+
+    def test_failed_listing_is_marked(self):
+        """Тест отметки неудачной публикации"""
+        agent = AvitoAgent(self.config)
+        self.driver.get.side_effect = Exception('grid unavailable')
+
+        self.assertFalse(agent.create_listing({
+            'title': 'Test Item', 'description': 'Test Description', 'price': 1000, 'category': 'Electronics'
+        }))
+        summary = agent.tracer.summary()
+        self.assertEqual(summary['create_listing']['errors'], 1)
+        self.assertEqual(summary['create_listing/open_form']['errors'], 1)
+
+    def test_network_timings_from_performance_log(self):
+        """Тест сетевых запросов шага из performance-лога"""
+        import json
+        self.config['trace_network'] = True
+        self.driver.get_log.return_value = [
+            {'message': json.dumps({'message': {
+                'method': 'Network.requestWillBeSent',
+                'params': {'requestId': '1', 'timestamp': 1.0, 'request': {'url': 'https://www.avito.ru/additem'}}
+            }})},
+            {'message': json.dumps({'message': {
+                'method': 'Network.loadingFinished',
+                'params': {'requestId': '1', 'timestamp': 1.5, 'encodedDataLength': 2048}
+            }})}
+        ]
+        agent = AvitoAgent(self.config)
+
+        self._create_listing(agent)
+        options = self.mock_remote.call_args.kwargs['options']
+        self.assertEqual(options.capabilities['goog:loggingPrefs'], {'performance': 'ALL'})
+        span = next(record for record in agent.tracer.spans if record['span'] == 'create_listing/open_form')
+        self.assertEqual(span['network_requests'], 1)
+        self.assertEqual(span['network_bytes'], 2048)
+
+    def test_tracing_disabled(self):
+        """Тест выключения трассировки"""
+        self.config['tracing'] = False
+        self.config['trace_network'] = True
+        agent = AvitoAgent(self.config)
+
+        self.assertTrue(self._create_listing(agent))
+        self.assertEqual(len(agent.tracer.spans), 0)
+        self.driver.get_log.assert_not_called()
+
+class TestAvitoAgentSessionCache(unittest.TestCase):
+    def setUp(self):
+        """Подготовка агента с кешем сессий во временной директории"""
+        import tempfile
+        from session_cache import SessionCache
+
+        self.session_dir = tempfile.mkdtemp()
+        self.cache = SessionCache(self.session_dir)
+        patcher = patch('avito_agent.webdriver.Remote')
+        self.mock_remote = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.driver = self.mock_remote.return_value
+        self.config = {
+            'username': 'test_user',
+            'password': 'test_pass',
+            'session_cache': True,
+            'session_dir': self.session_dir,
+            'login_timeout': 0.3,
+            'poll_frequency': 0.01
+        }
+
+    def tearDown(self):
+        """Удаление временной директории"""
+        import shutil
+        shutil.rmtree(self.session_dir, ignore_errors=True)
+
+    def _save_state(self, expiry):
+        self.driver.get_cookies.return_value = [
+            {'name': 'sessid', 'value': 'abc', 'domain': '.avito.ru', 'expiry': expiry}
+        ]
+        self.driver.execute_script.return_value = {'token': '1'}
+        self.cache.save(self.driver, 'test_user')
+        self.driver.reset_mock()
+
+    def test_warm_start_skips_login(self):
+        """Тест восстановления сессии без формы входа"""
+        import time
+        self._save_state(time.time() + 3600)
+        self.driver.current_url = 'https://www.avito.ru/profile'
+        # На странице есть элемент профиля и нет формы входа
+        self.driver.find_elements.side_effect = lambda by, value: (
+            [MagicMock()] if (by, value) == PROFILE_LOCATOR else []
+        )
+
+        agent = AvitoAgent(self.config)
+
+        self.assertTrue(agent.logged_in)
+        self.assertTrue(agent.login())
+        # Cookies поставлены через CDP, сессию проверила одна загрузка профиля
+        cookies = self.driver.execute_cdp_cmd.call_args.args[1]['cookies']
+        self.assertEqual([(c['name'], c['domain']) for c in cookies], [('sessid', '.avito.ru')])
+        self.assertIn('expires', cookies[0])
+        self.driver.add_cookie.assert_not_called()
+        self.driver.find_element.assert_not_called()
+        self.driver.get.assert_called_once_with('https://www.avito.ru/profile')
+        self.driver.execute_script.assert_called_once()
+
+    def test_warm_start_without_cdp(self):
+        """Тест восстановления сессии через страницу домена, если CDP недоступен"""
+        import time
+        self._save_state(time.time() + 3600)
+        self.driver.execute_cdp_cmd.side_effect = Exception('CDP is not supported')
+        self.driver.current_url = 'https://www.avito.ru/profile'
+        self.driver.find_elements.side_effect = lambda by, value: (
+            [MagicMock()] if (by, value) == PROFILE_LOCATOR else []
+        )
+
+        agent = AvitoAgent(self.config)
+
+        self.assertTrue(agent.logged_in)
+        self.driver.add_cookie.assert_called_once()
+        self.assertEqual(
+            [call.args[0] for call in self.driver.get.call_args_list],
+            ['https://www.avito.ru/robots.txt', 'https://www.avito.ru/profile']
+        )
+
+    def test_session_cache_is_opt_in(self):
+        """Тест: без session_cache сессии не читаются и не сохраняются"""
+        import time
+        self._save_state(time.time() + 3600)
+        del self.config['session_cache']
+
+        agent = AvitoAgent(self.config)
+
+        self.assertIsNone(agent.session_cache)
+        self.assertFalse(agent.logged_in)
+        self.driver.get.assert_not_called()
+
+    def test_expired_session_falls_back_to_login(self):
+        """Тест полного входа при просроченных cookies"""
+        import time
+        self._save_state(time.time() - 1)
+
+        agent = AvitoAgent(self.config)
+
+        self.assertFalse(agent.logged_in)
+        self.driver.get.assert_not_called()
+
+    def test_rejected_session_is_cleared(self):
+        """Тест очистки кеша, если сайт не принял сессию"""
+        import os
+        import time
+        self._save_state(time.time() + 3600)
+        # Сайт показал форму входа по адресу профиля
+        self.driver.current_url = 'https://www.avito.ru/profile'
+        self.driver.find_elements.side_effect = lambda by, value: (
+            [] if (by, value) == PROFILE_LOCATOR else [MagicMock()]
+        )
+
+        agent = AvitoAgent(self.config)
+
+        self.assertFalse(agent.logged_in)
+        self.assertFalse(os.path.exists(self.cache.path('test_user')))
+        self.driver.delete_all_cookies.assert_called_once()
+
+    def test_login_saves_session(self):
+        """Тест сохранения сессии после успешного входа"""
+        import os
+        from selenium.common.exceptions import StaleElementReferenceException
+
+        agent = AvitoAgent(self.config)
+        form = MagicMock()
+        form.is_enabled.side_effect = StaleElementReferenceException()
+        self.driver.find_element.side_effect = [form, MagicMock(), MagicMock()]
+        self.driver.find_elements.return_value = []
+        self.driver.current_url = 'https://www.avito.ru/profile'
+        self.driver.get_cookies.return_value = [{'name': 'sessid', 'value': 'abc'}]
+        self.driver.execute_script.return_value = {}
+
+        self.assertTrue(agent.login())
+        path = self.cache.path('test_user')
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1,92 @@
+import unittest
+import requests
+from fake_avito import FakeAvitoServer, FakeAvitoConfig
+
+def no_latency(**kwargs) -> FakeAvitoConfig:
+    return FakeAvitoConfig(page_latency=0, upload_latency=0, publish_latency=0, jitter=0, seed=1, **kwargs)
+
+class TestFakeAvito(unittest.TestCase):
+    def start(self, config: FakeAvitoConfig) -> str:
+        server = FakeAvitoServer(config)
+        self.addCleanup(server.stop)
+        self.server = server
+        return server.start()
+
+    def login(self, session: requests.Session, url: str, password: str = 'pass') -> requests.Response:
+        return session.post(f'{url}/login', data={'login': 'user', 'password': password})
+
+    def test_forms_use_agent_element_names(self):
+        """Тест имен элементов, на которые опирается агент"""
+        url = self.start(no_latency())
+        session = requests.Session()
+
+        page = session.get(f'{url}/profile').text
+        for name in ('name="login"', 'name="password"', 'class="submit-button"'):
+            self.assertIn(name, page)
+
+        response = self.login(session, url)
+        self.assertTrue(response.url.endswith('/profile'))
+        self.assertNotIn('name="login"', response.text)
+
+        page = session.get(f'{url}/additem').text
+        for name in ('name="title"', 'name="description"', 'name="price"', 'name="category"', 'name="image"'):
+            self.assertIn(name, page)
+
+    def test_publish_flow(self):
+        """Тест загрузки фото и публикации объявления"""
+        url = self.start(no_latency())
+        session = requests.Session()
+        self.login(session, url)
+
+        upload = session.post(f'{url}/upload', files={'image': ('1.jpg', b'data')}).json()
+        self.assertEqual(upload['size'], 4)
+
+        response = session.post(f'{url}/additem', data={
+            'title': 'Товар', 'description': 'Описание', 'price': '100', 'images': str(upload['id'])
+        })
+        self.assertIn('/items/1', response.url)
+        self.assertIn('data-marker="publish-success"', response.text)
+        self.assertEqual(self.server.stats['listings'], 1)
+        self.assertEqual(self.server.site.state.items[1]['images'], [str(upload['id'])])
+
+    def test_additem_requires_login(self):
+        """Тест перенаправления на вход без сессии"""
+        url = self.start(no_latency())
+
+        response = requests.get(f'{url}/additem')
+        self.assertTrue(response.url.endswith('/profile'))
+        self.assertIn('name="login"', response.text)
+
+    def test_wrong_credentials(self):
+        """Тест отказа во входе с неверным паролем"""
+        url = self.start(no_latency(username='user', password='pass'))
+        session = requests.Session()
+
+        response = self.login(session, url, password='wrong')
+        self.assertTrue(response.url.endswith('/login'))
+        self.assertIn('name="login"', response.text)
+        self.assertEqual(self.server.stats['login_failures'], 1)
+
+    def test_failure_injection(self):
+        """Тест отказов публикации и ошибок сервера"""
+        url = self.start(no_latency(publish_failure_rate=1.0))
+        session = requests.Session()
+        self.login(session, url)
+
+        response = session.post(f'{url}/additem', data={'title': 'Товар', 'description': 'Описание', 'price': '1'})
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.url.endswith('/additem'))
+        self.assertEqual(self.server.stats['publish_failures'], 1)
+
+        self.server.site.config.error_rate = 1.0
+        self.assertEqual(requests.get(f'{url}/profile').status_code, 500)
+
+    def test_latency(self):
+        """Тест задержки страниц"""
+        url = self.start(FakeAvitoConfig(page_latency=0.2, jitter=0))
+
+        response = requests.get(f'{url}/robots.txt')
+        self.assertGreaterEqual(response.elapsed.total_seconds(), 0.2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from image_prefetch import ImagePrefetcher
+
+class _ImageHandler(BaseHTTPRequestHandler):
+    """Отдает одинаковое содержимое с ETag и считает запросы"""
+    etag = '"v1"'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, self.headers.get('If-None-Match')))
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            time.sleep(server.delay)
+            if self.headers.get('If-None-Match') == self.etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = f'image {self.path}'.encode('utf-8')
+            self.send_response(200)
+            self.send_header('ETag', self.etag)
+            if server.send_length:
+                self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+class TestImagePrefetcher(unittest.TestCase):
+    def setUp(self):
+        """Запуск локального HTTP-сервера с изображениями"""
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _ImageHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.active = 0
+        self.server.max_active = 0
+        self.server.delay = 0
+        self.server.send_length = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}'
+        self.cache_dir = tempfile.mkdtemp()
+        self.prefetcher = ImagePrefetcher(self.cache_dir, workers=8, per_host=2)
+
+    def tearDown(self):
+        """Остановка сервера и очистка кеша"""
+        self.prefetcher.close()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_localize_downloads_remote_images(self):
+        """Тест скачивания ссылок и пропуска локальных путей"""
+        url = f'{self.base_url}/1.jpg'
+
+        paths = self.prefetcher.localize([url, '/local/2.jpg'])
+
+        self.assertEqual(paths[1], '/local/2.jpg')
+        self.assertTrue(paths[0].endswith('.jpg'))
+        with open(paths[0], 'rb') as f:
+            self.assertEqual(f.read(), b'image /1.jpg')
+
+    def test_revalidation_with_etag(self):
+        """Тест повторной проверки кеша через If-None-Match"""
+        url = f'{self.base_url}/1.jpg'
+
+        first = self.prefetcher.get(url)
+        second = self.prefetcher.get(url)
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.server.requests, [('/1.jpg', None), ('/1.jpg', '"v1"')])
+        self.assertEqual((self.prefetcher.downloaded, self.prefetcher.revalidated), (1, 1))
+
+    def test_per_host_limit(self):
+        """Тест ограничения одновременных загрузок с одного хоста"""
+        self.server.delay = 0.05
+        urls = [f'{self.base_url}/{i}.jpg' for i in range(8)]
+
+        self.prefetcher.prefetch_listings([{'images': urls[:4]}, {'images': urls[4:]}])
+        paths = [self.prefetcher.get(url) for url in urls]
+
+        self.assertEqual(len(set(paths)), 8)
+        self.assertTrue(all(os.path.exists(path) for path in paths))
+        self.assertEqual(self.server.max_active, 2)
+        self.assertEqual(len(self.server.requests), 8)
+        self.assertEqual(self.prefetcher.downloaded, 8)
+
+    def test_finished_prefetches_are_evicted(self):
+        """Тест вытеснения загрузок, результат которых так и не запросили"""
+        prefetcher = ImagePrefetcher(self.cache_dir, workers=1, max_finished=2)
+        self.addCleanup(prefetcher.close)
+        urls = [f'{self.base_url}/{i}.jpg' for i in range(5)]
+
+        prefetcher.prefetch(urls)
+        deadline = time.monotonic() + 5
+        while len(prefetcher._futures) > 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(list(prefetcher._futures), urls[3:])
+        # Вытесненная ссылка перепроверяется по кешу на диске
+        self.assertTrue(os.path.exists(prefetcher.get(urls[0])))
+        self.assertEqual(self.server.requests[-1], ('/0.jpg', '"v1"'))
+
+    def test_size_limit(self):
+        """Тест отказа от файлов больше max_bytes"""
+        prefetcher = ImagePrefetcher(self.cache_dir, workers=1, max_bytes=8)
+        self.addCleanup(prefetcher.close)
+
+        with self.assertRaises(ValueError):
+            prefetcher.get(f'{self.base_url}/1.jpg')
+        # Без Content-Length размер проверяется по мере чтения
+        self.server.send_length = False
+        with self.assertRaises(ValueError):
+            prefetcher.get(f'{self.base_url}/2.jpg')
+
+        self.assertEqual(os.listdir(self.cache_dir), [])
+        self.assertEqual(prefetcher.downloaded, 0)
+
+    def test_host_limit_is_shared_between_threads(self):
+        """Тест создания одного семафора на хост при одновременных запросах"""
+        limits = []
+        barrier = threading.Barrier(8)
+
+        def worker():
+            barrier.wait()
+            limits.append(self.prefetcher._host_limit('example.com'))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len({id(limit) for limit in limits}), 1)
+
+    def test_get_resubmits_evicted_prefetch(self):
+        """Тест get() для ссылки, вытесненной после prefetch()"""
+        url = f'{self.base_url}/1.jpg'
+        self.prefetcher.prefetch([url])
+        with self.prefetcher._lock:
+            self.prefetcher._futures.clear()
+
+        path = self.prefetcher.get(url)
+
+        self.assertTrue(os.path.exists(path))
+
+    def test_disk_cache_is_evicted(self):
+        """Тест ограничения размера кеша на диске"""
+        prefetcher = ImagePrefetcher(self.cache_dir, workers=1, max_cache_bytes=30)
+        self.addCleanup(prefetcher.close)
+        urls = [f'{self.base_url}/{i}.jpg' for i in range(5)]
+
+        paths = []
+        for url in urls:
+            paths.append(prefetcher.get(url))
+            # mtime у разных файлов должен различаться
+            time.sleep(0.02)
+
+        # Каждый файл 12 байт: в кеше остаются два последних
+        self.assertEqual([os.path.exists(path) for path in paths], [False, False, False, True, True])
+        self.assertFalse(os.path.exists(paths[0] + '.meta.json'))
+        self.assertTrue(os.path.exists(paths[-1] + '.meta.json'))
+
+if __name__ == '__main__':
+    unittest.main()
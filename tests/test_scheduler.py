@@ -0,0 +1,171 @@
+import time
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+from scheduler import AccountScheduler, TokenBucket
+
+class TestTokenBucket(unittest.TestCase):
+    def test_refill(self):
+        """Тест пополнения токенов со временем"""
+        now = [0.0]
+        bucket = TokenBucket(rate=0.5, capacity=2, clock=lambda: now[0])
+
+        self.assertTrue(bucket.consume())
+        self.assertTrue(bucket.consume())
+        self.assertFalse(bucket.consume())
+        self.assertEqual(bucket.wait_time(), 2.0)
+
+        now[0] = 2.0
+        self.assertTrue(bucket.consume())
+        now[0] = 100.0
+        self.assertEqual(bucket.tokens, 0)
+        self.assertEqual(bucket.wait_time(), 0.0)
+
+    def test_unlimited(self):
+        """Тест ведра без ограничения"""
+        bucket = TokenBucket(rate=0)
+        self.assertTrue(all(bucket.consume() for _ in range(100)))
+
+class TestAccountScheduler(unittest.TestCase):
+    def setUp(self):
+        """Замоканные агенты, записывающие время публикаций по аккаунтам"""
+        self.publish_times = {}
+        self.live = 0
+        self.max_live = 0
+        self.lock = threading.Lock()
+        self.login_ok = {}
+
+        def make_agent(config):
+            username = config['username']
+            with self.lock:
+                self.live += 1
+                self.max_live = max(self.max_live, self.live)
+
+            def create_listing(listing):
+                with self.lock:
+                    self.publish_times.setdefault(username, []).append(time.monotonic())
+                time.sleep(0.01)
+                return True
+
+            def close():
+                with self.lock:
+                    self.live -= 1
+
+            return MagicMock(
+                login=MagicMock(return_value=self.login_ok.get(username, True)),
+                is_alive=MagicMock(return_value=True),
+                create_listing=MagicMock(side_effect=create_listing),
+                close=MagicMock(side_effect=close)
+            )
+
+        patcher = patch('scheduler.AvitoAgent', side_effect=make_agent)
+        self.mock_agent_cls = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.config = {'prefetch_images': False, 'tracing': False}
+
+    def accounts(self, count):
+        return [{'username': f'user{n}', 'password': 'pass'} for n in range(count)]
+
+    def listings(self, count):
+        return [{'title': f'Item {n}'} for n in range(count)]
+
+    def test_interleaves_accounts_and_respects_delay(self):
+        """Тест распределения по аккаунтам с соблюдением интервала"""
+        scheduler = AccountScheduler(
+            self.accounts(3), self.config, slots=2,
+            delay_between_listings=0.2, delay_between_actions=0
+        )
+        with scheduler:
+            results = scheduler.run(self.listings(6))
+
+        self.assertEqual(results, [True] * 6)
+        self.assertEqual({name: len(times) for name, times in self.publish_times.items()},
+                         {'user0': 2, 'user1': 2, 'user2': 2})
+        for times in self.publish_times.values():
+            self.assertGreaterEqual(times[1] - times[0], 0.19)
+        self.assertLessEqual(self.max_live, 2)
+        self.assertEqual(scheduler.stats()['user0']['published'], 2)
+
+    def test_throughput_grows_with_accounts(self):
+        """Тест роста общего темпа с числом аккаунтов"""
+        def elapsed(accounts):
+            scheduler = AccountScheduler(
+                self.accounts(accounts), self.config, slots=4,
+                delay_between_listings=0.1, delay_between_actions=0
+            )
+            start = time.monotonic()
+            with scheduler:
+                scheduler.run(self.listings(8))
+            return time.monotonic() - start
+
+        self.assertGreater(elapsed(1), 0.65)
+        self.assertLess(elapsed(4), 0.3)
+
+    def test_action_delay(self):
+        """Тест паузы между действиями одного аккаунта"""
+        scheduler = AccountScheduler(
+            self.accounts(1), self.config, slots=1,
+            delay_between_listings=0, delay_between_actions=0.1
+        )
+        start = time.monotonic()
+        with scheduler:
+            scheduler.run(self.listings(2))
+
+        times = self.publish_times['user0']
+        # Пауза после входа и между публикациями
+        self.assertGreaterEqual(times[0] - start, 0.1)
+        self.assertGreaterEqual(times[1] - times[0], 0.1)
+
+    def test_failed_login_disables_account(self):
+        """Тест отключения аккаунта после неудачных входов"""
+        self.login_ok['user0'] = False
+        scheduler = AccountScheduler(
+            self.accounts(2), self.config, slots=2,
+            delay_between_listings=0, delay_between_actions=0, max_login_failures=1
+        )
+        with scheduler:
+            results = scheduler.run(self.listings(3))
+
+        self.assertEqual(results, [True] * 3)
+        self.assertTrue(scheduler.stats()['user0']['disabled'])
+        self.assertEqual(len(self.publish_times['user1']), 3)
+
+    def test_all_accounts_disabled(self):
+        """Тест остановки, когда все аккаунты отключены"""
+        self.login_ok['user0'] = False
+        scheduler = AccountScheduler(
+            self.accounts(1), self.config, slots=1,
+            delay_between_listings=0, delay_between_actions=0, max_login_failures=2
+        )
+        with scheduler:
+            results = scheduler.run(self.listings(2))
+
+        self.assertEqual(results, [None, None])
+
+    def test_reuses_open_session(self):
+        """Тест публикации с аккаунта с открытой сессией, если остальные не быстрее"""
+        scheduler = AccountScheduler(
+            self.accounts(3), self.config, slots=1,
+            delay_between_listings=0, delay_between_actions=0
+        )
+        with scheduler:
+            scheduler.run(self.listings(3))
+
+        self.assertEqual(self.mock_agent_cls.call_count, 1)
+
+    def test_sessions_limited_by_slots(self):
+        """Тест закрытия сессии свободного аккаунта, когда слоты заняты"""
+        scheduler = AccountScheduler(
+            self.accounts(3), self.config, slots=1,
+            delay_between_listings=0.05, delay_between_actions=0
+        )
+        with scheduler:
+            scheduler.run(self.listings(3))
+            self.assertEqual(len(self.publish_times), 3)
+            self.assertEqual(self.live, 1)
+
+        self.assertEqual(self.max_live, 1)
+        self.assertEqual(self.live, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+from session_pool import SessionPool
+
+class TestSessionPool(unittest.TestCase):
+    def setUp(self):
+        """Подготовка перед каждым тестом"""
+        self.config = {
+            'username': 'test_user',
+            'password': 'test_pass',
+            'selenium_hub_url': 'http://localhost:4444/wd/hub'
+        }
+        patcher = patch('session_pool.AvitoAgent')
+        self.mock_agent_cls = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_agent_cls.side_effect = lambda config: MagicMock(
+            login=MagicMock(return_value=True),
+            is_alive=MagicMock(return_value=True),
+            create_listing=MagicMock(return_value=True)
+        )
+
+    def test_pool_opens_logged_in_sessions(self):
+        """Тест создания авторизованных сессий"""
+        pool = SessionPool(self.config, size=3)
+
+        self.assertEqual(self.mock_agent_cls.call_count, 3)
+        for agent in pool._agents:
+            agent.login.assert_called_once()
+
+    def test_create_listings_uses_all_sessions(self):
+        """Тест параллельной публикации во всех сессиях"""
+        pool = SessionPool(self.config, size=3)
+        barrier = threading.Barrier(3, timeout=5)
+        used = set()
+
+        for agent in pool._agents:
+            def publish(listing, agent=agent):
+                used.add(id(agent))
+                barrier.wait()
+                return listing['title'] != 'bad'
+            agent.create_listing.side_effect = publish
+
+        listings = [{'title': 'ok'}, {'title': 'bad'}, {'title': 'ok'}]
+        results = pool.create_listings(listings)
+
+        self.assertEqual(results, [True, False, True])
+        self.assertEqual(len(used), 3)
+
+    def test_dead_session_is_replaced(self):
+        """Тест замены неотвечающей сессии"""
+        pool = SessionPool(self.config, size=1)
+        dead = pool._agents[0]
+        dead.is_alive.return_value = False
+
+        results = pool.create_listings([{'title': 'ok'}])
+
+        self.assertEqual(results, [True])
+        dead.close.assert_called_once()
+        dead.create_listing.assert_not_called()
+        self.assertEqual(pool.replaced, 1)
+        self.assertIsNot(pool._agents[0], dead)
+
+    def test_health_check(self):
+        """Тест проверки свободных сессий"""
+        pool = SessionPool(self.config, size=2)
+        pool._agents[1].is_alive.return_value = False
+
+        self.assertEqual(pool.health_check(), {'alive': 1, 'replaced': 1})
+
+    def test_login_failure(self):
+        """Тест ошибки авторизации при создании сессии"""
+        self.mock_agent_cls.side_effect = lambda config: MagicMock(login=MagicMock(return_value=False))
+
+        with self.assertRaises(RuntimeError):
+            SessionPool(self.config, size=1)
+
+    def test_partial_login_failure_closes_opened_sessions(self):
+        """Тест закрытия уже открытых сессий, если одна не авторизовалась"""
+        agents = []
+        lock = threading.Lock()
+        # Все сессии создаются до первой ошибки: иначе executor.map
+        # отменит еще не начатые задачи
+        created = threading.Barrier(3, timeout=5)
+
+        def create(config):
+            # Вторая сессия не авторизуется, третья падает с ошибкой
+            with lock:
+                number = len(agents)
+                agent = MagicMock(login=MagicMock(return_value=number != 1))
+                if number == 2:
+                    agent.login.side_effect = ConnectionError('grid is down')
+                agents.append(agent)
+            created.wait()
+            return agent
+
+        self.mock_agent_cls.side_effect = create
+
+        with self.assertRaises((RuntimeError, ConnectionError)):
+            SessionPool(self.config, size=3)
+
+        self.assertEqual(len(agents), 3)
+        for agent in agents:
+            agent.close.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+from tracing import Tracer, summarize, format_summary, load_jsonl, network_timings
+
+class TestTracer(unittest.TestCase):
+    def setUp(self):
+        """Подготовка временной директории"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, True)
+
+    def test_nested_spans(self):
+        """Тест имен вложенных шагов и общего идентификатора трассы"""
+        tracer = Tracer()
+        with tracer.span('create_listing', listing=1):
+            with tracer.span('submit'):
+                pass
+
+        child, parent = tracer.spans
+        self.assertEqual(child['span'], 'create_listing/submit')
+        self.assertEqual(parent['span'], 'create_listing')
+        self.assertEqual(child['trace'], parent['trace'])
+        self.assertEqual(parent['listing'], 1)
+        self.assertGreaterEqual(parent['duration'], child['duration'])
+
+    def test_error_status(self):
+        """Тест отметки шага, завершившегося исключением"""
+        tracer = Tracer()
+        with self.assertRaises(ValueError):
+            with tracer.span('login'):
+                raise ValueError('bad form')
+
+        self.assertEqual(tracer.spans[0]['status'], 'error')
+        self.assertEqual(tracer.spans[0]['error'], 'bad form')
+        self.assertEqual(tracer.summary()['login']['errors'], 1)
+
+    def test_threads_have_separate_stacks(self):
+        """Тест независимых трасс в параллельных потоках"""
+        tracer = Tracer()
+        barrier = threading.Barrier(2)
+
+        def work():
+            with tracer.span('create_listing'):
+                barrier.wait()
+
+        threads = [threading.Thread(target=work) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([record['span'] for record in tracer.spans], ['create_listing'] * 2)
+        self.assertEqual(len({record['trace'] for record in tracer.spans}), 2)
+
+    def test_disabled(self):
+        """Тест выключенной трассировки"""
+        path = os.path.join(self.tmp_dir, 'trace.jsonl')
+        tracer = Tracer(enabled=False, path=path)
+        with tracer.span('login') as span:
+            span['status'] = 'error'
+
+        self.assertEqual(len(tracer.spans), 0)
+        self.assertFalse(os.path.exists(path))
+
+    def test_jsonl_file_and_summary(self):
+        """Тест записи в JSON lines и сводки p50/p95"""
+        path = os.path.join(self.tmp_dir, 'trace.jsonl')
+        tracer = Tracer(path=path)
+        for _ in range(3):
+            with tracer.span('publish'):
+                pass
+        tracer.close()
+
+        records = load_jsonl(path)
+        self.assertEqual(len(records), 3)
+        self.assertEqual(summarize(records)['publish']['count'], 3)
+
+        summary = summarize([{'span': 'publish', 'duration': d} for d in range(1, 21)])
+        self.assertEqual(summary['publish']['p50'], 10)
+        self.assertEqual(summary['publish']['p95'], 19)
+        self.assertEqual(summary['publish']['max'], 20)
+        table = format_summary(summary).splitlines()
+        self.assertTrue(table[0].startswith('step'))
+        self.assertIn('19.000', table[2])
+
+    def test_network_timings(self):
+        """Тест разбора performance-лога Chrome"""
+        def entry(method, **params):
+            return {'message': json.dumps({'message': {'method': method, 'params': params}})}
+
+        timings = network_timings([
+            entry('Network.requestWillBeSent', requestId='1', timestamp=10.0, request={'url': 'https://a/page'}),
+            entry('Network.requestWillBeSent', requestId='2', timestamp=10.2, request={'url': 'https://a/img.jpg'}),
+            entry('Network.loadingFinished', requestId='1', timestamp=10.5, encodedDataLength=1000),
+            entry('Network.loadingFailed', requestId='2', timestamp=11.2),
+            {'message': 'not json'}
+        ])
+
+        self.assertEqual(timings['network_requests'], 2)
+        self.assertEqual(timings['network_failed'], 1)
+        self.assertEqual(timings['network_bytes'], 1000)
+        self.assertAlmostEqual(timings['network_seconds'], 1.2)
+        self.assertEqual(timings['network_slowest_url'], 'https://a/img.jpg')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,233 @@
+import sys
+import json
+import math
+import time
+import uuid
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+
+class Tracer:
+    """
+    Трассировка шагов работы агента
+
+    Каждый шаг оборачивается в span: имя включает родительские шаги
+    (например, create_listing/publish), длительность меряется по
+    perf_counter. Завершенные span'ы хранятся в ограниченном буфере и,
+    если задан файл, дописываются в него в формате JSON lines. Запись
+    span'а стоит пары вызовов таймера и одного словаря, поэтому
+    трассировку можно не выключать; выключенный трассировщик не пишет ничего.
+    """
+
+    def __init__(self, enabled: bool = True, path: Optional[str] = None, maxlen: int = 10000):
+        """
+        Args:
+            enabled (bool): Включена ли трассировка
+            path (str): Файл для записи span'ов в формате JSON lines
+            maxlen (int): Сколько последних span'ов хранить в памяти
+        """
+        self.enabled = enabled
+        self.path = path
+        self.spans = deque(maxlen=maxlen)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._file = None
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Dict]:
+        """
+        Замер шага
+
+        Исключение внутри шага отмечает span статусом error и пробрасывается
+        дальше. Шаг, завершившийся неудачей без исключения, можно отметить
+        через record['status'] = 'error'.
+
+        Args:
+            name (str): Название шага
+            **attrs: Дополнительные поля span'а
+
+        Yields:
+            Dict: Запись span'а, в которую можно добавить поля
+        """
+        if not self.enabled:
+            yield {}
+            return
+
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        if stack:
+            parent = stack[-1]
+            record = {'trace': parent['trace'], 'span': f"{parent['span']}/{name}"}
+        else:
+            record = {'trace': uuid.uuid4().hex[:16], 'span': name}
+        record['start'] = time.time()
+        record['status'] = 'ok'
+        record.update(attrs)
+
+        stack.append(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record['status'] = 'error'
+            record.setdefault('error', str(e) or type(e).__name__)
+            raise
+        finally:
+            record['duration'] = time.perf_counter() - start
+            stack.pop()
+            self._finish(record)
+
+    def _finish(self, record: Dict) -> None:
+        self.spans.append(record)
+        if self.path:
+            line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+            with self._lock:
+                if self._file is None:
+                    self._file = open(self.path, 'a', encoding='utf-8')
+                self._file.write(line)
+                self._file.flush()
+
+    def export_jsonl(self, path: str) -> int:
+        """
+        Выгружает span'ы из памяти в файл JSON lines
+
+        Returns:
+            int: Количество записанных span'ов
+        """
+        spans = list(self.spans)
+        with open(path, 'w', encoding='utf-8') as f:
+            for record in spans:
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+        return len(spans)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Сводка p50/p95 по шагам из памяти, см. summarize()"""
+        return summarize(list(self.spans))
+
+    def format_summary(self) -> str:
+        """Сводка в виде текстовой таблицы"""
+        return format_summary(self.summary())
+
+    def close(self) -> None:
+        """Закрывает файл трассировки"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+def _percentile(values: List[float], percent: float) -> float:
+    """Перцентиль по методу ближайшего ранга для отсортированного списка"""
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+def summarize(spans: Iterable[Dict]) -> Dict[str, Dict[str, float]]:
+    """
+    Сводка по шагам
+
+    Args:
+        spans (Iterable[Dict]): Записи span'ов
+
+    Returns:
+        Dict[str, Dict[str, float]]: По имени шага количество, ошибки,
+            p50, p95, максимум и суммарное время в секундах
+    """
+    durations: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    for record in spans:
+        durations.setdefault(record['span'], []).append(record['duration'])
+        if record.get('status') == 'error':
+            errors[record['span']] = errors.get(record['span'], 0) + 1
+
+    summary = {}
+    for name, values in durations.items():
+        values.sort()
+        summary[name] = {
+            'count': len(values),
+            'errors': errors.get(name, 0),
+            'p50': _percentile(values, 50),
+            'p95': _percentile(values, 95),
+            'max': values[-1],
+            'total': sum(values)
+        }
+    return summary
+
+def format_summary(summary: Dict[str, Dict[str, float]]) -> str:
+    """
+    Текстовая таблица сводки, шаги отсортированы по имени (родитель перед детьми)
+
+    Args:
+        summary (Dict): Результат summarize()
+    """
+    header = ('step', 'count', 'errors', 'p50, s', 'p95, s', 'max, s', 'total, s')
+    rows = [
+        (name, str(stats['count']), str(stats['errors'])) + tuple(
+            f"{stats[key]:.3f}" for key in ('p50', 'p95', 'max', 'total')
+        )
+        for name, stats in sorted(summary.items())
+    ]
+    widths = [max(len(row[i]) for row in [header] + rows) for i in range(len(header))]
+    lines = [
+        '  '.join(cell.ljust(width) if i == 0 else cell.rjust(width) for i, (cell, width) in enumerate(zip(row, widths)))
+        for row in [header] + rows
+    ]
+    lines.insert(1, '  '.join('-' * width for width in widths))
+    return '\n'.join(lines)
+
+def load_jsonl(path: str) -> List[Dict]:
+    """Чтение span'ов из файла JSON lines"""
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def network_timings(entries: Iterable[Dict]) -> Dict:
+    """
+    Сетевые запросы из performance-лога Chrome (driver.get_log('performance'))
+
+    Args:
+        entries (Iterable[Dict]): Записи лога
+
+    Returns:
+        Dict: network_requests, network_failed, network_bytes,
+            network_seconds (от первого запроса до последнего ответа),
+            network_slowest_url и network_slowest_seconds
+    """
+    started: Dict[str, tuple] = {}
+    finished = []
+    failed = 0
+    total_bytes = 0
+    for entry in entries:
+        try:
+            message = json.loads(entry['message'])['message']
+        except (KeyError, TypeError, ValueError):
+            continue
+        method = message.get('method')
+        params = message.get('params', {})
+        if method == 'Network.requestWillBeSent':
+            started[params['requestId']] = (params['timestamp'], params['request']['url'])
+        elif method in ('Network.loadingFinished', 'Network.loadingFailed'):
+            request = started.pop(params.get('requestId'), None)
+            if request is None:
+                continue
+            if method == 'Network.loadingFailed':
+                failed += 1
+            else:
+                total_bytes += params.get('encodedDataLength', 0)
+            finished.append((request[0], params['timestamp'], request[1]))
+
+    timings = {
+        'network_requests': len(finished),
+        'network_failed': failed,
+        'network_bytes': int(total_bytes)
+    }
+    if finished:
+        slowest = max(finished, key=lambda item: item[1] - item[0])
+        timings['network_seconds'] = max(end for _, end, _ in finished) - min(start for start, _, _ in finished)
+        timings['network_slowest_url'] = slowest[2]
+        timings['network_slowest_seconds'] = slowest[1] - slowest[0]
+    return timings
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print('Использование: python tracing.py trace.jsonl')
+        sys.exit(1)
+    print(format_summary(summarize(load_jsonl(sys.argv[1]))))